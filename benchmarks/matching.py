@@ -0,0 +1,128 @@
+"""
+matching.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+Benchmarks the descriptor matchers available to DsmRegistration._get_putative:
+OpenCV's brute force matcher, FLANN LSH with the parameters used for large
+descriptor sets, and the exact blocked matcher. Each matcher's time and the
+recall of its ratio-tested matches relative to the exact matches are reported.
+
+By default, foundation descriptors are drawn at random and AOI descriptors are
+copies of a subset of them with a fraction of their bits flipped, mixed with unrelated descriptors. Saved
+descriptor arrays can be supplied instead, e.g. with
+np.save("fnd_desc.npy", dsm_reg.fnd_desc).
+
+Usage:
+
+    python benchmarks/matching.py --train 200000 --query 50000
+    python benchmarks/matching.py --train-file fnd_desc.npy --query-file aoi_desc.npy
+"""
+import argparse
+import time
+from typing import Callable
+from typing import List
+from typing import Set
+from typing import Tuple
+
+import cv2
+import numpy as np
+from codem.registration.matching import exhaustive_match
+
+
+def synthetic(
+    train: int, query: int, noise: float, seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    train_desc = rng.integers(0, 256, size=(train, 61), dtype=np.uint8)
+    copies = query // 2
+    source = rng.choice(train, copies, replace=False)
+    flips = np.packbits(rng.uniform(size=(copies, 488)) < noise, axis=1)
+    query_desc = np.vstack(
+        (
+            train_desc[source] ^ flips,
+            rng.integers(0, 256, size=(query - copies, 61), dtype=np.uint8),
+        )
+    )
+    return query_desc, train_desc
+
+
+def ratio_test(
+    knn_matches: List[List[cv2.DMatch]], ratio: float
+) -> Set[Tuple[int, int]]:
+    return {
+        (pair[0].queryIdx, pair[0].trainIdx)
+        for pair in knn_matches
+        if len(pair) == 2 and pair[0].distance < ratio * pair[1].distance
+    }
+
+
+def brute_force(
+    query: np.ndarray, train: np.ndarray, ratio: float
+) -> Set[Tuple[int, int]]:
+    matcher = cv2.DescriptorMatcher_create(cv2.DescriptorMatcher_BRUTEFORCE_HAMMING)
+    return ratio_test(matcher.knnMatch(query, train, k=2), ratio)
+
+
+def lsh(query: np.ndarray, train: np.ndarray, ratio: float) -> Set[Tuple[int, int]]:
+    index_params = dict(algorithm=6, table_number=6, key_size=12, multi_probe_level=1)
+    matcher = cv2.FlannBasedMatcher(index_params, {})
+    return ratio_test(matcher.knnMatch(query, train, k=2), ratio)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark DSM descriptor matchers.")
+    ap.add_argument("--train", type=int, default=150000, help="foundation descriptors")
+    ap.add_argument("--query", type=int, default=50000, help="AOI descriptors")
+    ap.add_argument("--train-file", type=str, help="saved foundation descriptors")
+    ap.add_argument("--query-file", type=str, help="saved AOI descriptors")
+    ap.add_argument(
+        "--noise", type=float, default=0.1, help="bit flip rate of AOI copies"
+    )
+    ap.add_argument("--ratio", type=float, default=0.9, help="Lowe's ratio")
+    ap.add_argument("--workers", type=int, default=0, help="threads; 0 for all CPUs")
+    ap.add_argument(
+        "--skip-bf",
+        action="store_true",
+        help="skip the brute force matcher, which fails beyond 2**17 descriptors",
+    )
+    args = ap.parse_args()
+
+    if args.train_file and args.query_file:
+        query_desc = np.load(args.query_file)
+        train_desc = np.load(args.train_file)
+    else:
+        query_desc, train_desc = synthetic(args.train, args.query, args.noise)
+    print(f"{query_desc.shape[0]} AOI and {train_desc.shape[0]} foundation descriptors")
+
+    matchers: List[Tuple[str, Callable[[], Set[Tuple[int, int]]]]] = [
+        (
+            "exact",
+            lambda: {
+                (m.queryIdx, m.trainIdx)
+                for m in exhaustive_match(
+                    query_desc, train_desc, args.ratio, args.workers
+                )
+            },
+        ),
+        ("lsh", lambda: lsh(query_desc, train_desc, args.ratio)),
+    ]
+    if not args.skip_bf:
+        matchers.append(("bf", lambda: brute_force(query_desc, train_desc, args.ratio)))
+
+    reference: Set[Tuple[int, int]] = set()
+    for name, matcher in matchers:
+        start = time.perf_counter()
+        matches = matcher()
+        elapsed = time.perf_counter() - start
+        if name == "exact":
+            reference = matches
+        recall = len(matches & reference) / max(len(reference), 1)
+        print(
+            f"{name:>6}: {elapsed:8.2f} s, {len(matches):8d} matches, "
+            f"recall {recall:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
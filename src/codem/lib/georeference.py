@@ -0,0 +1,192 @@
+"""
+georeference.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+Conversions between DSM pixel coordinates and object space coordinates. Pixel
+coordinates (u=column, v=row) are relative to an origin at the center of the
+upper left pixel, which are the coordinates of OpenCV keypoints and the indices
+of the DSM array. A transform defined with its origin at the upper left corner
+of the upper left pixel ("Area") is offset by half a pixel to this origin.
+
+The conversions evaluate the affine coefficients directly on whole arrays,
+block by block into preallocated outputs, so neither per-point Python calls nor
+full-raster coordinate grids are needed.
+
+This module contains the following methods:
+
+* center_transform - transform from pixel center coordinates
+* uv_to_xy - pixel coordinates to horizontal object space coordinates
+* xy_to_uv - horizontal object space coordinates to pixel coordinates
+* uv_to_xyz - pixel coordinates to object space coordinates with elevations
+* raster_to_xyz - object space coordinates of the valid cells of a raster
+"""
+from typing import Optional
+
+import numpy as np
+from rasterio import Affine
+
+
+# points, or raster cells, converted per block
+BLOCK_SIZE = 1 << 22
+
+
+def center_transform(transform: Affine, area_or_point: str) -> Affine:
+    """
+    Returns the transform from pixel coordinates relative to the center of
+    the upper left pixel.
+
+    Parameters
+    ----------
+    transform: Affine
+        Raster transform
+    area_or_point: str
+        "Area" if the transform origin is the upper left corner of the upper
+        left pixel, or "Point" if it is the center of the upper left pixel
+
+    Returns
+    -------
+    transform: Affine
+        Transform from pixel center coordinates
+    """
+    if area_or_point == "Area":
+        return transform * Affine.translation(0.5, 0.5)
+    return transform
+
+
+def _apply(transform: Affine, uv: np.ndarray, dtype: type) -> np.ndarray:
+    """
+    Applies an affine transform to (N, 2) coordinates block by block.
+    """
+    a, b, c, d, e, f = list(transform)[:6]
+    out: np.ndarray = np.empty(uv.shape, dtype=dtype)
+    for start in range(0, uv.shape[0], BLOCK_SIZE):
+        u = uv[start : start + BLOCK_SIZE, 0]
+        v = uv[start : start + BLOCK_SIZE, 1]
+        out[start : start + BLOCK_SIZE, 0] = a * u + b * v + c
+        out[start : start + BLOCK_SIZE, 1] = d * u + e * v + f
+    return out
+
+
+def uv_to_xy(uv: np.ndarray, transform: Affine, area_or_point: str) -> np.ndarray:
+    """
+    Converts pixel coordinates to horizontal object space coordinates.
+
+    Parameters
+    ----------
+    uv: np.array
+        (N, 2) pixel coordinates relative to the center of the upper left pixel
+    transform: Affine
+        Raster transform
+    area_or_point: str
+        "Area" or "Point" origin of the transform
+
+    Returns
+    -------
+    xy: np.array
+        (N, 2) object space coordinates
+    """
+    uv = np.asarray(uv, dtype=np.double).reshape(-1, 2)
+    return _apply(center_transform(transform, area_or_point), uv, np.double)
+
+
+def xy_to_uv(xy: np.ndarray, transform: Affine, area_or_point: str) -> np.ndarray:
+    """
+    Converts horizontal object space coordinates to pixel coordinates.
+
+    Parameters
+    ----------
+    xy: np.array
+        (N, 2) object space coordinates
+    transform: Affine
+        Raster transform
+    area_or_point: str
+        "Area" or "Point" origin of the transform
+
+    Returns
+    -------
+    uv: np.array
+        (N, 2) pixel coordinates relative to the center of the upper left pixel
+    """
+    xy = np.asarray(xy, dtype=np.double).reshape(-1, 2)
+    return _apply(~center_transform(transform, area_or_point), xy, np.double)
+
+
+def uv_to_xyz(
+    uv: np.ndarray, transform: Affine, area_or_point: str, dsm: np.ndarray
+) -> np.ndarray:
+    """
+    Converts pixel coordinates to object space coordinates, with elevations
+    sampled from the nearest DSM cell.
+
+    Parameters
+    ----------
+    uv: np.array
+        (N, 2) pixel coordinates relative to the center of the upper left pixel
+    transform: Affine
+        Raster transform
+    area_or_point: str
+        "Area" or "Point" origin of the transform
+    dsm: np.array
+        DSM elevations
+
+    Returns
+    -------
+    xyz: np.array
+        (N, 3) object space coordinates
+    """
+    uv = np.asarray(uv, dtype=np.double).reshape(-1, 2)
+    xyz = np.empty((uv.shape[0], 3), dtype=np.double)
+    xyz[:, 0:2] = uv_to_xy(uv, transform, area_or_point)
+    cols = np.rint(uv[:, 0]).astype(np.intp)
+    rows = np.rint(uv[:, 1]).astype(np.intp)
+    xyz[:, 2] = dsm[rows, cols]
+    return xyz
+
+
+def raster_to_xyz(
+    mask: np.ndarray,
+    transform: Affine,
+    area_or_point: str,
+    dsm: Optional[np.ndarray] = None,
+    dtype: type = np.float64,
+) -> np.ndarray:
+    """
+    Converts the valid cells of a raster to object space coordinates, in
+    row-major order.
+
+    Parameters
+    ----------
+    mask: np.array
+        Boolean array flagging the valid cells
+    transform: Affine
+        Raster transform
+    area_or_point: str
+        "Area" or "Point" origin of the transform
+    dsm: Optional[np.array]
+        DSM elevations; if None, only horizontal coordinates are returned
+    dtype: type
+        Floating point type of the coordinates
+
+    Returns
+    -------
+    xyz: np.array
+        (N, 3) object space coordinates, or (N, 2) if dsm is None
+    """
+    mask = np.asarray(mask, dtype=bool)
+    a, b, c, d, e, f = list(center_transform(transform, area_or_point))[:6]
+    columns = 2 if dsm is None else 3
+    xyz: np.ndarray = np.empty((int(np.count_nonzero(mask)), columns), dtype=dtype)
+
+    block = max(1, BLOCK_SIZE // max(1, mask.shape[1]))
+    start = 0
+    for first in range(0, mask.shape[0], block):
+        rows, cols = np.nonzero(mask[first : first + block])
+        stop = start + rows.shape[0]
+        v = rows + first
+        xyz[start:stop, 0] = a * cols + b * v + c
+        xyz[start:stop, 1] = d * cols + e * v + f
+        if dsm is not None:
+            xyz[start:stop, 2] = dsm[v, cols]
+        start = stop
+    return xyz
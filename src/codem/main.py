@@ -60,19 +60,47 @@ class CodemRunConfig:
     FND_FILE: str
     AOI_FILE: str
     MIN_RESOLUTION: float = float("nan")
+    GRIDDING_ENGINE: str = "memory"
+    POINTCLOUD_SPOOL: bool = True
+    POINTCLOUD_SPOOL_DIR: Optional[str] = None
     DSM_AKAZE_THRESHOLD: float = 0.0001
+    DSM_AKAZE_TILE_SIZE: int = 4096
+    DSM_KEYPOINT_BUDGET: int = 65536
+    DSM_PYRAMID_LEVELS: int = 0
     DSM_LOWES_RATIO: float = 0.9
+    DSM_MATCH_MODE: str = "global"
+    DSM_MATCH_RADIUS: float = 100.0
+    DSM_MATCH_ENGINE: str = "exact"
+    DSM_MATCH_IMG_SIZE: int = 2048
     DSM_RANSAC_MAX_ITER: int = 10000
     DSM_RANSAC_THRESHOLD: float = 10.0
+    DSM_RANSAC_CONFIDENCE: float = 0.999
+    DSM_RANSAC_ENGINE: str = "batched"
+    DSM_COARSE_ENGINE: str = "features"
+    DSM_PHASE_ROTATION: bool = True
+    DSM_PHASE_MIN_RESPONSE: float = 0.3
     DSM_SOLVE_SCALE: bool = True
+    DSM_SOLVE_TILT: bool = True
     DSM_STRONG_FILTER: float = 10.0
     DSM_WEAK_FILTER: float = 1.0
+    DSM_INFILL_ENGINE: str = "pyramid"
+    DSM_NORMALIZE_ENGINE: str = "pyramid"
+    DSM_POINTS_FLOAT32: bool = False
     ICP_ANGLE_THRESHOLD: float = 0.001
     ICP_DISTANCE_THRESHOLD: float = 0.001
     ICP_MAX_ITER: int = 100
     ICP_RMSE_THRESHOLD: float = 0.0001
     ICP_ROBUST: bool = True
     ICP_SOLVE_SCALE: bool = True
+    ICP_CORRESPONDENCE: str = "grid"
+    ICP_GRID_RADIUS: int = 0
+    ICP_NORMALS_ENGINE: str = "grid"
+    ICP_LEVELS: int = 0
+    ICP_LEVEL_ITER: int = 10
+    ICP_SAMPLING: str = "none"
+    ICP_SAMPLE_SIZE: int = 200000
+    ICP_ACCELERATE: bool = False
+    ICP_FLOAT32: bool = False
     OFFSET_X: str= 'auto'
     OFFSET_Y: str = 'auto'
     OFFSET_Z: str = 'auto'
@@ -85,6 +113,9 @@ class CodemRunConfig:
     TIGHT_SEARCH: bool = False
     LOG_TYPE: str = "rich"
     WEBSOCKET_URL: str = "127.0.0.1:8889"
+    CACHE_DIR: Optional[str] = None
+    CACHE_MAX_SIZE: float = 10.0
+    WORKERS: int = 0
 
     def __post_init__(self) -> None:
         # set output directory
@@ -112,20 +143,58 @@ class CodemRunConfig:
             raise FileNotFoundError(f"AOI file {self.AOI_FILE} not found.")
         if self.MIN_RESOLUTION <= 0:
             raise ValueError("Minimum pipeline resolution must be a greater than 0.")
+        if self.GRIDDING_ENGINE not in ("memory", "pdal"):
+            raise ValueError("Gridding engine must be 'memory' or 'pdal'.")
+        if self.POINTCLOUD_SPOOL_DIR is not None and not os.path.isdir(
+            self.POINTCLOUD_SPOOL_DIR
+        ):
+            raise ValueError(
+                f"Point cloud spool directory {self.POINTCLOUD_SPOOL_DIR} not found."
+            )
         if self.DSM_AKAZE_THRESHOLD <= 0:
             raise ValueError("Minmum AKAZE threshold must be greater than 0.")
+        if self.DSM_AKAZE_TILE_SIZE < 1:
+            raise ValueError("AKAZE tile size must be a positive integer.")
+        if self.DSM_KEYPOINT_BUDGET < 0:
+            raise ValueError("Keypoint budget must be 0 or greater.")
+        if self.DSM_PYRAMID_LEVELS < 0:
+            raise ValueError("Number of DSM pyramid levels must be 0 or greater.")
         if self.DSM_LOWES_RATIO < 0.01 or self.DSM_LOWES_RATIO >= 1.0:
             raise ValueError("Lowes ratio must be between 0.01 and 1.0.")
+        if self.DSM_MATCH_MODE not in ("global", "constrained"):
+            raise ValueError("DSM match mode must be 'global' or 'constrained'.")
+        if self.DSM_MATCH_RADIUS <= 0:
+            raise ValueError("DSM match search radius must be greater than 0.")
+        if self.DSM_MATCH_ENGINE not in ("exact", "lsh"):
+            raise ValueError("DSM match engine must be 'exact' or 'lsh'.")
+        if self.DSM_MATCH_IMG_SIZE < 0:
+            raise ValueError("DSM match image size must be 0 or greater.")
         if self.DSM_RANSAC_MAX_ITER < 1:
             raise ValueError(
                 "Maximum number of RANSAC iterations must be a positive integer."
             )
         if self.DSM_RANSAC_THRESHOLD <= 0:
             raise ValueError("RANSAC threshold must be a positive number.")
+        if self.DSM_RANSAC_CONFIDENCE <= 0 or self.DSM_RANSAC_CONFIDENCE > 1:
+            raise ValueError("RANSAC confidence must be greater than 0 and at most 1.")
+        if self.DSM_RANSAC_ENGINE not in ("batched", "skimage"):
+            raise ValueError("RANSAC engine must be 'batched' or 'skimage'.")
+        if self.DSM_COARSE_ENGINE not in ("features", "phase"):
+            raise ValueError("DSM coarse engine must be 'features' or 'phase'.")
+        if self.DSM_PHASE_MIN_RESPONSE < 0:
+            raise ValueError(
+                "Minimum phase correlation response must be 0 or greater."
+            )
         if self.DSM_STRONG_FILTER <= 0:
             raise ValueError("DSM strong filter size must be greater than 0.")
         if self.DSM_WEAK_FILTER <= 0:
             raise ValueError("DSM weak filter size must be greater than 0.")
+        if self.DSM_INFILL_ENGINE not in ("pyramid", "nearest", "idw"):
+            raise ValueError(
+                "DSM infill engine must be 'pyramid', 'nearest' or 'idw'."
+            )
+        if self.DSM_NORMALIZE_ENGINE not in ("pyramid", "exact"):
+            raise ValueError("DSM normalize engine must be 'pyramid' or 'exact'.")
         if self.ICP_ANGLE_THRESHOLD <= 0:
             raise ValueError(
                 "ICP minimum angle convergence threshold must be greater than 0."
@@ -142,6 +211,28 @@ class CodemRunConfig:
             raise ValueError(
                 "ICP minimum change in RMSE convergence threshold must be greater than 0."
             )
+        if self.ICP_CORRESPONDENCE not in ("grid", "kdtree"):
+            raise ValueError("ICP correspondence search must be 'grid' or 'kdtree'.")
+        if self.ICP_GRID_RADIUS < 0:
+            raise ValueError("ICP grid search radius must be 0 or greater.")
+        if self.ICP_NORMALS_ENGINE not in ("grid", "pdal"):
+            raise ValueError("ICP normals engine must be 'grid' or 'pdal'.")
+        if self.ICP_LEVELS < 0:
+            raise ValueError("Number of ICP levels must be 0 or greater.")
+        if self.ICP_LEVEL_ITER < 1:
+            raise ValueError(
+                "Maximum number of ICP iterations per level must be a positive integer."
+            )
+        if self.ICP_SAMPLING not in ("none", "random", "normal", "curvature"):
+            raise ValueError(
+                "ICP sampling must be 'none', 'random', 'normal' or 'curvature'."
+            )
+        if self.ICP_SAMPLE_SIZE < 7:
+            raise ValueError("ICP sample size must be at least 7 points.")
+        if self.CACHE_MAX_SIZE <= 0:
+            raise ValueError("Foundation cache size limit must be greater than 0.")
+        if self.WORKERS < 0:
+            raise ValueError("Number of workers must be 0 or greater.")
         for offset in [self.OFFSET_X, self.OFFSET_Y, self.OFFSET_Z]:
             if (
                 offset != "auto"
@@ -200,6 +291,38 @@ def get_args() -> argparse.Namespace:
         default=CodemRunConfig.MIN_RESOLUTION,
         help="minimum pipeline data resolution",
     )
+    ap.add_argument(
+        "--gridding-engine",
+        "-ge",
+        type=str,
+        choices=["memory", "pdal"],
+        default=CodemRunConfig.GRIDDING_ENGINE,
+        help=(
+            "point cloud to DSM gridding; 'memory' max-bins points streamed from "
+            "the reader, 'pdal' writes and reads back a temporary GeoTIFF"
+        ),
+    )
+    ap.add_argument(
+        "--pointcloud-spool",
+        "-ps",
+        type=str2bool,
+        default=CodemRunConfig.POINTCLOUD_SPOOL,
+        help=(
+            "boolean to keep point cloud points in a temporary directory after "
+            "reading them, so DSM creation and registration output do not read "
+            "the file again"
+        ),
+    )
+    ap.add_argument(
+        "--pointcloud-spool-dir",
+        "-psd",
+        type=str,
+        default=CodemRunConfig.POINTCLOUD_SPOOL_DIR,
+        help=(
+            "directory in which to keep the point cloud points; the output "
+            "directory is used if omitted."
+        ),
+    )
     ap.add_argument(
         "--dsm-akaze-threshold",
         "-dat",
@@ -207,6 +330,27 @@ def get_args() -> argparse.Namespace:
         default=0.0001,
         help="AKAZE feature detection response threshold",
     )
+    ap.add_argument(
+        "--dsm-akaze-tile-size",
+        "-dats",
+        type=int,
+        default=CodemRunConfig.DSM_AKAZE_TILE_SIZE,
+        help="side length in pixels of the tiles AKAZE features are extracted from",
+    )
+    ap.add_argument(
+        "--dsm-keypoint-budget",
+        "-dkb",
+        type=int,
+        default=CodemRunConfig.DSM_KEYPOINT_BUDGET,
+        help="maximum number of keypoints kept per DSM; 0 keeps all keypoints",
+    )
+    ap.add_argument(
+        "--dsm-pyramid-levels",
+        "-dpl",
+        type=int,
+        default=CodemRunConfig.DSM_PYRAMID_LEVELS,
+        help="number of decimated levels of coarse-to-fine feature registration",
+    )
     ap.add_argument(
         "--dsm-lowes-ratio",
         "-dlr",
@@ -214,6 +358,46 @@ def get_args() -> argparse.Namespace:
         default=0.9,
         help="feature matching relative strength control",
     )
+    ap.add_argument(
+        "--dsm-match-mode",
+        "-dmm",
+        type=str,
+        choices=["global", "constrained"],
+        default=CodemRunConfig.DSM_MATCH_MODE,
+        help=(
+            "feature matching scope; 'global' compares every AOI feature with every "
+            "foundation feature, 'constrained' only with foundation features within "
+            "the match radius of its georeferenced location"
+        ),
+    )
+    ap.add_argument(
+        "--dsm-match-radius",
+        "-dmr",
+        type=float,
+        default=CodemRunConfig.DSM_MATCH_RADIUS,
+        help="search radius of the constrained feature matching mode",
+    )
+    ap.add_argument(
+        "--dsm-match-engine",
+        "-dme",
+        type=str,
+        choices=["exact", "lsh"],
+        default=CodemRunConfig.DSM_MATCH_ENGINE,
+        help=(
+            "feature matcher for more than 2**17 features; 'exact' compares all "
+            "features in blocks, 'lsh' searches approximately with FLANN LSH"
+        ),
+    )
+    ap.add_argument(
+        "--dsm-match-img-size",
+        "-dmis",
+        type=int,
+        default=CodemRunConfig.DSM_MATCH_IMG_SIZE,
+        help=(
+            "maximum side length in pixels of each DSM in the feature match "
+            "image; 0 skips the image"
+        ),
+    )
     ap.add_argument(
         "--dsm-ransac-max-iter",
         "-drmi",
@@ -228,6 +412,52 @@ def get_args() -> argparse.Namespace:
         default=10,
         help="maximum residual error for a feature matched pair to be included in RANSAC solution",
     )
+    ap.add_argument(
+        "--dsm-ransac-confidence",
+        "-drc",
+        type=float,
+        default=CodemRunConfig.DSM_RANSAC_CONFIDENCE,
+        help=(
+            "probability of an all-inlier sample at which RANSAC stops early; "
+            "1 runs all iterations"
+        ),
+    )
+    ap.add_argument(
+        "--dsm-ransac-engine",
+        "-dre",
+        type=str,
+        choices=["batched", "skimage"],
+        default=CodemRunConfig.DSM_RANSAC_ENGINE,
+        help=(
+            "RANSAC implementation; 'batched' solves and scores thousands of "
+            "hypotheses at once, 'skimage' evaluates one hypothesis per trial"
+        ),
+    )
+    ap.add_argument(
+        "--dsm-coarse-engine",
+        "-dce",
+        type=str,
+        choices=["features", "phase"],
+        default=CodemRunConfig.DSM_COARSE_ENGINE,
+        help=(
+            "coarse registration method; 'features' matches AKAZE features, 'phase' "
+            "phase correlates the DSMs and falls back to features if that fails"
+        ),
+    )
+    ap.add_argument(
+        "--dsm-phase-rotation",
+        "-dpr",
+        type=str2bool,
+        default=CodemRunConfig.DSM_PHASE_ROTATION,
+        help="boolean to include or exclude rotation from phase correlation",
+    )
+    ap.add_argument(
+        "--dsm-phase-min-response",
+        "-dpmr",
+        type=float,
+        default=CodemRunConfig.DSM_PHASE_MIN_RESPONSE,
+        help="minimum phase correlation peak response accepted",
+    )
     ap.add_argument(
         "--dsm-solve-scale",
         "-dss",
@@ -235,6 +465,16 @@ def get_args() -> argparse.Namespace:
         default=True,
         help="boolean to include or exclude scale from the solved registration transformation",
     )
+    ap.add_argument(
+        "--dsm-solve-tilt",
+        "-dst",
+        type=str2bool,
+        default=CodemRunConfig.DSM_SOLVE_TILT,
+        help=(
+            "boolean to solve the full 3D rotation, or only the rotation about the "
+            "vertical axis, in the coarse registration"
+        ),
+    )
     ap.add_argument(
         "--dsm-strong-filter",
         "-dsf",
@@ -249,6 +489,35 @@ def get_args() -> argparse.Namespace:
         default=1,
         help="stddev of the small Gaussian filter used to normalize the DSM prior to feature extraction",
     )
+    ap.add_argument(
+        "--dsm-infill-engine",
+        "-die",
+        type=str,
+        choices=["pyramid", "nearest", "idw"],
+        default=CodemRunConfig.DSM_INFILL_ENGINE,
+        help=(
+            "DSM void infill method; 'pyramid' and 'nearest' fill every void in "
+            "a single pass, 'idw' repeats inverse distance weighting passes"
+        ),
+    )
+    ap.add_argument(
+        "--dsm-normalize-engine",
+        "-dne",
+        type=str,
+        choices=["pyramid", "exact"],
+        default=CodemRunConfig.DSM_NORMALIZE_ENGINE,
+        help=(
+            "DSM band-pass method; 'pyramid' blurs on decimated pyramid levels and "
+            "clips at histogram percentiles, 'exact' blurs at full resolution"
+        ),
+    )
+    ap.add_argument(
+        "--dsm-points-float32",
+        "-dpf",
+        type=str2bool,
+        default=CodemRunConfig.DSM_POINTS_FLOAT32,
+        help="boolean to store the points converted from DSMs in single precision",
+    )
     ap.add_argument(
         "--icp-angle-threshold",
         "-iat",
@@ -291,6 +560,87 @@ def get_args() -> argparse.Namespace:
         default=True,
         help="boolean to include or exclude scale from the solved registration",
     )
+    ap.add_argument(
+        "--icp-correspondence",
+        "-ic",
+        type=str,
+        choices=["grid", "kdtree"],
+        default=CodemRunConfig.ICP_CORRESPONDENCE,
+        help=(
+            "ICP closest point search; 'grid' looks up foundation points directly "
+            "in the foundation raster, 'kdtree' searches a KD-tree"
+        ),
+    )
+    ap.add_argument(
+        "--icp-grid-radius",
+        "-igr",
+        type=int,
+        default=CodemRunConfig.ICP_GRID_RADIUS,
+        help=(
+            "half-width in cells of the neighbourhood searched by the grid search; "
+            "0 covers the outlier threshold"
+        ),
+    )
+    ap.add_argument(
+        "--icp-normals-engine",
+        "-ine",
+        type=str,
+        choices=["grid", "pdal"],
+        default=CodemRunConfig.ICP_NORMALS_ENGINE,
+        help=(
+            "foundation normal vector method; 'grid' fits planes on the foundation "
+            "raster, 'pdal' runs PDAL's filters.normal KNN estimate"
+        ),
+    )
+    ap.add_argument(
+        "--icp-levels",
+        "-il",
+        type=int,
+        default=CodemRunConfig.ICP_LEVELS,
+        help=(
+            "number of decimated levels ICP iterates on before full resolution; "
+            "level k keeps every 2**k-th foundation row and column"
+        ),
+    )
+    ap.add_argument(
+        "--icp-level-iter",
+        "-ili",
+        type=int,
+        default=CodemRunConfig.ICP_LEVEL_ITER,
+        help="maximum number of ICP iterations on each decimated level",
+    )
+    ap.add_argument(
+        "--icp-sampling",
+        "-isa",
+        type=str,
+        choices=["none", "random", "normal", "curvature"],
+        default=CodemRunConfig.ICP_SAMPLING,
+        help=(
+            "AOI point sampling before ICP; 'normal' spreads the sample over "
+            "normal directions, 'curvature' favours non-planar areas"
+        ),
+    )
+    ap.add_argument(
+        "--icp-sample-size",
+        "-isz",
+        type=int,
+        default=CodemRunConfig.ICP_SAMPLE_SIZE,
+        help="number of AOI points sampled for ICP",
+    )
+    ap.add_argument(
+        "--icp-accelerate",
+        "-ia",
+        type=str2bool,
+        default=CodemRunConfig.ICP_ACCELERATE,
+        help="boolean to Anderson accelerate the ICP iterations",
+    )
+    ap.add_argument(
+        "--icp-float32",
+        "-ipf",
+        type=str2bool,
+        default=CodemRunConfig.ICP_FLOAT32,
+        help="boolean to store and transform the ICP points in single precision",
+    )
     ap.add_argument(
         "--icp-save-residuals",
         action="store_true",
@@ -374,6 +724,31 @@ def get_args() -> argparse.Namespace:
     ap.add_argument(
         "--output-dir", "-o", type=str, help="Directory to place registered output."
     )
+    ap.add_argument(
+        "--cache-dir",
+        type=str,
+        default=CodemRunConfig.CACHE_DIR,
+        help=(
+            "Directory in which to cache the prepared foundation data for reuse "
+            "by later runs. No caching is done if omitted."
+        ),
+    )
+    ap.add_argument(
+        "--cache-max-size",
+        type=float,
+        default=CodemRunConfig.CACHE_MAX_SIZE,
+        help=(
+            "Maximum size of the foundation cache in gigabytes; least recently "
+            "used entries are evicted beyond it"
+        ),
+    )
+    ap.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=CodemRunConfig.WORKERS,
+        help="number of threads used by parallel stages; 0 uses all CPUs",
+    )
     ap.add_argument(
         "--version",
         action="version",
@@ -401,19 +776,47 @@ def create_config(args: argparse.Namespace) -> CodemParameters:
         os.fsdecode(os.path.abspath(args.foundation_file)),
         os.fsdecode(os.path.abspath(args.aoi_file)),
         MIN_RESOLUTION=float(args.min_resolution),
+        GRIDDING_ENGINE=args.gridding_engine,
+        POINTCLOUD_SPOOL=args.pointcloud_spool,
+        POINTCLOUD_SPOOL_DIR=args.pointcloud_spool_dir,
         DSM_AKAZE_THRESHOLD=float(args.dsm_akaze_threshold),
+        DSM_AKAZE_TILE_SIZE=int(args.dsm_akaze_tile_size),
+        DSM_KEYPOINT_BUDGET=int(args.dsm_keypoint_budget),
+        DSM_PYRAMID_LEVELS=int(args.dsm_pyramid_levels),
         DSM_LOWES_RATIO=float(args.dsm_lowes_ratio),
+        DSM_MATCH_MODE=args.dsm_match_mode,
+        DSM_MATCH_RADIUS=float(args.dsm_match_radius),
+        DSM_MATCH_ENGINE=args.dsm_match_engine,
+        DSM_MATCH_IMG_SIZE=int(args.dsm_match_img_size),
         DSM_RANSAC_MAX_ITER=int(args.dsm_ransac_max_iter),
         DSM_RANSAC_THRESHOLD=float(args.dsm_ransac_threshold),
+        DSM_RANSAC_CONFIDENCE=float(args.dsm_ransac_confidence),
+        DSM_RANSAC_ENGINE=args.dsm_ransac_engine,
+        DSM_COARSE_ENGINE=args.dsm_coarse_engine,
+        DSM_PHASE_ROTATION=args.dsm_phase_rotation,
+        DSM_PHASE_MIN_RESPONSE=float(args.dsm_phase_min_response),
         DSM_SOLVE_SCALE=args.dsm_solve_scale,
+        DSM_SOLVE_TILT=args.dsm_solve_tilt,
         DSM_STRONG_FILTER=float(args.dsm_strong_filter),
         DSM_WEAK_FILTER=float(args.dsm_weak_filter),
+        DSM_INFILL_ENGINE=args.dsm_infill_engine,
+        DSM_NORMALIZE_ENGINE=args.dsm_normalize_engine,
+        DSM_POINTS_FLOAT32=args.dsm_points_float32,
         ICP_ANGLE_THRESHOLD=float(args.icp_angle_threshold),
         ICP_DISTANCE_THRESHOLD=float(args.icp_distance_threshold),
         ICP_MAX_ITER=int(args.icp_max_iter),
         ICP_RMSE_THRESHOLD=float(args.icp_rmse_threshold),
         ICP_ROBUST=args.icp_robust,
         ICP_SOLVE_SCALE=args.icp_solve_scale,
+        ICP_CORRESPONDENCE=args.icp_correspondence,
+        ICP_GRID_RADIUS=int(args.icp_grid_radius),
+        ICP_NORMALS_ENGINE=args.icp_normals_engine,
+        ICP_LEVELS=int(args.icp_levels),
+        ICP_LEVEL_ITER=int(args.icp_level_iter),
+        ICP_SAMPLING=args.icp_sampling,
+        ICP_SAMPLE_SIZE=int(args.icp_sample_size),
+        ICP_ACCELERATE=args.icp_accelerate,
+        ICP_FLOAT32=args.icp_float32,
         SCALE_X=args.scale_x,
         SCALE_Y=args.scale_y,
         SCALE_Z=args.scale_z,
@@ -425,7 +828,10 @@ def create_config(args: argparse.Namespace) -> CodemParameters:
         TIGHT_SEARCH=args.tight_search,
         OUTPUT_DIR=args.output_dir,
         LOG_TYPE=args.log_type,
-        WEBSOCKET_URL=args.websocket_url
+        WEBSOCKET_URL=args.websocket_url,
+        CACHE_DIR=args.cache_dir,
+        CACHE_MAX_SIZE=float(args.cache_max_size),
+        WORKERS=int(args.workers),
     )
     config_dict = dataclasses.asdict(config)
     log = Log(config_dict)
@@ -499,6 +905,7 @@ def run_rich_console(
 
         console.print("===========APPLYING REGISTRATION===========", justify="center")
         apply_registration(fnd_obj, aoi_obj, icp_reg, config)
+        dsm_reg.wait_for_match_img()
         progress.advance(registration, 5)
 
 
@@ -543,6 +950,7 @@ def run_stdout_console(config: CodemParameters) -> None:
 
     print("===========APPLYING REGISTRATION===========")
     apply_registration(fnd_obj, aoi_obj, icp_reg, config)
+    dsm_reg.wait_for_match_img()
 
 
 def run_no_console(
@@ -586,6 +994,7 @@ def run_no_console(
         progress.advance(registration, 16)
 
         apply_registration(fnd_obj, aoi_obj, icp_reg, config)
+        dsm_reg.wait_for_match_img()
         progress.advance(registration, 5)
 
 
@@ -608,7 +1017,8 @@ def preprocess(config: CodemParameters) -> Tuple[GeoData, GeoData]:
 
     # create DSM, but if doing tight-search do not resample
     resample = not config["TIGHT_SEARCH"]
-    fnd_obj._create_dsm(resample=resample)
+    if not fnd_obj._restore_prepared():
+        fnd_obj._create_dsm(resample=resample)
     aoi_obj._create_dsm(resample=resample, fallback_crs=fnd_obj.crs)
     return fnd_obj, aoi_obj
 
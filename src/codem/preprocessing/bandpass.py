@@ -0,0 +1,126 @@
+"""
+bandpass.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+This module contains fast approximations of the operations used to band-pass
+and normalize DSMs prior to feature extraction. Wide Gaussian blurs are
+computed on a decimated level of an image pyramid, where the kernel is small,
+and brought back to full resolution. Percentiles are read from a histogram
+rather than from a sort of the full array.
+
+This module contains the following methods:
+
+* pyramid_blur - Gaussian blur computed on a decimated pyramid level
+* histogram_percentiles - percentiles interpolated from a streamed histogram
+"""
+import math
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+
+# smallest sigma, in pixels of the decimated level, that the residual blur on
+# that level may have
+_MIN_LEVEL_SIGMA = 2.0
+
+# number of histogram bins used to locate percentiles
+_HISTOGRAM_BINS = 1 << 16
+
+# values binned per histogram update
+_BLOCK_SIZE = 1 << 20
+
+
+def pyramid_blur(image: np.ndarray, sigma: float) -> np.ndarray:
+    """
+    Approximates cv2.GaussianBlur(image, (0, 0), sigma) for large sigma. Each
+    pyrDown and pyrUp step applies a binomial kernel of unit variance in the
+    pixels of the finer level, so descending and ascending k levels together
+    contributes a variance of 2 * (4^k - 1) / 3 original pixels. The remaining
+    variance is applied by a Gaussian blur on the coarsest level. The deepest
+    level that leaves a residual sigma of at least two of its pixels is used,
+    and small sigmas fall back to a full resolution blur.
+
+    Parameters
+    ----------
+    image: np.array
+        Image to blur
+    sigma: float
+        Standard deviation of the Gaussian kernel in pixels
+
+    Returns
+    -------
+    blurred: np.array
+        Blurred image of the same shape and type
+    """
+    levels = 0
+    while (
+        4 ** (levels + 1) * (_MIN_LEVEL_SIGMA**2 + 2 / 3) <= sigma**2 + 2 / 3
+        and min(image.shape[:2]) >= 2 ** (levels + 1) * 8
+    ):
+        levels += 1
+    if levels == 0:
+        blurred: np.ndarray = cv2.GaussianBlur(image, (0, 0), sigma)
+        return blurred
+
+    shapes: List[Tuple[int, int]] = []
+    level = image
+    for _ in range(levels):
+        shapes.append((level.shape[1], level.shape[0]))
+        level = cv2.pyrDown(level)
+
+    residual = sigma**2 - 2 * (4**levels - 1) / 3
+    level = cv2.GaussianBlur(level, (0, 0), math.sqrt(residual) / 2**levels)
+    for size in reversed(shapes):
+        level = cv2.pyrUp(level, dstsize=size)
+    return level
+
+
+def histogram_percentiles(
+    values: np.ndarray, percentiles: Sequence[float], bins: int = _HISTOGRAM_BINS
+) -> List[float]:
+    """
+    Computes percentiles from a histogram of the values, which is accumulated
+    over blocks of the flattened array, interpolating linearly within the bin
+    containing each percentile. The error is bounded by the bin width, i.e.
+    the value range divided by the number of bins.
+
+    Parameters
+    ----------
+    values: np.array
+        Array of finite values
+    percentiles: Sequence[float]
+        Percentiles to compute, between 0 and 100
+    bins: int
+        Number of histogram bins
+
+    Returns
+    -------
+    results: List[float]
+        Value at each percentile
+    """
+    low = float(np.min(values))
+    high = float(np.max(values))
+    if high == low:
+        return [low for _ in percentiles]
+
+    counts = np.zeros(bins, dtype=np.int64)
+    flat = values.reshape(-1)
+    width = (high - low) / bins
+    for start in range(0, flat.size, _BLOCK_SIZE):
+        block = flat[start : start + _BLOCK_SIZE]
+        index = np.minimum(((block - low) / width).astype(np.intp), bins - 1)
+        counts += np.bincount(index, minlength=bins)
+
+    cumulative = np.cumsum(counts)
+    results = []
+    for percentile in percentiles:
+        target = percentile / 100 * cumulative[-1]
+        found = min(int(np.searchsorted(cumulative, target)), bins - 1)
+        below = cumulative[found - 1] if found > 0 else 0
+        fraction = (target - below) / counts[found] if counts[found] else 0.0
+        results.append(float(low + (found + fraction) * width))
+    return results
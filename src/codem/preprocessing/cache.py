@@ -0,0 +1,275 @@
+"""
+cache.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+This module contains an on-disk cache for prepared foundation data. When many
+AOIs are registered against the same foundation, resolution estimation, DSM
+creation, infilling, normalization, point cloud creation and normal vector
+generation are otherwise repeated on identical input. The cache stores the
+products of those steps so subsequent runs can memory map them instead.
+
+Two kinds of records are kept in the cache directory:
+
+* source records - small JSON files holding the native resolution and linear
+  units of a file, keyed by the file fingerprint only
+* prepared entries - directories holding the prepared arrays as .npy files plus
+  a JSON metadata file, keyed by the file fingerprint and the pipeline
+  parameters that influence preparation
+
+Prepared entries are evicted in least recently used order once the total size
+of the cache exceeds its limit.
+
+This module contains the following class and method:
+
+* FoundationCache - class for storing and retrieving prepared foundation data
+* fingerprint - method for identifying a file by its size, modification time
+  and sampled content
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from codem.preprocessing import CodemParameters
+
+
+# bump when the layout or the meaning of the cached arrays changes
+CACHE_VERSION = 2
+
+# bytes of file content sampled at the start, middle and end of a file
+_SAMPLE_SIZE = 1 << 20
+
+_META_FILE = "meta.json"
+
+
+def fingerprint(file_path: str) -> str:
+    """
+    Computes a fingerprint identifying a file. Hashing the full content of
+    multi-gigabyte inputs would cost as much as the work being cached, so the
+    file size and modification time are hashed along with blocks of content
+    sampled from the start, middle and end of the file.
+
+    Parameters
+    ----------
+    file_path: str
+        Path to the file
+
+    Returns
+    -------
+    digest: str
+        Hexadecimal fingerprint of the file
+    """
+    stat = os.stat(file_path)
+    digest = hashlib.sha256()
+    digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(file_path, "rb") as f:
+        for offset in (0, stat.st_size // 2, max(stat.st_size - _SAMPLE_SIZE, 0)):
+            f.seek(offset)
+            digest.update(f.read(_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+class FoundationCache:
+    """
+    A size bounded, least recently used cache of prepared foundation data.
+
+    Parameters
+    ----------
+    directory: str
+        Directory holding the cache, created if it does not exist
+    max_size: float
+        Maximum total size of the prepared entries in gigabytes
+
+    Methods
+    -------
+    from_config
+    load_source
+    store_source
+    load
+    store
+    _evict
+    """
+
+    def __init__(self, directory: str, max_size: float) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = int(max_size * 1024**3)
+        os.makedirs(os.path.join(self.directory, "sources"), exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: "CodemParameters") -> Optional["FoundationCache"]:
+        """
+        Creates a cache from the CACHE_DIR and CACHE_MAX_SIZE configuration
+        options, or returns None if no cache directory is configured.
+        """
+        if config["CACHE_DIR"] is None:
+            return None
+        return cls(config["CACHE_DIR"], config["CACHE_MAX_SIZE"])
+
+    def load_source(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieves the resolution and unit information recorded for a file.
+
+        Parameters
+        ----------
+        file_path: str
+            Path to the source file
+
+        Returns
+        -------
+        info: Optional[dict]
+            The recorded information, or None on a cache miss
+        """
+        path = os.path.join(self.directory, "sources", f"{fingerprint(file_path)}.json")
+        try:
+            with open(path, "r", encoding="utf_8") as f:
+                info: Dict[str, Any] = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if info.get("version") != CACHE_VERSION:
+            return None
+        return info
+
+    def store_source(self, file_path: str, info: Dict[str, Any]) -> None:
+        """
+        Records the resolution and unit information for a file.
+
+        Parameters
+        ----------
+        file_path: str
+            Path to the source file
+        info: dict
+            JSON serializable information to record
+        """
+        path = os.path.join(self.directory, "sources", f"{fingerprint(file_path)}.json")
+        record = dict(info, version=CACHE_VERSION)
+        handle, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), suffix=".json.tmp"
+        )
+        with os.fdopen(handle, "w", encoding="utf_8") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+
+    def _key(self, params: Dict[str, Any]) -> str:
+        record = dict(params, version=CACHE_VERSION)
+        encoded = json.dumps(record, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    def load(
+        self, params: Dict[str, Any]
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, np.ndarray]]]:
+        """
+        Retrieves a prepared entry. Arrays are memory mapped read-only rather
+        than read into memory.
+
+        Parameters
+        ----------
+        params: dict
+            Parameters identifying the entry, including the file fingerprint
+
+        Returns
+        -------
+        entry: Optional[tuple(dict, dict)]
+            The entry metadata and arrays, or None on a cache miss
+        """
+        entry = os.path.join(self.directory, self._key(params))
+        meta_path = os.path.join(entry, _META_FILE)
+        try:
+            with open(meta_path, "r", encoding="utf_8") as f:
+                meta: Dict[str, Any] = json.load(f)
+            arrays = {
+                name: np.load(os.path.join(entry, f"{name}.npy"), mmap_mode="r")
+                for name in meta["arrays"]
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # mark the entry as most recently used
+        os.utime(meta_path)
+        self.logger.debug(f"Foundation cache hit: {entry}")
+        return meta, arrays
+
+    def store(
+        self,
+        params: Dict[str, Any],
+        meta: Dict[str, Any],
+        arrays: Dict[str, np.ndarray],
+    ) -> None:
+        """
+        Stores a prepared entry and evicts least recently used entries until
+        the cache is within its size limit. The entry is written to a temporary
+        directory and renamed into place so concurrent runs never observe a
+        partially written entry.
+
+        Parameters
+        ----------
+        params: dict
+            Parameters identifying the entry, including the file fingerprint
+        meta: dict
+            JSON serializable metadata to store alongside the arrays
+        arrays: dict
+            Named arrays to store
+        """
+        entry = os.path.join(self.directory, self._key(params))
+        if os.path.isdir(entry):
+            return None
+
+        size = sum(array.nbytes for array in arrays.values())
+        if size > self.max_bytes:
+            self.logger.warning(
+                f"Prepared foundation ({size / 1024**3:.2f} GB) exceeds the cache "
+                f"size limit ({self.max_bytes / 1024**3:.2f} GB) and was not cached."
+            )
+            return None
+
+        tmp_entry = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_entry, f"{name}.npy"), array)
+            record = dict(meta, params=params, arrays=list(arrays))
+            with open(os.path.join(tmp_entry, _META_FILE), "w", encoding="utf_8") as f:
+                json.dump(record, f, default=str)
+            os.rename(tmp_entry, entry)
+        except OSError:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            if not os.path.isdir(entry):
+                raise
+        self.logger.debug(f"Stored prepared foundation in cache: {entry}")
+        self._evict()
+
+    def _evict(self) -> None:
+        """
+        Removes least recently used entries until the total size of the
+        prepared entries is within the cache size limit.
+        """
+        entries: List[Tuple[float, int, str]] = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            meta_path = os.path.join(entry, _META_FILE)
+            if name.startswith(".") or not os.path.isfile(meta_path):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry)
+            )
+            entries.append((os.path.getmtime(meta_path), size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.logger.debug(f"Evicting foundation cache entry: {entry}")
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -0,0 +1,260 @@
+"""
+ingest.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+This module contains a single-pass ingestion layer for point cloud files.
+Decompressing a large LAZ file dominates the cost of preparing it, yet the
+pipeline needs the file for several purposes: estimating its point spacing,
+gridding it to a DSM and, for the AOI, applying the solved registration. The
+ingestion layer streams the file from the PDAL reader once and, in that pass,
+
+* records the point count and bounds,
+* estimates the average point spacing from an occupancy grid, in the manner of
+  PDAL's filters.hexbin stage,
+* grids the points to a DSM when the pipeline resolution is already known, and
+* optionally spools the chunks to .npy files in a temporary directory, which
+  later stages memory map instead of reading the file again. Only the
+  dimensions a later stage needs are spooled: the coordinates for gridding a
+  foundation, every dimension for writing the registered AOI, followed by
+  zeroed dimensions for the ICP residuals if they are saved, so the
+  registration and the residuals are written into the spooled points rather
+  than into copies of them.
+
+This module contains the following class:
+
+* PointCloudIngest - class for reading a point cloud file in a single pass
+"""
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import weakref
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+import pdal
+from codem.preprocessing.gridding import MaxGrid
+
+
+# points read from the PDAL reader per chunk
+CHUNK_SIZE = 1_000_000
+
+# dimensions of the ICP residuals saved with the registered AOI points
+RESIDUAL_DIMENSIONS = (
+    ("ResidualX", np.double),
+    ("ResidualY", np.double),
+    ("ResidualZ", np.double),
+    ("ResidualHoriz", np.double),
+    ("Residual3D", np.double),
+)
+
+# edge length of the hexagons used by filters.hexbin to estimate point spacing,
+# and the side of a square of the same area
+_HEXBIN_EDGE = 25.0
+_OCCUPANCY_CELL = math.sqrt(3 * math.sqrt(3) / 2) * _HEXBIN_EDGE
+
+
+class PointCloudIngest:
+    """
+    Reads a point cloud file once and keeps what later stages need from it.
+
+    Parameters
+    ----------
+    file_path: str
+        Path to the point cloud file
+
+    Methods
+    -------
+    read
+    chunks
+    point_spacing
+    reader_metadata
+    close
+    """
+
+    def __init__(self, file_path: str) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.file = file_path
+        self.pipeline = pdal.Reader(file_path).pipeline()
+        self.info: Dict[str, Any] = next(iter(self.pipeline.quickinfo.values()))
+        self.count = 0
+        self.bounds: Optional[Tuple[float, float, float, float]] = None
+        self.metadata: Dict[str, Any] = {}
+        self.grid: Optional[MaxGrid] = None
+        self.spool_dir: Optional[str] = None
+        self._spool_files: List[str] = []
+        self._occupied = 0
+
+    @property
+    def header_bounds(self) -> Tuple[float, float, float, float]:
+        """
+        Minimum x, minimum y, maximum x and maximum y recorded in the file header
+        """
+        bounds = self.info["bounds"]
+        return bounds["minx"], bounds["miny"], bounds["maxx"], bounds["maxy"]
+
+    @property
+    def spooled(self) -> bool:
+        return self.spool_dir is not None
+
+    def read(
+        self,
+        grid: Optional[MaxGrid] = None,
+        scale: float = 1.0,
+        spool: bool = False,
+        dimensions: Optional[Sequence[str]] = None,
+        extra_dimensions: Sequence[Tuple[str, Any]] = (),
+        spool_dir: Optional[str] = None,
+    ) -> None:
+        """
+        Streams the file from the PDAL reader.
+
+        Parameters
+        ----------
+        grid: Optional[MaxGrid]
+            Grid to insert the points into while reading
+        scale: float
+            Factor applied to the coordinates inserted into the grid
+        spool: bool
+            Whether to keep the points in a temporary directory for later stages
+        dimensions: Optional[Sequence[str]]
+            Dimensions of the points to spool; if None, all of them are spooled
+        extra_dimensions: Sequence[Tuple[str, Any]]
+            Names and types of zeroed dimensions appended to the spooled points
+        spool_dir: Optional[str]
+            Directory in which the spool is created; if None, the system
+            temporary directory
+        """
+        min_x, min_y, max_x, max_y = self.header_bounds
+        occupancy = np.zeros(
+            (
+                int((max_y - min_y) / _OCCUPANCY_CELL) + 1,
+                int((max_x - min_x) / _OCCUPANCY_CELL) + 1,
+            ),
+            dtype=bool,
+        )
+
+        if spool:
+            self.spool_dir = tempfile.mkdtemp(prefix="codem-ingest-", dir=spool_dir)
+            self._finalizer = weakref.finalize(
+                self, shutil.rmtree, self.spool_dir, True
+            )
+
+        lower = np.full(2, np.inf)
+        upper = np.full(2, -np.inf)
+        iterator = self.pipeline.iterator(chunk_size=CHUNK_SIZE)
+        for chunk in iterator:
+            if chunk.shape[0] == 0:
+                continue
+            x = chunk["X"]
+            y = chunk["Y"]
+            lower = np.minimum(lower, (x.min(), y.min()))
+            upper = np.maximum(upper, (x.max(), y.max()))
+
+            row = np.clip(
+                ((y - min_y) / _OCCUPANCY_CELL).astype(np.int64),
+                0,
+                occupancy.shape[0] - 1,
+            )
+            col = np.clip(
+                ((x - min_x) / _OCCUPANCY_CELL).astype(np.int64),
+                0,
+                occupancy.shape[1] - 1,
+            )
+            occupancy[row, col] = True
+
+            if grid is not None:
+                grid.insert(x * scale, y * scale, chunk["Z"] * scale)
+            if self.spool_dir is not None:
+                path = os.path.join(
+                    self.spool_dir, f"chunk_{len(self._spool_files):06d}.npy"
+                )
+                names = chunk.dtype.names if dimensions is None else dimensions
+                dtype = np.dtype(
+                    [(name, chunk.dtype[name]) for name in names]
+                    + list(extra_dimensions)
+                )
+                spooled = np.lib.format.open_memmap(
+                    path, mode="w+", dtype=dtype, shape=chunk.shape
+                )
+                for name in names:
+                    spooled[name] = chunk[name]
+                spooled.flush()
+                del spooled
+                self._spool_files.append(path)
+            self.count += chunk.shape[0]
+
+        if self.count == 0:
+            raise RuntimeError(f"{os.path.basename(self.file)} contains no points.")
+        self.bounds = (lower[0], lower[1], upper[0], upper[1])
+        self._occupied = int(np.count_nonzero(occupancy))
+        self.grid = grid
+
+        metadata = iterator.metadata
+        if isinstance(metadata, str):
+            metadata = json.loads(metadata)
+        self.metadata = metadata.get("metadata", metadata)
+
+    def chunks(self, writable: bool = False) -> Iterator[np.ndarray]:
+        """
+        Yields the point chunks, memory mapped from the spool if available and
+        otherwise read from the file again.
+
+        Parameters
+        ----------
+        writable: bool
+            Whether changes to the spooled chunks are written to the spool
+
+        Returns
+        -------
+        chunks: Iterator[np.array]
+            Structured arrays of points
+        """
+        if self.spool_dir is None:
+            self.logger.debug(f"Reading {os.path.basename(self.file)} again.")
+            yield from pdal.Reader(self.file).pipeline().iterator(chunk_size=CHUNK_SIZE)
+            return None
+        for path in self._spool_files:
+            yield np.load(path, mmap_mode="r+" if writable else "r")
+
+    def point_spacing(self) -> float:
+        """
+        Estimates the average point spacing as the square root of the occupied
+        area per point, where the occupied area is the total area of the
+        occupancy grid cells containing at least one point.
+
+        Returns
+        -------
+        spacing: float
+            Average point spacing in the linear unit of the file
+        """
+        area = self._occupied * _OCCUPANCY_CELL**2
+        return math.sqrt(area / self.count)
+
+    def reader_metadata(self) -> Dict[str, Any]:
+        """
+        Returns the metadata of the reader stage recorded during the pass.
+        """
+        readers = [val for key, val in self.metadata.items() if "readers" in key]
+        if not readers:
+            return {}
+        reader: Dict[str, Any] = readers[0]
+        return reader
+
+    def close(self) -> None:
+        """
+        Removes the spooled points.
+        """
+        if self.spool_dir is not None:
+            self._finalizer()
+            self.spool_dir = None
+            self._spool_files = []
@@ -0,0 +1,129 @@
+"""
+normals.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+This module contains a raster-native normal vector generator. Point clouds
+derived from DSMs lie on a regular grid, so the plane fit to each point's
+neighbourhood reduces to fixed convolutions of the raster, with no nearest
+neighbour search.
+
+The raster is processed in blocks of rows, each extended by one row above and
+below, so the temporary arrays are bounded by the block size rather than the
+raster size.
+
+This module contains the following methods:
+
+* grid_normals - normal vectors from least squares plane fits on a raster
+* masked_grid_normals - the same normal vectors of the valid cells only
+"""
+from typing import Iterator
+from typing import Tuple
+
+import cv2
+import numpy as np
+import rasterio
+
+
+# least squares slope along the columns of a plane fit to a 3x3 neighbourhood
+_SLOPE_KERNEL = np.array([[-1, 0, 1], [-1, 0, 1], [-1, 0, 1]], dtype=np.double) / 6
+
+# raster cells whose normal vectors are computed per block
+BLOCK_SIZE = 1 << 20
+
+
+def _normal_blocks(
+    surface: np.ndarray, transform: rasterio.Affine
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Yields the first row and the normal vectors of each block of rows of a
+    raster surface. Blocks are extended by the neighbouring rows, or by linear
+    extrapolation on the border of the raster, so they match the normals of
+    the whole raster.
+    """
+    # the pixel slopes are the object space slopes times the transform's
+    # linear part, transposed
+    jacobian = np.array([[transform.a, transform.b], [transform.d, transform.e]])
+    inverse = np.linalg.inv(jacobian)
+
+    rows, cols = surface.shape
+    block = max(1, BLOCK_SIZE // max(1, cols))
+    for first in range(0, rows, block):
+        last = min(first + block, rows)
+        top = max(first - 1, 0)
+        bottom = min(last + 1, rows)
+        padded = np.pad(
+            np.asarray(surface[top:bottom], dtype=np.double),
+            ((int(first == 0), int(last == rows)), (1, 1)),
+            mode="reflect",
+            reflect_type="odd",
+        )
+        dz_du = cv2.filter2D(padded, -1, _SLOPE_KERNEL)[1:-1, 1:-1]
+        dz_dv = cv2.filter2D(padded, -1, _SLOPE_KERNEL.T)[1:-1, 1:-1]
+
+        normals = np.empty(dz_du.shape + (3,), dtype=np.double)
+        normals[..., 0] = -(inverse[0, 0] * dz_du + inverse[1, 0] * dz_dv)
+        normals[..., 1] = -(inverse[0, 1] * dz_du + inverse[1, 1] * dz_dv)
+        normals[..., 2] = 1.0
+        normals /= np.linalg.norm(normals, axis=2, keepdims=True)
+        yield first, normals
+
+
+def grid_normals(surface: np.ndarray, transform: rasterio.Affine) -> np.ndarray:
+    """
+    Computes unit normal vectors of a raster surface by fitting a plane to the
+    3x3 neighbourhood of every cell, which matches a nearest neighbour plane
+    fit with nine neighbours on a regular grid. The raster is extended by
+    linear extrapolation so that cells on its border are fit with the same
+    kernel. Slopes are mapped from pixel to object space through the transform
+    and the normals point up, as in PDAL's filters.normal stage.
+
+    Parameters
+    ----------
+    surface: np.array
+        Array of elevations without voids
+    transform: rasterio.Affine
+        Transform from pixel to object space coordinates
+
+    Returns
+    -------
+    normals: np.array
+        Array of shape (rows, cols, 3) with the x, y and z components of the
+        normal vector of each cell
+    """
+    normals = np.empty(surface.shape + (3,), dtype=np.double)
+    for first, block in _normal_blocks(surface, transform):
+        normals[first : first + block.shape[0]] = block
+    return normals
+
+
+def masked_grid_normals(
+    surface: np.ndarray, transform: rasterio.Affine, mask: np.ndarray
+) -> np.ndarray:
+    """
+    Computes the unit normal vectors of grid_normals for the valid cells of a
+    raster surface only, in row-major order, without holding the normal
+    vectors of the whole raster.
+
+    Parameters
+    ----------
+    surface: np.array
+        Array of elevations without voids
+    transform: rasterio.Affine
+        Transform from pixel to object space coordinates
+    mask: np.array
+        Boolean array flagging the valid cells
+
+    Returns
+    -------
+    normals: np.array
+        Array of shape (N, 3) with the normal vector of each valid cell
+    """
+    mask = np.asarray(mask, dtype=bool)
+    normals = np.empty((int(np.count_nonzero(mask)), 3), dtype=np.double)
+    start = 0
+    for first, block in _normal_blocks(surface, transform):
+        valid = block[mask[first : first + block.shape[0]]]
+        normals[start : start + valid.shape[0]] = valid
+        start += valid.shape[0]
+    return normals
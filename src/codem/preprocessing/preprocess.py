@@ -29,6 +29,7 @@ import logging
 import math
 import os
 import tempfile
+from typing import Any
 from typing import Dict
 from typing import Optional
 from typing import Tuple
@@ -42,7 +43,18 @@ import rasterio.fill
 import rasterio.transform
 import rasterio.warp
 import trimesh
+from codem.lib.georeference import raster_to_xyz
 from codem.lib.log import Log
+from codem.preprocessing.bandpass import histogram_percentiles
+from codem.preprocessing.bandpass import pyramid_blur
+from codem.preprocessing.cache import fingerprint
+from codem.preprocessing.cache import FoundationCache
+from codem.preprocessing.gridding import MaxGrid
+from codem.preprocessing.infill import nearest_fill
+from codem.preprocessing.infill import pyramid_fill
+from codem.preprocessing.ingest import PointCloudIngest
+from codem.preprocessing.ingest import RESIDUAL_DIMENSIONS
+from codem.preprocessing.normals import masked_grid_normals
 from rasterio import windows
 from rasterio.coords import BoundingBox
 from rasterio.coords import disjoint_bounds
@@ -56,19 +68,47 @@ class CodemParameters(TypedDict):
     FND_FILE: str
     AOI_FILE: str
     MIN_RESOLUTION: float
+    GRIDDING_ENGINE: str
+    POINTCLOUD_SPOOL: bool
+    POINTCLOUD_SPOOL_DIR: Optional[str]
     DSM_AKAZE_THRESHOLD: float
+    DSM_AKAZE_TILE_SIZE: int
+    DSM_KEYPOINT_BUDGET: int
+    DSM_PYRAMID_LEVELS: int
     DSM_LOWES_RATIO: float
+    DSM_MATCH_MODE: str
+    DSM_MATCH_RADIUS: float
+    DSM_MATCH_ENGINE: str
+    DSM_MATCH_IMG_SIZE: int
     DSM_RANSAC_MAX_ITER: int
     DSM_RANSAC_THRESHOLD: float
+    DSM_RANSAC_CONFIDENCE: float
+    DSM_RANSAC_ENGINE: str
+    DSM_COARSE_ENGINE: str
+    DSM_PHASE_ROTATION: bool
+    DSM_PHASE_MIN_RESPONSE: float
     DSM_SOLVE_SCALE: bool
+    DSM_SOLVE_TILT: bool
     DSM_STRONG_FILTER: float
     DSM_WEAK_FILTER: float
+    DSM_INFILL_ENGINE: str
+    DSM_NORMALIZE_ENGINE: str
+    DSM_POINTS_FLOAT32: bool
     ICP_ANGLE_THRESHOLD: float
     ICP_DISTANCE_THRESHOLD: float
     ICP_MAX_ITER: int
     ICP_RMSE_THRESHOLD: float
     ICP_ROBUST: bool
     ICP_SOLVE_SCALE: bool
+    ICP_NORMALS_ENGINE: str
+    ICP_CORRESPONDENCE: str
+    ICP_GRID_RADIUS: int
+    ICP_LEVELS: int
+    ICP_LEVEL_ITER: int
+    ICP_SAMPLING: str
+    ICP_SAMPLE_SIZE: int
+    ICP_ACCELERATE: bool
+    ICP_FLOAT32: bool
     OFFSET_X: str
     OFFSET_Y: str
     OFFSET_Z: str
@@ -81,6 +121,9 @@ class CodemParameters(TypedDict):
     TIGHT_SEARCH: bool
     LOG_TYPE: str
     WEBSOCKET_URL: str
+    CACHE_DIR: Optional[str]
+    CACHE_MAX_SIZE: float
+    WORKERS: int
     log: Log
 
 
@@ -130,9 +173,10 @@ class GeoData:
         self.file = config["FND_FILE"] if fnd else config["AOI_FILE"]
         self.fnd = fnd
         self._type = "undefined"
-        self.nodata = None
+        self.nodata: Optional[float] = None
         self.dsm = np.empty((0, 0), dtype=np.double)
-        self.point_cloud = np.empty((0, 0), dtype=np.double)
+        self.point_cloud: np.ndarray = np.empty((0, 0), dtype=np.double)
+        self.origin = np.zeros(3, dtype=np.double)
         self.crs = None
         self.transform: Optional[rasterio.Affine] = None
         self.area_or_point = "Undefined"
@@ -148,6 +192,8 @@ class GeoData:
         self.config = config
         self.bound_slices: Optional[Tuple[slice, slice]] = None
         self.window: Optional[windows.Window] = None
+        self.cache = FoundationCache.from_config(config) if fnd else None
+        self._restored = False
 
     @property
     def type(self) -> str:
@@ -232,9 +278,10 @@ class GeoData:
 
     def _infill(self) -> None:
         """
-        Infills pixels flagged as invalid (via the nodata value or NaN values)
-        via rasterio's inverse distance weighting interpolation. Necessary to
-        mitigate spurious feature detection.
+        Infills pixels flagged as invalid (via the nodata value or NaN values).
+        Necessary to mitigate spurious feature detection. The DSM_INFILL_ENGINE
+        option selects a single-pass pyramid or nearest valid value fill, or
+        repeated passes of rasterio's inverse distance weighting interpolation.
         """
         dsm_array = np.array(self.dsm)
         if self.nodata is not None:
@@ -247,11 +294,24 @@ class GeoData:
 
         infilled = np.copy(self.dsm)
         mask = self._get_nodata_mask(infilled)
-        infill_mask = np.copy(mask)
 
-        while np.sum(infill_mask) < infill_mask.size:
-            infilled = rasterio.fill.fillnodata(infilled, mask=infill_mask)
-            infill_mask = self._get_nodata_mask(infilled)
+        engine = self.config["DSM_INFILL_ENGINE"]
+        if engine == "idw":
+            infill_mask = np.copy(mask)
+            while np.sum(infill_mask) < infill_mask.size:
+                infilled = rasterio.fill.fillnodata(infilled, mask=infill_mask)
+                infill_mask = self._get_nodata_mask(infilled)
+            count = int(mask.size - np.count_nonzero(mask))
+        elif engine == "nearest":
+            infilled, count = nearest_fill(infilled, mask.astype(bool))
+        else:
+            infilled, count = pyramid_fill(infilled, mask.astype(bool))
+
+        tag = ["AOI", "Foundation"][int(self.fnd)]
+        self.logger.debug(
+            f"Infilled {count} of {mask.size} pixels in {tag}-{self.type.upper()} "
+            f"with the {engine} engine."
+        )
         self.infilled = infilled
         self.nodata_mask = mask
 
@@ -260,20 +320,30 @@ class GeoData:
         Suppresses high frequency information and removes long wavelength
         topography with a bandpass filter. Normalizes the result to fit in an
         8-bit range. We scale the strong and weak filter sizes to convert them
-        from object space distance to pixels.
+        from object space distance to pixels. The pyramid engine computes wide
+        blurs on decimated pyramid levels and the clipping percentiles from a
+        histogram.
         """
         if self.transform is None:
             raise RuntimeError(
                 "self.transform is not initialized, you run the prep() method?"
             )
         scale = np.sqrt(self.transform[0] ** 2 + self.transform[1] ** 2)
-        weak_filtered = cv2.GaussianBlur(self.infilled, (0, 0), self.weak_size / scale)
-        strong_filtered = cv2.GaussianBlur(
-            self.infilled, (0, 0), self.strong_size / scale
-        )
-        bandpassed = weak_filtered - strong_filtered
-        low = np.percentile(bandpassed, 1)
-        high = np.percentile(bandpassed, 99)
+        if self.config["DSM_NORMALIZE_ENGINE"] == "pyramid":
+            weak_filtered = pyramid_blur(self.infilled, self.weak_size / scale)
+            strong_filtered = pyramid_blur(self.infilled, self.strong_size / scale)
+            bandpassed = weak_filtered - strong_filtered
+            low, high = histogram_percentiles(bandpassed, (1, 99))
+        else:
+            weak_filtered = cv2.GaussianBlur(
+                self.infilled, (0, 0), self.weak_size / scale
+            )
+            strong_filtered = cv2.GaussianBlur(
+                self.infilled, (0, 0), self.strong_size / scale
+            )
+            bandpassed = weak_filtered - strong_filtered
+            low = np.percentile(bandpassed, 1)
+            high = np.percentile(bandpassed, 99)
         clipped = np.clip(bandpassed, low, high)
         normalized = (clipped - low) / (high - low)
         quantized = (255 * normalized).astype(np.uint8)
@@ -285,35 +355,46 @@ class GeoData:
         AREA_OR_POINT tag set to 'Area', then we adjust the pixel values by 0.5
         pixel. This is because we assume the DSM elevation value to represent
         the elevation at the center of the pixel, not the upper left corner.
+        Only valid pixels are converted, in blocks of rows written into a
+        preallocated array, so no full-raster coordinate grids are built. If
+        DSM_POINTS_FLOAT32 is set, the points are stored in single precision
+        relative to the upper left corner of the raster, kept in self.origin,
+        as absolute projected coordinates would lose their decimeters.
         """
         if self.transform is None:
             raise RuntimeError(
                 "self.transform needs to be set to a rasterio.Affine object"
             )
-        rows = np.arange(self.dsm.shape[0], dtype=np.float64)
-        cols = np.arange(self.dsm.shape[1], dtype=np.float64)
-        uu, vv = np.meshgrid(cols, rows)
-        u = np.reshape(uu, -1)
-        v = np.reshape(vv, -1)
-
-        if self.area_or_point == "Area":
-            u += 0.5
-            v += 0.5
-
-        xy = np.asarray(self.transform * (u, v))
-        z = np.reshape(self.dsm, -1)
-        xyz = np.vstack((xy, z)).T
-
-        mask = np.reshape(np.array(self.nodata_mask, dtype=bool), -1)
-        xyz = xyz[mask]
-
-        self.point_cloud = xyz
+        transform = self.transform
+        self.origin = np.zeros(3, dtype=np.double)
+        dtype: type = np.float64
+        if self.config["DSM_POINTS_FLOAT32"]:
+            dtype = np.float32
+            self.origin[0:2] = transform.c, transform.f
+            shift = rasterio.Affine.translation(-transform.c, -transform.f)
+            transform = shift * transform
+        self.point_cloud = raster_to_xyz(
+            self.nodata_mask, transform, self.area_or_point, self.dsm, dtype
+        )
 
     def _generate_vectors(self) -> None:
         """
         Generates normal vectors, required for the ICP registration module, from
-        the point cloud data. PDAL is used for speed.
+        the point cloud data. By default the normals are computed directly on
+        the infilled raster the point cloud was derived from, in blocks of rows
+        and for its valid cells only; PDAL's KNN estimate remains available
+        through ICP_NORMALS_ENGINE.
         """
+        if self.config["ICP_NORMALS_ENGINE"] == "grid":
+            if self.transform is None:
+                raise RuntimeError(
+                    "self.transform needs to be set to a rasterio.Affine object"
+                )
+            self.normal_vectors = masked_grid_normals(
+                self.infilled, self.transform, self.nodata_mask
+            )
+            return None
+
         k = 9
         n_points = self.point_cloud.shape[0]
 
@@ -323,9 +404,9 @@ class GeoData:
             )
         xyz_dtype = np.dtype([("X", np.double), ("Y", np.double), ("Z", np.double)])
         xyz = np.empty(self.point_cloud.shape[0], dtype=xyz_dtype)
-        xyz["X"] = self.point_cloud[:, 0]
-        xyz["Y"] = self.point_cloud[:, 1]
-        xyz["Z"] = self.point_cloud[:, 2]
+        xyz["X"] = self.point_cloud[:, 0] + self.origin[0]
+        xyz["Y"] = self.point_cloud[:, 1] + self.origin[1]
+        xyz["Z"] = self.point_cloud[:, 2] + self.origin[2]
         pipe = [
             {"type": "filters.normal", "knn": k},
         ]
@@ -352,11 +433,132 @@ class GeoData:
     ) -> None:
         raise NotImplementedError
 
+    def _resolve_resolution(self) -> None:
+        """
+        Sets the native resolution and linear units of the data, using the
+        values recorded in the foundation cache when available.
+        """
+        if self.cache is None:
+            self._calculate_resolution()
+            return None
+
+        info = self.cache.load_source(self.file)
+        if info is None:
+            self._calculate_resolution()
+            self.cache.store_source(
+                self.file,
+                {
+                    "native_resolution": self.native_resolution,
+                    "units": self.units,
+                    "units_factor": self.units_factor,
+                    "crs": None if self.crs is None else self.crs.to_wkt(),
+                },
+            )
+            return None
+
+        tag = ["AOI", "Foundation"][int(self.fnd)]
+        self.native_resolution = info["native_resolution"]
+        self.units = info["units"]
+        self.units_factor = info["units_factor"]
+        if info["crs"] is not None:
+            self.crs = CRS.from_wkt(info["crs"])
+        self.logger.info(
+            f"Restored native resolution of {tag}-{self.type.upper()} from cache as: "
+            f"{self.native_resolution:.1f} meters"
+        )
+
+    def _cache_params(self) -> Optional[Dict[str, Any]]:
+        """
+        Returns the parameters that identify the prepared data in the
+        foundation cache, or None if the prepared data cannot be cached. Data
+        clipped for a tight search depends on the AOI and is never cached.
+        """
+        if self.cache is None or self.config["TIGHT_SEARCH"]:
+            return None
+        return {
+            "fingerprint": fingerprint(self.file),
+            "type": self.type,
+            "resolution": self.resolution,
+            "weak_filter": self.weak_size,
+            "strong_filter": self.strong_size,
+            "units": self.units,
+            "units_factor": self.units_factor,
+            "gridding_engine": self.config["GRIDDING_ENGINE"],
+            "infill_engine": self.config["DSM_INFILL_ENGINE"],
+            "normalize_engine": self.config["DSM_NORMALIZE_ENGINE"],
+            "normals_engine": self.config["ICP_NORMALS_ENGINE"],
+            "points_float32": self.config["DSM_POINTS_FLOAT32"],
+        }
+
+    def _restore_prepared(self) -> bool:
+        """
+        Restores prepared data from the foundation cache. The cached arrays are
+        memory mapped, and DSM creation and the prep steps are skipped.
+
+        Returns
+        -------
+        restored: bool
+            True if the prepared data was found in the cache
+        """
+        params = self._cache_params()
+        if self.cache is None or params is None:
+            return False
+        entry = self.cache.load(params)
+        if entry is None:
+            return False
+
+        meta, arrays = entry
+        self.infilled = arrays["infilled"]
+        self.normed = arrays["normed"]
+        self.nodata_mask = arrays["nodata_mask"]
+        self.point_cloud = arrays["point_cloud"]
+        self.origin = np.asarray(meta.get("origin", np.zeros(3)), dtype=np.double)
+        self.normal_vectors = arrays["normal_vectors"]
+        self.transform = rasterio.Affine(*meta["transform"])
+        self.crs = None if meta["crs"] is None else CRS.from_wkt(meta["crs"])
+        self.nodata = meta["nodata"]
+        self.area_or_point = meta["area_or_point"]
+        self._restored = True
+
+        tag = ["AOI", "Foundation"][int(self.fnd)]
+        self.logger.info(f"Restored prepared {tag}-{self.type.upper()} from cache.")
+        return True
+
+    def _store_prepared(self) -> None:
+        """
+        Stores the prepared data in the foundation cache.
+        """
+        params = self._cache_params()
+        if self.cache is None or params is None or self.transform is None:
+            return None
+        meta = {
+            "transform": list(self.transform)[:6],
+            "crs": None if self.crs is None else self.crs.to_wkt(),
+            "nodata": self.nodata,
+            "area_or_point": self.area_or_point,
+            "origin": self.origin.tolist(),
+        }
+        arrays: Dict[str, np.ndarray] = {
+            "infilled": self.infilled,
+            "normed": self.normed,
+            "nodata_mask": self.nodata_mask,
+            "point_cloud": self.point_cloud,
+            "normal_vectors": self.normal_vectors,
+        }
+        self.cache.store(params, meta, arrays)
+
     def prep(self) -> None:
         """
         Prepares data for registration.
         """
         tag = ["AOI", "Foundation"][int(self.fnd)]
+        if self._restored:
+            self.logger.info(
+                f"{tag}-{self.type.upper()} restored from cache, skipping preparation."
+            )
+            self.processed = True
+            return None
+
         self.logger.info(f"Preparing {tag}-{self.type.upper()} for registration.")
         self._infill()
         self._normalize()
@@ -364,6 +566,7 @@ class GeoData:
 
         if self.fnd:
             self._generate_vectors()
+            self._store_prepared()
 
         self.processed = True
 
@@ -390,7 +593,7 @@ class DSM(GeoData):
     def __init__(self, config: CodemParameters, fnd: bool) -> None:
         super().__init__(config, fnd)
         self.type = "dsm"
-        self._calculate_resolution()
+        self._resolve_resolution()
 
     def _create_dsm(
         self, resample: bool = True, fallback_crs: Optional[CRS] = None
@@ -608,7 +811,8 @@ class PointCloud(GeoData):
     def __init__(self, config: CodemParameters, fnd: bool) -> None:
         super().__init__(config, fnd)
         self.type = "pcloud"
-        self._calculate_resolution()
+        self.ingest: Optional[PointCloudIngest] = None
+        self._resolve_resolution()
 
     def _create_dsm(
         self, resample: bool = True, fallback_crs: Optional[CRS] = None
@@ -621,6 +825,10 @@ class PointCloud(GeoData):
             f"Extracting DSM from {tag}-{self.type.upper()} with resolution of: {self.resolution} meters"
         )
 
+        if self.config["GRIDDING_ENGINE"] == "memory":
+            self._grid_points()
+            return None
+
         # Scale matrix formatted for PDAL consumption
         units_transform = (
             f"{self.units_factor} 0 0 0 "
@@ -650,21 +858,76 @@ class PointCloud(GeoData):
         os.close(file_handle)
         os.remove(tmp_file)
 
+    def _grid_points(self) -> None:
+        """
+        Rasters the point cloud to a DSM in memory. Points are max-binned onto
+        the same grid writers.gdal would produce, avoiding a temporary raster
+        file. The grid built while ingesting the file is used when it has the
+        pipeline resolution; otherwise the points are streamed from the
+        ingestion spool, or from the PDAL reader if they were not spooled.
+        """
+        if self.ingest is None:
+            self.ingest = PointCloudIngest(self.file)
+        ingest = self.ingest
+
+        grid = ingest.grid
+        if grid is None or grid.resolution != self.resolution:
+            grid = self._new_grid(self.resolution)
+            for chunk in ingest.chunks():
+                grid.insert(
+                    chunk["X"] * self.units_factor,
+                    chunk["Y"] * self.units_factor,
+                    chunk["Z"] * self.units_factor,
+                )
+        dsm, transform = grid.result()
+
+        if self.window is not None:
+            window = self.window.intersection(
+                windows.Window(0, 0, dsm.shape[1], dsm.shape[0])
+            )
+            dsm = dsm[window.toslices()]
+            transform = windows.transform(window, transform)
+
+        try:
+            self.crs = CRS.from_string(ingest.info["srs"]["horizontal"])
+        except (CRSError, KeyError):
+            self.crs = None
+        self.dsm = dsm
+        self.transform = transform
+        self.nodata = grid.nodata
+        self.area_or_point = "Area"
+
+    def _new_grid(self, resolution: float) -> MaxGrid:
+        """
+        Creates an empty grid in meters covering the header bounds of the file.
+        """
+        if self.ingest is None:
+            raise RuntimeError("The point cloud file has not been opened.")
+        min_x, min_y, max_x, max_y = self.ingest.header_bounds
+        return MaxGrid(
+            (
+                min_x * self.units_factor,
+                min_y * self.units_factor,
+                max_x * self.units_factor,
+                max_y * self.units_factor,
+            ),
+            resolution,
+        )
+
     def _calculate_resolution(self) -> None:
         """
-        Calculates point cloud average point spacing.
+        Calculates point cloud average point spacing. The file is read once by
+        the ingestion layer, which also grids the points when the pipeline
+        resolution is fixed by MIN_RESOLUTION and, if POINTCLOUD_SPOOL is set,
+        keeps the points for DSM creation and for applying the registration in
+        POINTCLOUD_SPOOL_DIR, or in OUTPUT_DIR if it is unset.
         """
         tag = ["AOI", "Foundation"][int(self.fnd)]
 
-        pipeline = pdal.Reader(self.file)
-        pipeline |= pdal.Filter.hexbin(edge_size=25, threshold=1)
-        pipeline.execute()
-
-        metadata = pipeline.metadata["metadata"]
-        reader_metadata = [val for key, val in metadata.items() if "readers" in key]
+        self.ingest = PointCloudIngest(self.file)
         try:
-            crs = CRS.from_string(reader_metadata[0]["srs"]["horizontal"])
-        except (CRSError, IndexError, KeyError):
+            crs = CRS.from_string(self.ingest.info["srs"]["horizontal"])
+        except (CRSError, KeyError):
             crs = None
         if crs is None:
             self.logger.warning(
@@ -684,9 +947,30 @@ class PointCloud(GeoData):
             )
             self.units_factor = crs.linear_units_factor[1]
             self.units = crs.linear_units
-        self.native_resolution = (
-            self.units_factor * metadata["filters.hexbin"]["avg_pt_spacing"]
+
+        grid = None
+        memory = self.config["GRIDDING_ENGINE"] == "memory"
+        if memory and not math.isnan(self.config["MIN_RESOLUTION"]):
+            grid = self._new_grid(self.config["MIN_RESOLUTION"])
+        # the AOI points are reused when applying the registration, while only
+        # the coordinates of the foundation are needed to grid it
+        spool = self.config["POINTCLOUD_SPOOL"] and (
+            not self.fnd or (memory and grid is None)
+        )
+        dimensions = ("X", "Y", "Z") if self.fnd else None
+        # the AOI points also hold the residuals if they are saved with them
+        residuals = not self.fnd and self.config["ICP_SAVE_RESIDUALS"]
+        extra_dimensions = RESIDUAL_DIMENSIONS if residuals else ()
+        self.ingest.read(
+            grid=grid,
+            scale=self.units_factor,
+            spool=spool,
+            dimensions=dimensions,
+            extra_dimensions=extra_dimensions,
+            spool_dir=self.config["POINTCLOUD_SPOOL_DIR"] or self.config["OUTPUT_DIR"],
         )
+
+        self.native_resolution = self.units_factor * self.ingest.point_spacing()
         self.logger.info(
             f"Calculated native resolution for {tag}-{self.type.upper()} as: "
             f"{self.native_resolution :.1f} meters"
@@ -701,7 +985,7 @@ class Mesh(GeoData):
     def __init__(self, config: CodemParameters, fnd: bool) -> None:
         super().__init__(config, fnd)
         self.type = "mesh"
-        self._calculate_resolution()
+        self._resolve_resolution()
 
     def _create_dsm(
         self, resample: bool = True, fallback_crs: Optional[CRS] = None
@@ -0,0 +1,110 @@
+"""
+anderson.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+This module contains an Anderson acceleration of the ICP fixed-point
+iteration. Each ICP iteration maps the current cumulative transformation to
+the next one; near convergence the steps shrink slowly, as every iteration
+only removes part of the remaining misalignment. Anderson acceleration
+extrapolates from the last few iterations to a transformation closer to the
+fixed point, so fewer correspondence searches are needed.
+
+Transformations are parameterized by a rotation vector, a translation and the
+logarithm of the scale factor, in which the ICP map is close to linear near
+its fixed point. The extrapolated transformation is not guaranteed to be
+better, so the caller must check it and reset the history when it is not.
+
+This module contains the following class:
+
+* AndersonAcceleration - extrapolates a sequence of ICP transformations
+"""
+from typing import List
+
+import numpy as np
+from scipy import spatial
+
+
+# previous iterations combined by the extrapolation
+DEPTH = 5
+
+
+def _to_vector(transform: np.ndarray) -> np.ndarray:
+    scale = np.linalg.norm(transform[0:3, 0])
+    vector = np.empty(7, dtype=np.double)
+    vector[0:3] = spatial.transform.Rotation.from_matrix(
+        transform[0:3, 0:3] / scale
+    ).as_rotvec()
+    vector[3:6] = transform[0:3, 3]
+    vector[6] = np.log(scale)
+    return vector
+
+
+def _to_transform(vector: np.ndarray) -> np.ndarray:
+    transform = np.eye(4)
+    transform[0:3, 0:3] = (
+        np.exp(vector[6])
+        * spatial.transform.Rotation.from_rotvec(vector[0:3]).as_matrix()
+    )
+    transform[0:3, 3] = vector[3:6]
+    return transform
+
+
+class AndersonAcceleration:
+    """
+    Anderson acceleration, in the type II form of Walker and Ni, of a sequence
+    of 4x4 similarity transformations produced by a fixed-point iteration.
+
+    Parameters
+    ----------
+    depth: int
+        Number of previous iterations combined by the extrapolation
+
+    Methods
+    --------
+    reset
+    step
+    """
+
+    def __init__(self, depth: int = DEPTH) -> None:
+        self.depth = depth
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Discards the history of previous iterations.
+        """
+        self._g: List[np.ndarray] = []
+        self._f: List[np.ndarray] = []
+
+    def step(self, current: np.ndarray, mapped: np.ndarray) -> np.ndarray:
+        """
+        Records an iteration and extrapolates the next transformation.
+
+        Parameters
+        ----------
+        current: np.array
+            4x4 transformation the iteration started from
+        mapped: np.array
+            4x4 transformation the iteration produced
+
+        Returns
+        -------
+        transform: np.array
+            4x4 extrapolated transformation, equal to mapped until a previous
+            iteration has been recorded
+        """
+        g = _to_vector(mapped)
+        f = g - _to_vector(current)
+        self._g.append(g)
+        self._f.append(f)
+        if len(self._f) > self.depth + 1:
+            del self._g[0]
+            del self._f[0]
+        if len(self._f) < 2:
+            return mapped
+
+        delta_g = np.diff(np.array(self._g), axis=0).T
+        delta_f = np.diff(np.array(self._f), axis=0).T
+        theta = np.linalg.lstsq(delta_f, f, rcond=None)[0]
+        return _to_transform(g - delta_g @ theta)
@@ -13,6 +13,9 @@ This module contains the following class:
 import json
 import logging
 import os
+from typing import Any
+from typing import Dict
+from typing import List
 from typing import Optional
 from typing import Tuple
 from typing import Union
@@ -23,14 +26,83 @@ import pdal
 import rasterio
 import trimesh
 from codem import __version__
+from codem.lib.georeference import raster_to_xyz
+from codem.preprocessing.ingest import RESIDUAL_DIMENSIONS
 from codem.preprocessing.preprocess import CodemParameters
 from codem.preprocessing.preprocess import GeoData
+from codem.preprocessing.preprocess import PointCloud
 from codem.preprocessing.preprocess import RegistrationParameters
 from matplotlib.tri import LinearTriInterpolator
 from matplotlib.tri import Triangulation
 from numpy.lib import recfunctions as rfn
 
 
+# header fields writers.las carries over from a reader with forward="all"
+_FORWARDED_HEADER = (
+    "minor_version",
+    "dataformat_id",
+    "global_encoding",
+    "project_id",
+    "system_id",
+    "software_id",
+    "creation_doy",
+    "creation_year",
+    "filesource_id",
+    "scale_x",
+    "scale_y",
+    "scale_z",
+    "offset_x",
+    "offset_y",
+    "offset_z",
+)
+
+# VLRs (user id, record id or None for all) writers.las creates itself
+_WRITER_VLRS = (("LASF_Projection", None), ("LASF_Spec", 4), ("laszip encoded", None))
+
+
+def _forwarded_header(reader_metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Reproduces the writers.las options that forward="all" would set from the
+    recorded metadata of a reader: its header fields and the VLRs that the
+    writer does not create itself.
+
+    Parameters
+    ----------
+    reader_metadata: dict
+        Metadata of the reader stage
+
+    Returns
+    -------
+    options: Optional[dict]
+        writers.las options, or None if a VLR was recorded without its data
+    """
+    options = {
+        key: reader_metadata[key] for key in _FORWARDED_HEADER if key in reader_metadata
+    }
+    keys = [key for key in reader_metadata if key.startswith("vlr_")]
+    vlrs = []
+    for key in sorted(keys, key=lambda key: int(key[4:])):
+        vlr = reader_metadata[key]
+        if not all(field in vlr for field in ("user_id", "record_id", "data")):
+            return None
+        if any(
+            vlr["user_id"] == user_id and record_id in (None, vlr["record_id"])
+            for user_id, record_id in _WRITER_VLRS
+        ):
+            continue
+        vlrs.append(
+            {
+                "user_id": vlr["user_id"],
+                "record_id": vlr["record_id"],
+                "description": vlr.get("description", ""),
+                "data": vlr["data"],
+            }
+        )
+    if vlrs:
+        options["vlrs"] = vlrs
+    return options
+
+
 class ApplyRegistration:
     """
     A class to apply the solved registration to the original AOI data file.
@@ -55,10 +127,13 @@ class ApplyRegistration:
     Methods
     -------
     get_registration_transformation
+    _registration_matrix
     apply
     _apply_dsm
     _apply_mesh
     _apply_pointcloud
+    _registered_chunks
+    _residual_interpolators
     _interpolate_residuals
     """
 
@@ -83,6 +158,7 @@ class ApplyRegistration:
         self.aoi_units_factor = aoi_obj.units_factor
         self.aoi_type = aoi_obj.type
         self.aoi_area_or_point = aoi_obj.area_or_point
+        self.aoi_ingest = aoi_obj.ingest if isinstance(aoi_obj, PointCloud) else None
         self.registration_transform = registration_parameters["matrix"]
         self.registration_rmse = registration_parameters["rmse_3d"]
         self.residual_vectors = residual_vectors
@@ -112,14 +188,7 @@ class ApplyRegistration:
             np.ndarray : Registration matrix
             dict     : PDAL filters.transformation stage with SRS overide if available
         """
-        aoi_to_meters = np.eye(4) * self.aoi_units_factor
-        aoi_to_meters[3, 3] = 1
-        meters_to_fnd = np.eye(4) * (1 / self.fnd_units_factor)
-        meters_to_fnd[3, 3] = 1
-
-        aoi_to_fnd_array: np.ndarray = (
-            meters_to_fnd @ self.registration_transform @ aoi_to_meters
-        )
+        aoi_to_fnd_array = self._registration_matrix()
 
         if self.aoi_type == "mesh":
             return aoi_to_fnd_array
@@ -133,6 +202,21 @@ class ApplyRegistration:
             )
             return registration_transformation
 
+    def _registration_matrix(self) -> np.ndarray:
+        """
+        Generates the 4x4 transformation matrix from the AOI to FND coordinate
+        system, accommodating linear unit differences.
+        """
+        aoi_to_meters = np.eye(4) * self.aoi_units_factor
+        aoi_to_meters[3, 3] = 1
+        meters_to_fnd = np.eye(4) * (1 / self.fnd_units_factor)
+        meters_to_fnd[3, 3] = 1
+
+        aoi_to_fnd_array: np.ndarray = (
+            meters_to_fnd @ self.registration_transform @ aoi_to_meters
+        )
+        return aoi_to_fnd_array
+
     def apply(self) -> None:
         """
         Call the appropriate registration function depending on data type
@@ -220,40 +304,24 @@ class ApplyRegistration:
                     area_or_point = "Area"
                 profile = src.profile
 
-            rows = np.arange(dsm.shape[0], dtype=np.float64)
-            cols = np.arange(dsm.shape[1], dtype=np.float64)
-            uu, vv = np.meshgrid(cols, rows)
-            u = np.reshape(uu, -1)
-            v = np.reshape(vv, -1)
-            if area_or_point == "Area":
-                u += 0.5
-                v += 0.5
-            xy = np.asarray(transform * (u, v)).T
-
             nan_mask = np.isnan(dsm)
             if nodata is not None:
                 dsm[nan_mask] = nodata
                 mask = dsm == nodata
             else:
                 mask = nan_mask
-            mask = np.reshape(mask, -1)
 
-            # interpolate the residual grid for each xy
-            res_x, res_y, res_z, res_horiz, res_3d = self._interpolate_residuals(
-                xy[:, 0], xy[:, 1]
+            # interpolate the residual grid at the xy of each valid cell
+            xy = raster_to_xyz(~mask, transform, area_or_point)
+            residuals = self._interpolate_residuals(xy[:, 0], xy[:, 1])
+            fill = np.nan if nodata is None else nodata
+            res_x, res_y, res_z, res_horiz, res_3d = (
+                np.full(dsm.shape, fill, dtype=np.float64) for _ in range(5)
             )
-
-            res_x[mask] = nodata
-            res_y[mask] = nodata
-            res_z[mask] = nodata
-            res_horiz[mask] = nodata
-            res_3d[mask] = nodata
-
-            res_x = np.reshape(res_x, dsm.shape)
-            res_y = np.reshape(res_y, dsm.shape)
-            res_z = np.reshape(res_z, dsm.shape)
-            res_horiz = np.reshape(res_horiz, dsm.shape)
-            res_3d = np.reshape(res_3d, dsm.shape)
+            for res, interpolated in zip(
+                (res_x, res_y, res_z, res_horiz, res_3d), residuals
+            ):
+                res[~mask] = interpolated
 
             # save the interpolated data to a new TIF file. We only save to TIF
             # files since they are known to handle additional bands.
@@ -334,22 +402,51 @@ class ApplyRegistration:
 
     def _apply_pointcloud(self) -> None:
         """
-        Applies the registration transformation to a point cloud file.
+        Applies the registration transformation to a point cloud file. If the
+        AOI points were spooled when the file was ingested, they are
+        transformed chunk by chunk and written without reading the file again,
+        with the header fields and VLRs recorded by the reader; otherwise, or
+        if the recorded header cannot be reproduced, the file is read again
+        and its header forwarded.
         """
-        pipeline = pdal.Reader(self.aoi_file)
-        pipeline |= self.get_registration_transformation()
-
         writer_kwargs = {"filename": self.out_name}
         if self.fnd_crs is not None:
             writer_kwargs["a_srs"] = self.fnd_crs.to_wkt()
-        writer_kwargs["forward"] = "all"
         writer_kwargs["offset_x"] = self.config["OFFSET_X"]
         writer_kwargs["offset_y"] = self.config["OFFSET_Y"]
         writer_kwargs['offset_z'] = self.config["OFFSET_Z"]
         writer_kwargs["scale_x"] = self.config["SCALE_X"]
         writer_kwargs["scale_y"] = self.config["SCALE_Y"]
         writer_kwargs['scale_z'] = self.config["SCALE_Z"]
-        pipeline |= pdal.Writer.las(**writer_kwargs)
+
+        header = None
+        if self.aoi_ingest is not None and self.aoi_ingest.spooled:
+            header = _forwarded_header(self.aoi_ingest.reader_metadata())
+            if header is None:
+                self.logger.debug(
+                    "AOI header cannot be reproduced, reading the AOI file again."
+                )
+
+        chunks: Optional[List[np.ndarray]] = None
+        if header is not None:
+            chunks = self._registered_chunks()
+            for key, value in header.items():
+                writer_kwargs.setdefault(key, value)
+            writer_kwargs["extra_dims"] = "all"
+            # the dimensions spooled for the residuals are left out
+            residual_names = [name for name, _ in RESIDUAL_DIMENSIONS]
+            names = chunks[0].dtype.names or ()
+            point_names = [name for name in names if name not in residual_names]
+            if len(point_names) < len(names):
+                arrays = [chunk[point_names] for chunk in chunks]
+            else:
+                arrays = chunks
+            pipeline = pdal.Writer.las(**writer_kwargs).pipeline(*arrays)
+        else:
+            pipeline = pdal.Reader(self.aoi_file)
+            pipeline |= self.get_registration_transformation()
+            writer_kwargs["forward"] = "all"
+            pipeline |= pdal.Writer.las(**writer_kwargs)
 
         pipeline.execute()
         self.logger.info(
@@ -357,37 +454,37 @@ class ApplyRegistration:
         )
 
         if self.config["ICP_SAVE_RESIDUALS"]:
-            # open up the registered output file, read in xy's
-            p = pdal.Reader(self.out_name).pipeline()
-            p.execute()
-            arrays = p.arrays
-            array = arrays[0]
-            x = array["X"]
-            y = array["Y"]
-
-            # interpolate the residual grid for each xy
-            res_x, res_y, res_z, res_horiz, res_3d = self._interpolate_residuals(x, y)
+            interpolators = self._residual_interpolators()
+            if chunks is None:
+                # open up the registered output file, read in xy's
+                p = pdal.Reader(self.out_name).pipeline()
+                p.execute()
+                arrays = p.arrays
+                chunks = [arrays[0]]
 
             # save the interpolated residuals to a new LAZ file. We only save
             # to LAS version 1.4 files since they are known to handle additional
-            # point dimensions (attributes)
-            res_dtype = np.dtype(
-                [
-                    ("ResidualX", np.double),
-                    ("ResidualY", np.double),
-                    ("ResidualZ", np.double),
-                    ("ResidualHoriz", np.double),
-                    ("Residual3D", np.double),
-                ]
-            )
-            res_data = np.zeros(array.shape[0], dtype=res_dtype)
-            res_data["ResidualX"] = res_x
-            res_data["ResidualY"] = res_y
-            res_data["ResidualZ"] = res_z
-            res_data["ResidualHoriz"] = res_horiz
-            res_data["Residual3D"] = res_3d
-
-            original_and_res = rfn.merge_arrays((array, res_data), flatten=True)
+            # point dimensions (attributes). The spooled points hold zeroed
+            # residual dimensions, which are filled in place
+            res_dtype = np.dtype(list(RESIDUAL_DIMENSIONS))
+            residual_chunks: List[np.ndarray] = []
+            for array in chunks:
+                if "ResidualX" not in (array.dtype.names or ()):
+                    array = rfn.merge_arrays(
+                        (array, np.zeros(array.shape[0], dtype=res_dtype)),
+                        flatten=True,
+                    )
+
+                # interpolate the residual grid for each xy
+                residuals = self._interpolate_residuals(
+                    array["X"], array["Y"], interpolators
+                )
+                array["ResidualX"] = residuals[0]
+                array["ResidualY"] = residuals[1]
+                array["ResidualZ"] = residuals[2]
+                array["ResidualHoriz"] = residuals[3]
+                array["Residual3D"] = residuals[4]
+                residual_chunks.append(array)
 
             root, _ = os.path.splitext(self.out_name)
             out_name_res = root + "_residuals.laz"
@@ -399,26 +496,48 @@ class ApplyRegistration:
                     "filename": out_name_res,
                 }
             ]
-            p = pdal.Pipeline(
-                json.dumps(pipe),
-                arrays=[
-                    original_and_res,
-                ],
-            )
+            p = pdal.Pipeline(json.dumps(pipe), arrays=residual_chunks)
             p.execute()
 
             self.logger.info(
                 f"ICP residuals have been computed for each registered AOI-PCLOUD point and saved to: {out_name_res}"
             )
 
-    def _interpolate_residuals(
-        self, x: np.ndarray, y: np.ndarray
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    def _registered_chunks(self) -> List[np.ndarray]:
         """
-        Interpolate ICP residuals at registered AOI x,y locations. The
-        registration is solved using a gridded set of points, while the AOI
-        x,y locations may be disorganized and/or at a different resolution
-        than the registration grid. Therefore, we interpolate.
+        Applies the registration transformation to the coordinates of each
+        spooled AOI chunk. The chunks are memory mapped and registered in
+        place, so neither the registered AOI nor a copy of the spool is held
+        as a whole before the writer copies it; the spooled points are left
+        registered.
+
+        Returns
+        -------
+        chunks: List[np.array]
+            Structured arrays of registered points
+        """
+        if self.aoi_ingest is None:
+            raise RuntimeError("AOI points were not ingested.")
+        transform = self._registration_matrix()
+
+        chunks = []
+        for chunk in self.aoi_ingest.chunks(writable=True):
+            xyz = np.column_stack((chunk["X"], chunk["Y"], chunk["Z"]))
+            xyz = xyz @ transform[:3, :3].T + transform[:3, 3]
+            chunk["X"] = xyz[:, 0]
+            chunk["Y"] = xyz[:, 1]
+            chunk["Z"] = xyz[:, 2]
+            chunks.append(chunk)
+
+        if not chunks:
+            raise RuntimeError("No spooled AOI points were found.")
+        return chunks
+
+    def _residual_interpolators(self) -> List[LinearTriInterpolator]:
+        """
+        Creates linear interpolators, over a triangulation of the ICP residual
+        origins, of the x, y, z, horizontal and 3D residuals in the Foundation
+        linear unit.
         """
         # We need to scale the residual origins and vectors to the Foundation
         # linear unit, which the registered AOI data has been converted to as
@@ -449,28 +568,38 @@ class ApplyRegistration:
         threeD_res = np.sqrt(np.sum(fnd_res_vectors**2, axis=1))
 
         # Nearest neighbor is faster, but a linear interpolation looks better
-        # Replace any NaN values produced by the interpolator with an obviously
-        # incorrect value (-9999)
         triFn = Triangulation(fnd_res_origins[:, 0], fnd_res_origins[:, 1])
+        return [
+            LinearTriInterpolator(triFn, residual)
+            for residual in (x_res, y_res, z_res, horiz_res, threeD_res)
+        ]
 
-        linTriFn = LinearTriInterpolator(triFn, x_res)
-        interp_res_x = linTriFn(x, y)
-        interp_res_x[np.isnan(interp_res_x)] = -9999.0
-
-        linTriFn = LinearTriInterpolator(triFn, y_res)
-        interp_res_y = linTriFn(x, y)
-        interp_res_y[np.isnan(interp_res_y)] = -9999.0
-
-        linTriFn = LinearTriInterpolator(triFn, z_res)
-        interp_res_z = linTriFn(x, y)
-        interp_res_z[np.isnan(interp_res_z)] = -9999.0
-
-        linTriFn = LinearTriInterpolator(triFn, horiz_res)
-        interp_res_horiz = linTriFn(x, y)
-        interp_res_horiz[np.isnan(interp_res_horiz)] = -9999.0
-
-        linTriFn = LinearTriInterpolator(triFn, threeD_res)
-        interp_res_3d = linTriFn(x, y)
-        interp_res_3d[np.isnan(interp_res_3d)] = -9999.0
+    def _interpolate_residuals(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        interpolators: Optional[List[LinearTriInterpolator]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Interpolate ICP residuals at registered AOI x,y locations. The
+        registration is solved using a gridded set of points, while the AOI
+        x,y locations may be disorganized and/or at a different resolution
+        than the registration grid. Therefore, we interpolate. The
+        interpolators are created unless given, so that chunks of points can
+        share them.
+        """
+        if interpolators is None:
+            interpolators = self._residual_interpolators()
 
+        # Replace any NaN values produced by the interpolator with an obviously
+        # incorrect value (-9999)
+        interpolated = []
+        for linTriFn in interpolators:
+            interp_res = linTriFn(x, y)
+            interp_res[np.isnan(interp_res)] = -9999.0
+            interpolated.append(interp_res)
+
+        interp_res_x, interp_res_y, interp_res_z, interp_res_horiz, interp_res_3d = (
+            interpolated
+        )
         return interp_res_x, interp_res_y, interp_res_z, interp_res_horiz, interp_res_3d
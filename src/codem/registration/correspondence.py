@@ -0,0 +1,285 @@
+"""
+correspondence.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+This module contains closest point search backends for the ICP registration.
+Both backends answer the query of scipy's cKDTree with k=1: for each query
+point, the distance to and index of the closest fixed point, with an index
+equal to the number of fixed points where no point lies within the distance
+upper bound.
+
+The foundation point cloud is generated from a regular DSM lattice with a
+known affine transform, so closest points can be found by inverting the
+transform and inspecting a square neighbourhood of raster cells around each
+query point rather than searching a KD-tree. The grid backend only returns
+the same closest points as the KD-tree when the neighbourhood covers the
+distance upper bound, which covering_radius ensures; with a smaller
+neighbourhood it returns the closest point among the cells inspected, and
+misses closer points, or any point, beyond them.
+
+Queries are split into chunks of a bounded number of points, which are
+searched concurrently by a pool of threads. Both backends spend their time in
+compiled code that releases the GIL, so the chunks run in parallel on all
+cores, and the temporary arrays of the grid backend are bounded by the chunk
+size rather than the query size.
+
+This module contains the following classes and method:
+
+* KdTreeCorrespondence: KD-tree search for arbitrary fixed point clouds
+* GridCorrespondence: direct raster lookup for fixed points derived from a DSM
+* covering_radius: neighbourhood radius of an exact grid search
+"""
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from typing import Tuple
+
+import numpy as np
+import rasterio
+from scipy import spatial
+
+
+# query points searched per chunk
+QUERY_CHUNK = 1 << 16
+
+
+def _chunked_query(
+    search: Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]],
+    points: np.ndarray,
+    workers: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Runs a closest point search over chunks of the query points in a thread
+    pool and concatenates the distances and indices.
+    """
+    if points.shape[0] <= QUERY_CHUNK or workers == 1:
+        return search(points)
+    chunks = [
+        points[start : start + QUERY_CHUNK]
+        for start in range(0, points.shape[0], QUERY_CHUNK)
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(search, chunks))
+    distances = np.concatenate([result[0] for result in results])
+    indices = np.concatenate([result[1] for result in results])
+    return distances, indices
+
+
+def covering_radius(transform: rasterio.Affine, distance: float, limit: int) -> int:
+    """
+    Computes the smallest half-width of the grid search neighbourhood that
+    contains every cell within a distance of a query point: the horizontal
+    distance to a point bounds its cell offset by the distance over the
+    smallest cell spacing, plus half a cell for rounding the query point to
+    its cell.
+
+    Parameters
+    ----------
+    transform: rasterio.Affine
+        Transform from raster to fixed point coordinates
+    distance: float
+        Distance upper bound of the query
+    limit: int
+        Largest half-width returned
+
+    Returns
+    -------
+    radius: int
+        Half-width, in cells, of the neighbourhood, at most limit
+    """
+    linear = np.array([[transform.a, transform.b], [transform.d, transform.e]])
+    spacing = float(np.linalg.svd(linear, compute_uv=False).min())
+    cells = distance / spacing + 0.5
+    if not math.isfinite(cells) or cells >= limit:
+        return limit
+    return int(math.floor(cells))
+
+
+class KdTreeCorrespondence:
+    """
+    Closest point search with a KD-tree built over the fixed points.
+
+    Parameters
+    ----------
+    fixed: np.array
+        Array of fixed 3D points
+    workers: int
+        Number of threads searching chunks of query points; 0 uses all CPUs
+    """
+
+    def __init__(self, fixed: np.ndarray, workers: int = 0) -> None:
+        self.n = fixed.shape[0]
+        self.tree = spatial.cKDTree(fixed)
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+
+    def query(
+        self, points: np.ndarray, distance_upper_bound: float = np.inf
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the closest fixed point to each query point.
+
+        Parameters
+        ----------
+        points: np.array
+            Array of 3D query points
+        distance_upper_bound: float
+            Maximum distance to a closest point
+
+        Returns
+        -------
+        distances: np.array
+            Distance to the closest fixed point, inf if none was found
+        indices: np.array
+            Index of the closest fixed point, n if none was found
+        """
+        return _chunked_query(
+            lambda chunk: self.tree.query(
+                chunk, k=1, distance_upper_bound=distance_upper_bound
+            ),
+            points,
+            self.workers,
+        )
+
+
+class GridCorrespondence:
+    """
+    Closest point search by direct lookup in the raster lattice the fixed
+    points were generated from. Query points are mapped to their nearest raster
+    cell through the inverse transform, and the valid cells within a square
+    neighbourhood of that cell are compared in 3D. A precomputed index map
+    converts cells to compact fixed point indices. The search is exact when
+    the radius is at least the covering_radius of the distance upper bound.
+
+    Parameters
+    ----------
+    fixed: np.array
+        Array of fixed 3D points, one per valid cell in row-major order
+    mask: np.array
+        Raster mask of the valid cells the fixed points were generated from
+    transform: rasterio.Affine
+        Transform from raster to fixed point coordinates
+    area_or_point: str
+        "Area" or "Point" string indicating if the transform origin is at the
+        upper left corner or the center of the upper left pixel
+    radius: int
+        Half-width, in cells, of the neighbourhood searched around each cell
+    workers: int
+        Number of threads searching chunks of query points; 0 uses all CPUs
+    """
+
+    def __init__(
+        self,
+        fixed: np.ndarray,
+        mask: np.ndarray,
+        transform: rasterio.Affine,
+        area_or_point: str,
+        radius: int = 1,
+        workers: int = 0,
+    ) -> None:
+        valid = np.asarray(mask, dtype=bool)
+        if np.count_nonzero(valid) != fixed.shape[0]:
+            raise ValueError(
+                "Fixed points do not correspond to the valid cells of the mask."
+            )
+        self.n = fixed.shape[0]
+        self.radius = radius
+        self.shape = valid.shape
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+
+        # fixed coordinates by column with a trailing sentinel point at infinity
+        # that stands in for cells without a fixed point
+        self.coordinates = [
+            np.append(fixed[:, dim], np.inf).astype(np.double) for dim in range(3)
+        ]
+
+        # the index map is padded so every neighbourhood of a clamped cell lies
+        # inside it and cells outside the raster resolve to the sentinel
+        self.padding = 2 * radius + 1
+        index_dtype = np.int32 if self.n < np.iinfo(np.int32).max else np.int64
+        index_map = np.full(
+            (self.shape[0] + 2 * self.padding, self.shape[1] + 2 * self.padding),
+            self.n,
+            dtype=index_dtype,
+        )
+        index_map[
+            self.padding : self.padding + self.shape[0],
+            self.padding : self.padding + self.shape[1],
+        ][valid] = np.arange(self.n, dtype=index_dtype)
+        self.index_map = index_map.ravel()
+        self.width = index_map.shape[1]
+        self.offsets = [
+            dr * self.width + dc
+            for dr in range(-radius, radius + 1)
+            for dc in range(-radius, radius + 1)
+        ]
+
+        self.inverse = ~transform
+        # cell centers sit half a pixel from the transform origin for "Area"
+        self.center_offset = 0.5 if area_or_point == "Area" else 0.0
+
+    def query(
+        self, points: np.ndarray, distance_upper_bound: float = np.inf
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the closest fixed point to each query point among the valid
+        cells in the neighbourhood of the cell containing it.
+
+        Parameters
+        ----------
+        points: np.array
+            Array of 3D query points
+        distance_upper_bound: float
+            Maximum distance to a closest point
+
+        Returns
+        -------
+        distances: np.array
+            Distance to the closest fixed point, inf if none was found
+        indices: np.array
+            Index of the closest fixed point, n if none was found
+        """
+        return _chunked_query(
+            lambda chunk: self._search(chunk, distance_upper_bound),
+            points,
+            self.workers,
+        )
+
+    def _search(
+        self, points: np.ndarray, distance_upper_bound: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Searches the neighbourhoods of the cells containing a chunk of query
+        points.
+        """
+        inv = self.inverse
+        x = points[:, 0]
+        y = points[:, 1]
+        z = points[:, 2]
+        col = np.rint(inv.a * x + inv.b * y + inv.c - self.center_offset)
+        row = np.rint(inv.d * x + inv.e * y + inv.f - self.center_offset)
+
+        # clamp into the padding so far away points only see the sentinel
+        low = self.radius - self.padding
+        row = np.clip(row, low, self.shape[0] - 1 - low).astype(np.int64)
+        col = np.clip(col, low, self.shape[1] - 1 - low).astype(np.int64)
+        cell = (row + self.padding) * self.width + (col + self.padding)
+
+        fixed_x, fixed_y, fixed_z = self.coordinates
+        best_squared = np.full(points.shape[0], np.inf)
+        best_index = np.full(points.shape[0], self.n, dtype=np.int64)
+        for offset in self.offsets:
+            candidate = self.index_map[cell + offset]
+            squared = (fixed_x[candidate] - x) ** 2
+            squared += (fixed_y[candidate] - y) ** 2
+            squared += (fixed_z[candidate] - z) ** 2
+            closer = squared < best_squared
+            best_squared = np.where(closer, squared, best_squared)
+            best_index = np.where(closer, candidate, best_index)
+
+        distances = np.sqrt(best_squared)
+        outside = distances > distance_upper_bound
+        distances[outside] = np.inf
+        best_index[outside] = self.n
+        return distances, best_index
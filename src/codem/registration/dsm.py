@@ -18,19 +18,45 @@ This module contains the following classes:
 import logging
 import math
 import os
+import threading
 import warnings
 from typing import List
+from typing import Optional
 from typing import Tuple
+from typing import Union
 
 import cv2
 import numpy as np
+from codem.lib.georeference import uv_to_xy
+from codem.lib.georeference import uv_to_xyz
 from codem.preprocessing.preprocess import CodemParameters
 from codem.preprocessing.preprocess import GeoData
 from codem.preprocessing.preprocess import RegistrationParameters
+from codem.registration.keypoints import bucket_keypoints
+from codem.registration.keypoints import TiledAkaze
+from codem.registration.matching import constrained_match
+from codem.registration.matching import exhaustive_match
+from codem.registration.phase import phase_correlate
+from codem.registration.pyramid import DsmLevel
+from codem.registration.pyramid import pyramid_levels
+from codem.registration.pyramid import search_window
+from codem.registration.ransac import ransac as batched_ransac
 from rasterio import Affine
 from skimage.measure import ransac
 
 
+# maximum number of aligned DSM cells paired by the phase correlation engine
+_PHASE_PAIRS = 100000
+
+# search radius, in pixels of a pyramid level, around the AOI keypoints located
+# by the transformation solved at that level
+_PYRAMID_RADIUS = 4.0
+
+
+def _translation(x: float, y: float) -> np.ndarray:
+    return np.array([[1.0, 0.0, x], [0.0, 1.0, y], [0.0, 0.0, 1.0]])
+
+
 class DsmRegistration:
     """
     A class to solve the transformation between two Digital Surface Models.
@@ -48,23 +74,42 @@ class DsmRegistration:
     Methods
     --------
     register
+    wait_for_match_img
+    _feature_register
+    _pyramid_register
+    _phase_register
     _get_kp
     _get_putative
+    _keypoint_xy
     _filter_putative
+    _skimage_ransac
     _save_match_img
+    _render_match_img
     _get_geo_coords
     _get_rmse
     _output
     """
 
+    transformation: np.ndarray
+    inliers: np.ndarray
+    fnd_inliers_xyz: np.ndarray
+    aoi_inliers_xyz: np.ndarray
+    rmse_3d: np.float64
+
     def __init__(
-        self, fnd_obj: GeoData, aoi_obj: GeoData, config: CodemParameters
+        self,
+        fnd_obj: Union[GeoData, DsmLevel],
+        aoi_obj: Union[GeoData, DsmLevel],
+        config: CodemParameters,
     ) -> None:
         self.logger = logging.getLogger(__name__)
         self.config = config
         self.fnd_obj = fnd_obj
         self.aoi_obj = aoi_obj
         self._putative_matches: List[cv2.DMatch] = []
+        # transformation of a coarser pyramid level, locating the AOI keypoints
+        self.prior: Optional[np.ndarray] = None
+        self._match_img_thread: Optional[threading.Thread] = None
 
         if not aoi_obj.processed:
             raise RuntimeError(
@@ -101,9 +146,51 @@ class DsmRegistration:
 
         After registration, RMSEs of matched features are computed and
         transformation details added as a class attribute.
+
+        If DSM_COARSE_ENGINE is 'phase', the registration is first attempted
+        by phase correlation, falling back to the feature based steps above
+        when the correlation is weak. If DSM_PYRAMID_LEVELS is greater than 0,
+        the feature based steps are run coarse to fine on an image pyramid.
+
+        The feature match visualization is rendered in a background thread,
+        unless DSM_MATCH_IMG_SIZE is 0; wait_for_match_img waits for it.
+        """
+        if self.config["DSM_COARSE_ENGINE"] == "phase" and self._phase_register():
+            self._get_rmse()
+            self._output()
+            return None
+
+        levels = pyramid_levels(
+            self.aoi_obj.normed.shape, self.config["DSM_PYRAMID_LEVELS"]
+        )
+        if levels > 0:
+            self._pyramid_register(levels)
+        else:
+            self.logger.info("Solving DSM feature registration.")
+            self._feature_register()
+
+        self._get_rmse()
+        self._output()
+        if self.config["DSM_MATCH_IMG_SIZE"] > 0:
+            self._match_img_thread = threading.Thread(
+                target=self._save_match_img, name="dsm-match-img"
+            )
+            self._match_img_thread.start()
+
+    def wait_for_match_img(self) -> None:
+        """
+        Waits for the feature match visualization started by register to be
+        written, if one was started.
         """
-        self.logger.info("Solving DSM feature registration.")
+        if self._match_img_thread is not None:
+            self._match_img_thread.join()
+            self._match_img_thread = None
 
+    def _feature_register(self) -> None:
+        """
+        Extracts and matches the features of the foundation and AOI DSMs and
+        solves the transformation conforming to the most matches.
+        """
         self.fnd_kp, self.fnd_desc = self._get_kp(
             self.fnd_obj.normed, self.fnd_obj.nodata_mask
         )
@@ -131,17 +218,236 @@ class DsmRegistration:
             )
         self._get_putative()
         self._filter_putative()
-        self._save_match_img()
 
-        self._get_rmse()
-        self._output()
+    def _pyramid_register(self, levels: int) -> None:
+        """
+        Solves the feature registration coarse to fine. Level k of the pyramid
+        decimates the DSMs by 2**k. The coarsest level is matched as configured
+        by DSM_MATCH_MODE. At each finer level, foundation features are only
+        extracted in a window around the AOI footprint located by the previous
+        level's transformation, and AOI features are only matched with the
+        foundation features near where that transformation places them. The
+        RANSAC threshold is widened to two pixels at coarse levels, while the
+        full resolution level uses DSM_RANSAC_THRESHOLD unchanged and yields
+        the keypoints, matches and transformation.
+
+        Parameters
+        ----------
+        levels: int
+            Number of decimated pyramid levels
+        """
+        if self.fnd_obj.transform is None:
+            raise RuntimeError(
+                "Foundation Object transform has not been set, did you run the prep() method?"
+            )
+        resolution = math.hypot(self.fnd_obj.transform.a, self.fnd_obj.transform.d)
+        prior: Optional[np.ndarray] = None
+        radius = 0.0
+        for level in range(levels, -1, -1):
+            factor = 2**level
+            window = None
+            if prior is not None:
+                window = search_window(self.aoi_obj, self.fnd_obj, prior, radius)
+                if window is None:
+                    raise RuntimeError(
+                        "The transformation solved at pyramid level "
+                        f"{level + 1} places the AOI outside the foundation."
+                    )
+            fnd = DsmLevel(self.fnd_obj, factor, window)
+            aoi = DsmLevel(self.aoi_obj, factor)
+            self.logger.info(
+                f"Solving DSM feature registration at pyramid level {level}, "
+                f"foundation window {fnd.normed.shape[1]}x{fnd.normed.shape[0]}."
+            )
+
+            config = self.config.copy()
+            if level > 0:
+                config["DSM_RANSAC_THRESHOLD"] = max(
+                    self.config["DSM_RANSAC_THRESHOLD"], 2 * factor * resolution
+                )
+            if prior is not None:
+                config["DSM_MATCH_MODE"] = "constrained"
+                config["DSM_MATCH_RADIUS"] = radius
+            level_reg = DsmRegistration(fnd, aoi, config)
+            level_reg.prior = prior
+            level_reg._feature_register()
+            level_reg._get_rmse()
+            self.logger.debug(f"Pyramid level {level} RMSE: {level_reg.rmse_3d:.3f}")
+            prior = level_reg.transformation
+            radius = max(_PYRAMID_RADIUS * factor * resolution, 2 * level_reg.rmse_3d)
+
+        # keypoints of the full resolution foundation window in full DSM pixels
+        for point in level_reg.fnd_kp:
+            point.pt = (point.pt[0] + fnd.offset[0], point.pt[1] + fnd.offset[1])
+        self.fnd_kp = level_reg.fnd_kp
+        self.fnd_desc = level_reg.fnd_desc
+        self.aoi_kp = level_reg.aoi_kp
+        self.aoi_desc = level_reg.aoi_desc
+        self.putative_matches = level_reg.putative_matches
+        self.transformation = level_reg.transformation
+        self.inliers = level_reg.inliers
+        self.fnd_inliers_xyz = level_reg.fnd_inliers_xyz
+        self.aoi_inliers_xyz = level_reg.aoi_inliers_xyz
+
+    def _phase_register(self) -> bool:
+        """
+        Solves the registration from the rotation and shift found by phase
+        correlating the normalized DSMs, and the vertical offset as the median
+        elevation difference of the aligned DSMs. The AOI is placed at its
+        georeferenced location in a window of the foundation padded by
+        DSM_MATCH_RADIUS, which bounds the shifts that can be recovered. The
+        aligned DSM cells whose 3D residual is within DSM_RANSAC_THRESHOLD
+        serve as the matched pairs for the RMSE computation.
+
+        Returns
+        -------
+        solved: bool
+            False if the DSM grids are incompatible or the correlation is too
+            weak, in which case feature based registration should be used
+        """
+        fnd, aoi = self.fnd_obj, self.aoi_obj
+        if fnd.transform is None or aoi.transform is None:
+            raise RuntimeError(
+                "DSM transforms have not been set, did you run the prep() method?"
+            )
+        self.logger.info("Solving DSM phase correlation registration.")
+        F = fnd.transform
+        A = aoi.transform
+        resolution = math.hypot(F.a, F.d)
+        if not np.allclose(
+            [A.a, A.b, A.d, A.e], [F.a, F.b, F.d, F.e], rtol=0, atol=1e-6 * resolution
+        ):
+            self.logger.info(
+                "DSM grids differ in resolution or orientation, falling back to "
+                "feature registration."
+            )
+            return False
+
+        # pixel centers are at integer indices
+        fnd_offset = 0.5 if fnd.area_or_point == "Area" else 0.0
+        aoi_offset = 0.5 if aoi.area_or_point == "Area" else 0.0
+        fnd_matrix = np.reshape(np.asarray(F), (3, 3))
+        aoi_matrix = np.reshape(np.asarray(A), (3, 3))
+        fnd_index = np.linalg.inv(fnd_matrix @ _translation(fnd_offset, fnd_offset))
+        aoi_world = aoi_matrix @ _translation(aoi_offset, aoi_offset)
+
+        # AOI placed at its georeferenced location in a padded foundation window
+        col0, row0, _ = fnd_index @ aoi_world @ np.array([0.0, 0.0, 1.0])
+        margin = int(math.ceil(self.config["DSM_MATCH_RADIUS"] / resolution))
+        height, width = aoi.normed.shape
+        top = int(round(row0)) - margin
+        left = int(round(col0)) - margin
+        fixed = np.zeros((height + 2 * margin, width + 2 * margin), dtype=np.float32)
+        rows = slice(max(top, 0), min(top + fixed.shape[0], fnd.normed.shape[0]))
+        cols = slice(max(left, 0), min(left + fixed.shape[1], fnd.normed.shape[1]))
+        if rows.start >= rows.stop or cols.start >= cols.stop:
+            self.logger.info(
+                "AOI does not overlap the foundation, falling back to feature "
+                "registration."
+            )
+            return False
+        valid = np.asarray(fnd.nodata_mask[rows, cols], dtype=bool)
+        window = fnd.normed[rows, cols].astype(np.float32)
+        window -= window[valid].mean() if valid.any() else 0.0
+        window[~valid] = 0.0
+        fixed[
+            rows.start - top : rows.stop - top, cols.start - left : cols.stop - left
+        ] = window
+
+        moving = np.zeros_like(fixed)
+        valid = np.asarray(aoi.nodata_mask, dtype=bool)
+        patch = aoi.normed.astype(np.float32)
+        patch -= patch[valid].mean()
+        patch[~valid] = 0.0
+        patch *= cv2.createHanningWindow((width, height), cv2.CV_32F)
+        moving[margin : margin + height, margin : margin + width] = patch
+
+        matrix, response = phase_correlate(
+            fixed, moving, self.config["DSM_PHASE_ROTATION"]
+        )
+        self.logger.debug(f"Phase correlation peak response: {response:.3f}")
+        if response < self.config["DSM_PHASE_MIN_RESPONSE"]:
+            self.logger.info(
+                f"Phase correlation peak response {response:.3f} is below "
+                f"DSM_PHASE_MIN_RESPONSE, falling back to feature registration."
+            )
+            return False
+
+        # horizontal transformation in object space
+        horizontal = (
+            np.linalg.inv(fnd_index)
+            @ _translation(left, top)
+            @ np.vstack((matrix, [0.0, 0.0, 1.0]))
+            @ _translation(margin - col0, margin - row0)
+            @ fnd_index
+        )
+
+        # pair AOI cells with the foundation cells they are aligned with
+        aoi_rows, aoi_cols = np.nonzero(valid)
+        step = max(1, math.ceil(aoi_rows.shape[0] / _PHASE_PAIRS))
+        aoi_rows = aoi_rows[::step]
+        aoi_cols = aoi_cols[::step]
+        aoi_xy = aoi_world @ np.vstack((aoi_cols, aoi_rows, np.ones(aoi_rows.shape[0])))
+        fnd_uv = np.rint((fnd_index @ horizontal @ aoi_xy)[:2]).astype(np.int64)
+        inside = (
+            (fnd_uv[0] >= 0)
+            & (fnd_uv[0] < fnd.normed.shape[1])
+            & (fnd_uv[1] >= 0)
+            & (fnd_uv[1] < fnd.normed.shape[0])
+        )
+        inside[inside] = np.asarray(
+            fnd.nodata_mask[fnd_uv[1, inside], fnd_uv[0, inside]], dtype=bool
+        )
+        if np.count_nonzero(inside) < 4:
+            self.logger.info(
+                "Too few aligned DSM cells, falling back to feature registration."
+            )
+            return False
+        aoi_xyz = np.column_stack(
+            (
+                aoi_xy[0, inside],
+                aoi_xy[1, inside],
+                aoi.infilled[aoi_rows[inside], aoi_cols[inside]],
+            )
+        )
+        fnd_uv = fnd_uv[:, inside]
+        fnd_xy = np.linalg.inv(fnd_index) @ np.vstack(
+            (fnd_uv, np.ones(fnd_uv.shape[1]))
+        )
+        fnd_xyz = np.column_stack(
+            (fnd_xy[0], fnd_xy[1], fnd.infilled[fnd_uv[1], fnd_uv[0]])
+        )
+
+        T = np.eye(4)
+        T[0:2, 0:2] = horizontal[0:2, 0:2]
+        T[0:2, 3] = horizontal[0:2, 2]
+        T[2, 3] = np.median(fnd_xyz[:, 2] - aoi_xyz[:, 2])
+        transformed = aoi_xyz @ T[0:3, 0:3].T + T[0:3, 3]
+        inliers = (
+            np.linalg.norm(fnd_xyz - transformed, axis=1)
+            < self.config["DSM_RANSAC_THRESHOLD"]
+        )
+        self.logger.info(f"{np.sum(inliers)} aligned DSM cells within threshold.")
+        if np.sum(inliers) < 4:
+            self.logger.info(
+                "Too few aligned DSM cells agree, falling back to feature registration."
+            )
+            return False
+
+        self.transformation = T
+        self.inliers = inliers
+        self.fnd_inliers_xyz = fnd_xyz[inliers]
+        self.aoi_inliers_xyz = aoi_xyz[inliers]
+        return True
 
     def _get_kp(
         self, img: np.ndarray, mask: np.ndarray
     ) -> Tuple[Tuple[cv2.KeyPoint, ...], np.ndarray]:
         """
         Extracts AKAZE features, in the form of keypoints and descriptors,
-        from an 8-bit grayscale image.
+        from an 8-bit grayscale image. Large images are processed in tiles.
+        Keypoints are only detected at valid locations, and at most
+        DSM_KEYPOINT_BUDGET keypoints, spread evenly over the image, are kept.
 
         Parameters
         ----------
@@ -157,21 +463,71 @@ class DsmRegistration:
         desc: np.array
             OpenCV AKAZE descriptors
         """
-        detector = cv2.AKAZE_create(threshold=self.config["DSM_AKAZE_THRESHOLD"])
-        kp, desc = detector.detectAndCompute(img, np.ones(mask.shape, dtype=np.uint8))
+        extractor = TiledAkaze(
+            self.config["DSM_AKAZE_THRESHOLD"],
+            self.config["DSM_AKAZE_TILE_SIZE"],
+            self.config["WORKERS"],
+        )
+        kp, desc = extractor.detect_and_compute(img, np.asarray(mask, dtype=np.uint8))
+        budget = self.config["DSM_KEYPOINT_BUDGET"]
+        if budget and len(kp) > budget:
+            self.logger.debug(f"Reducing {len(kp)} keypoints to a budget of {budget}.")
+            kp, desc = bucket_keypoints(kp, desc, img.shape, budget)
         return kp, desc
 
     def _get_putative(self) -> None:
         """
         Identifies putative matches for DSM co-registration via a nearest
         neighbor search in descriptor space. When very large numbers of
-        descriptors exist, an approximate matching method is used to prevent
-        failure. References regarding this problem:
+        descriptors exist, OpenCV's brute force matcher fails, and either an
+        exact blocked matcher or an approximate matching method, as set by
+        DSM_MATCH_ENGINE, is used instead. References regarding this problem:
         * https://answers.opencv.org/question/85003/why-there-is-a-hardcoded-maximum-numbers-of-descriptors-that-can-be-matched-with-bfmatcher/
         * https://docs.opencv.org/master/dc/dc3/tutorial_py_matcher.html
         * https://luckytaylor.top/modules/flann/doc/flann_fast_approximate_nearest_neighbor_search.html
+
+        In the constrained matching mode, descriptors are only compared when
+        their keypoints lie within DSM_MATCH_RADIUS of each other in object
+        space, as located by the foundation and AOI transforms, or by the
+        prior transformation of a coarser pyramid level when one is set.
         """
-        if self.aoi_desc.shape[0] > 2**17 or self.fnd_desc.shape[0] > 2**17:
+        if self.config["DSM_MATCH_MODE"] == "constrained":
+            aoi_xy = self._keypoint_xy(self.aoi_kp, self.aoi_obj)
+            if self.prior is not None:
+                height, width = self.aoi_obj.infilled.shape
+                uv = np.array([point.pt for point in self.aoi_kp]).reshape(-1, 2)
+                u = np.clip(np.rint(uv[:, 0]).astype(np.int64), 0, width - 1)
+                v = np.clip(np.rint(uv[:, 1]).astype(np.int64), 0, height - 1)
+                aoi_xyz = np.column_stack((aoi_xy, self.aoi_obj.infilled[v, u]))
+                aoi_xy = aoi_xyz @ self.prior[0:2, 0:3].T + self.prior[0:2, 3]
+            good_matches = constrained_match(
+                aoi_xy,
+                self.aoi_desc,
+                self._keypoint_xy(self.fnd_kp, self.fnd_obj),
+                self.fnd_desc,
+                self.config["DSM_MATCH_RADIUS"],
+                self.config["DSM_LOWES_RATIO"],
+            )
+            self.logger.debug(
+                f"{len(good_matches)} putative keypoint matches found within "
+                f"{self.config['DSM_MATCH_RADIUS']} of their georeferenced location."
+            )
+            self.putative_matches = good_matches
+            return None
+
+        large = self.aoi_desc.shape[0] > 2**17 or self.fnd_desc.shape[0] > 2**17
+        if large and self.config["DSM_MATCH_ENGINE"] == "exact":
+            good_matches = exhaustive_match(
+                self.aoi_desc,
+                self.fnd_desc,
+                self.config["DSM_LOWES_RATIO"],
+                self.config["WORKERS"],
+            )
+            self.logger.debug(f"{len(good_matches)} putative keypoint matches found.")
+            self.putative_matches = good_matches
+            return None
+
+        if large:
             FLANN_INDEX_LSH = 6
             index_params = dict(
                 algorithm=FLANN_INDEX_LSH,
@@ -198,6 +554,32 @@ class DsmRegistration:
         self.logger.debug(f"{len(good_matches)} putative keypoint matches found.")
         self.putative_matches = good_matches
 
+    def _keypoint_xy(
+        self, kp: Tuple[cv2.KeyPoint, ...], geo_obj: Union[GeoData, DsmLevel]
+    ) -> np.ndarray:
+        """
+        Converts keypoint locations to horizontal object space coordinates with
+        the transform of the DSM they were extracted from.
+
+        Parameters
+        ----------
+        kp: tuple(cv2.KeyPoint,...)
+            OpenCV keypoints
+        geo_obj: Union[GeoData, DsmLevel]
+            The DSM object the keypoints were extracted from
+
+        Returns
+        -------
+        xy: np.array
+            Object space coordinates of the keypoints
+        """
+        if geo_obj.transform is None:
+            raise RuntimeError(
+                "DSM transform has not been set, did you run the prep() method?"
+            )
+        uv = np.array([point.pt for point in kp], dtype=np.double).reshape(-1, 2)
+        return uv_to_xy(uv, geo_obj.transform, geo_obj.area_or_point)
+
     def _filter_putative(self) -> None:
         """
         Filters putative matches via conformance to a 3D similarity transform.
@@ -229,33 +611,31 @@ class DsmRegistration:
             self.aoi_obj.infilled,
         )
         # Find 3D similarity transform conforming to max number of matches
-        if self.config["DSM_SOLVE_SCALE"]:
-            model, inliers = ransac(
-                (aoi_xyz, fnd_xyz),
-                Scaled3dSimilarityTransform,
-                min_samples=3,
+        T: np.ndarray
+        if self.config["DSM_RANSAC_ENGINE"] == "batched":
+            transform, inliers = batched_ransac(
+                aoi_xyz,
+                fnd_xyz,
+                self.config["DSM_SOLVE_SCALE"],
                 residual_threshold=self.config["DSM_RANSAC_THRESHOLD"],
                 max_trials=self.config["DSM_RANSAC_MAX_ITER"],
+                confidence=self.config["DSM_RANSAC_CONFIDENCE"],
+                quality=np.array([m.distance for m in self.putative_matches]),
+                solve_tilt=self.config["DSM_SOLVE_TILT"],
             )
+            if transform is None:
+                raise ValueError(
+                    "ransac model not fitted, no inliers found. Consider tuning "
+                    "DSM_RANSAC_THRESHOLD or DSM_RANSAC_MAX_ITER"
+                )
+            T = transform
         else:
-            model, inliers = ransac(
-                (aoi_xyz, fnd_xyz),
-                Unscaled3dSimilarityTransform,
-                min_samples=3,
-                residual_threshold=self.config["DSM_RANSAC_THRESHOLD"],
-                max_trials=self.config["DSM_RANSAC_MAX_ITER"],
-            )
-        if model is None:
-            raise ValueError(
-                "ransac model not fitted, no inliers found. Consider tuning "
-                "DSM_RANSAC_THRESHOLD or DSM_RANSAC_MAX_ITER"
-            )
+            T, inliers = self._skimage_ransac(aoi_xyz, fnd_xyz)
         self.logger.info(f"{np.sum(inliers)} keypoint matches found.")
 
         if np.sum(inliers) < 4:
             raise RuntimeError("Less than 4 keypoint matches found.")
 
-        T: np.ndarray = model.transform
         c = np.linalg.norm(T[:, 0])
         if c < 0.67 or c > 1.5:
             warnings.warn(
@@ -272,11 +652,79 @@ class DsmRegistration:
         self.fnd_inliers_xyz = fnd_xyz[inliers]
         self.aoi_inliers_xyz = aoi_xyz[inliers]
 
+    def _skimage_ransac(
+        self, aoi_xyz: np.ndarray, fnd_xyz: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Solves the 3D similarity transform conforming to the maximum number of
+        matches with scikit-image's RANSAC routine, evaluating one hypothesis
+        per trial.
+
+        Returns
+        -------
+        T: np.array
+            4x4 transformation matrix
+        inliers: np.array
+            Boolean array flagging the inlier matches
+        """
+        if self.config["DSM_SOLVE_SCALE"]:
+            model, inliers = ransac(
+                (aoi_xyz, fnd_xyz),
+                Scaled3dSimilarityTransform,
+                min_samples=3,
+                residual_threshold=self.config["DSM_RANSAC_THRESHOLD"],
+                max_trials=self.config["DSM_RANSAC_MAX_ITER"],
+                stop_probability=self.config["DSM_RANSAC_CONFIDENCE"],
+            )
+        else:
+            model, inliers = ransac(
+                (aoi_xyz, fnd_xyz),
+                Unscaled3dSimilarityTransform,
+                min_samples=3,
+                residual_threshold=self.config["DSM_RANSAC_THRESHOLD"],
+                max_trials=self.config["DSM_RANSAC_MAX_ITER"],
+                stop_probability=self.config["DSM_RANSAC_CONFIDENCE"],
+            )
+        if model is None:
+            raise ValueError(
+                "ransac model not fitted, no inliers found. Consider tuning "
+                "DSM_RANSAC_THRESHOLD or DSM_RANSAC_MAX_ITER"
+            )
+        T: np.ndarray = model.transform
+        return T, inliers
+
     def _save_match_img(self) -> None:
         """
-        Save image of matched features with connecting lines on the
+        Renders the feature match visualization and writes it to the output
+        directory. Failures are logged rather than raised, as the image is a
+        diagnostic that is written in the background.
+        """
+        output_file = os.path.join(self.config["OUTPUT_DIR"], "dsm_feature_matches.png")
+        try:
+            kp_lines = self._render_match_img(self.config["DSM_MATCH_IMG_SIZE"])
+            self.logger.info(
+                f"Saving DSM feature match visualization to: {output_file}"
+            )
+            cv2.imwrite(output_file, kp_lines)
+        except Exception as e:
+            self.logger.warning(f"DSM feature match visualization failed: {e}")
+
+    def _render_match_img(self, size: int) -> np.ndarray:
+        """
+        Draws the inlier feature matches with connecting lines on the
         foundation and AOI DSM images. The outline of the transformed AOI
-        boundary is also plotted on the foundation DSM image.
+        boundary is also plotted on the foundation DSM image. Each DSM image is
+        downsampled so that its longest side is at most size pixels.
+
+        Parameters
+        ----------
+        size: int
+            Maximum side length in pixels of each DSM image
+
+        Returns
+        -------
+        img: np.array
+            Image of the foundation and AOI DSMs side by side
         """
         if self.fnd_obj.transform is None:
             raise RuntimeError(
@@ -302,34 +750,60 @@ class DsmRegistration:
         fnd_uv = (F_inverse @ fnd_xy.T).T
         fnd_uv = fnd_uv[:, 0:2]
 
+        fnd_scale = min(size / max(self.fnd_obj.normed.shape), 1.0)
+        aoi_scale = min(size / max(self.aoi_obj.normed.shape), 1.0)
+
         # Draw AOI outline onto foundation DSM
-        fnd_prep = self.fnd_obj.normed.copy()
+        fnd_prep = cv2.resize(
+            self.fnd_obj.normed,
+            None,
+            fx=fnd_scale,
+            fy=fnd_scale,
+            interpolation=cv2.INTER_AREA,
+        )
         fnd_prep = cv2.polylines(
             fnd_prep,
-            np.expand_dims(fnd_uv, axis=0).astype(np.int32),
+            np.expand_dims(fnd_uv * fnd_scale, axis=0).astype(np.int32),
             isClosed=True,
             color=(255, 0, 0),
             thickness=2,
             lineType=cv2.LINE_AA,
         )
+        aoi_prep = cv2.resize(
+            self.aoi_obj.normed,
+            None,
+            fx=aoi_scale,
+            fy=aoi_scale,
+            interpolation=cv2.INTER_AREA,
+        )
+
+        # Keypoints of the inlier matches, scaled to the downsampled images
+        aoi_kp: List[cv2.KeyPoint] = []
+        fnd_kp: List[cv2.KeyPoint] = []
+        matches: List[cv2.DMatch] = []
+        for m, inlier in zip(self.putative_matches, self.inliers):
+            if not inlier:
+                continue
+            aoi_pt = self.aoi_kp[m.queryIdx].pt
+            fnd_pt = self.fnd_kp[m.trainIdx].pt
+            aoi_kp.append(cv2.KeyPoint(aoi_pt[0] * aoi_scale, aoi_pt[1] * aoi_scale, 1))
+            fnd_kp.append(cv2.KeyPoint(fnd_pt[0] * fnd_scale, fnd_pt[1] * fnd_scale, 1))
+            matches.append(cv2.DMatch(len(matches), len(matches), m.distance))
 
         # Draw keypoints and match lines onto AOI and foundation DSMs
         kp_lines = cv2.drawMatches(
-            self.aoi_obj.normed,
-            self.aoi_kp,
+            aoi_prep,
+            tuple(aoi_kp),
             fnd_prep,
-            self.fnd_kp,
-            self.putative_matches,
+            tuple(fnd_kp),
+            matches,
             None,
             matchColor=(0, 255, 0),
             singlePointColor=None,
-            matchesMask=self.inliers.astype(int).tolist(),
             flags=cv2.DrawMatchesFlags_NOT_DRAW_SINGLE_POINTS,
         )
-
-        output_file = os.path.join(self.config["OUTPUT_DIR"], "dsm_feature_matches.png")
-        self.logger.info(f"Saving DSM feature match visualization to: {output_file}")
-        cv2.imwrite(output_file, kp_lines)
+        img: np.ndarray = kp_lines
+        return img
 
     def _get_geo_coords(
         self, uv: np.ndarray, transform: Affine, area_or_point: str, dsm: np.ndarray
@@ -361,25 +835,7 @@ class DsmRegistration:
         xyz: np.array
             Geospatial coordinates
         """
-        z = []
-        for cr in uv:
-            cr_int = np.rint(cr).astype(np.int32)
-            z.append(dsm[cr_int[1], cr_int[0]])
-
-        # When using the transform to convert from pixels to object space
-        # coordinates, we need to increment the pixel coordinates by 0.5 if the
-        # transform origin is defined at  the upper left corner of the upper
-        # left pixel
-        if area_or_point == "Area":
-            uv += 0.5
-        xy = []
-        for cr in uv:
-            temp = transform * (cr)
-            xy.append([temp[0], temp[1]])
-
-        z_ = np.asarray(z)
-        xy_ = np.asarray(xy)
-        return np.vstack((xy_.T, z_)).T
+        return uv_to_xyz(uv, transform, area_or_point, dsm)
 
     def _get_rmse(self) -> None:
         """
@@ -18,20 +18,40 @@ import os
 import warnings
 from typing import Any
 from typing import Dict
+from typing import Optional
 from typing import Tuple
 from typing import TYPE_CHECKING
+from typing import Union
 
 import numpy as np
+import rasterio
+from codem.lib.georeference import center_transform
+from codem.preprocessing.normals import grid_normals
 from codem.preprocessing.preprocess import CodemParameters
 from codem.preprocessing.preprocess import GeoData
 from codem.preprocessing.preprocess import RegistrationParameters
-from scipy import spatial
-from scipy.sparse import diags
+from codem.registration.anderson import AndersonAcceleration
+from codem.registration.correspondence import covering_radius
+from codem.registration.correspondence import GridCorrespondence
+from codem.registration.correspondence import KdTreeCorrespondence
+from codem.registration.sampling import curvature_sampling
+from codem.registration.sampling import normal_space_sampling
+from codem.registration.sampling import random_sampling
+from codem.registration.sampling import surface_variation
+from scipy import linalg
 
 if TYPE_CHECKING:
     from codem.registration import DsmRegistration
 
 
+# points per chunk when accumulating the ICP normal equations
+_CHUNK_SIZE = 1 << 16
+
+# largest half-width, in cells, of the grid correspondence neighbourhood
+# derived from the outlier threshold
+_MAX_GRID_RADIUS = 6
+
+
 class IcpRegistration:
     """
     A class to solve the transformation between two point clouds. Uses point-to-
@@ -51,11 +71,17 @@ class IcpRegistration:
     Methods
     --------
     register
+    _match
+    _energy
+    _sample
+    _level
+    _correspondence
     _residuals
     _get_weights
     _apply_transform
     _scaled
     _unscaled
+    _solve
     _output
     """
 
@@ -68,8 +94,16 @@ class IcpRegistration:
     ) -> None:
         self.logger = logging.getLogger(__name__)
         self.fixed = fnd_obj.point_cloud
+        self.fixed_origin = fnd_obj.origin
         self.normals = fnd_obj.normal_vectors
+        self.fixed_mask = fnd_obj.nodata_mask
+        self.fixed_transform = fnd_obj.transform
+        self.fixed_area_or_point = fnd_obj.area_or_point
         self.moving = aoi_obj.point_cloud
+        self.moving_origin = aoi_obj.origin
+        self.moving_surface = aoi_obj.infilled
+        self.moving_mask = aoi_obj.nodata_mask
+        self.moving_transform = aoi_obj.transform
         self.resolution = aoi_obj.resolution
         self.initial_transform = dsm_reg.registration_parameters["matrix"]
         self.outlier_thresh = dsm_reg.registration_parameters["rmse_3d"]
@@ -107,90 +141,195 @@ class IcpRegistration:
         * Repeat above steps until a convergence criteria or maximum iteration
         threshold is reached
         * Assign final transformation as attribute
+
+        If ICP_LEVELS is greater than 0, the iterations first run on the
+        points decimated by 2**ICP_LEVELS, continuing at each finer level once
+        they converge or reach ICP_LEVEL_ITER, and finish at full resolution
+        within ICP_MAX_ITER iterations.
+        Unless ICP_SAMPLING is 'none', the iterations only use a sample of
+        ICP_SAMPLE_SIZE moving points. With ICP_ACCELERATE, each iteration
+        starts from an Anderson extrapolation of the previous transforms, and
+        falls back to the plain ICP transform when the extrapolation increases
+        the truncated point-to-plane energy. With ICP_FLOAT32, the mean-removed
+        points are stored and transformed in single precision, while the
+        normal equations are still accumulated and solved in double precision.
         """
         self.logger.info("Solving ICP registration.")
 
-        # Apply transform from previous feature-matching registration
-        moving = self._apply_transform(self.moving, self.initial_transform)
+        dtype = np.float32 if self.config["ICP_FLOAT32"] else np.float64
 
-        # Remove fixed mean to decorrelate rotation and translation
-        fixed_mean = np.mean(self.fixed, axis=0)
-        fixed = self.fixed - fixed_mean
-        moving = moving - fixed_mean
+        # Apply transform from previous feature-matching registration, after
+        # adding back the origin the AOI points are stored relative to
+        moving_origin = np.eye(4)
+        moving_origin[:3, 3] = self.moving_origin
+        moving = self._apply_transform(
+            self.moving, self.initial_transform @ moving_origin
+        )
 
-        fixed_tree = spatial.cKDTree(fixed)
+        # Remove fixed mean to decorrelate rotation and translation; the
+        # difference is taken before any rounding to single precision
+        relative_mean = np.mean(self.fixed, axis=0, dtype=np.float64)
+        fixed_mean = self.fixed_origin + relative_mean
+        fixed = np.empty_like(self.fixed, dtype=dtype)
+        np.subtract(self.fixed, relative_mean, out=fixed)
+        moving -= fixed_mean
+        moving = np.asarray(moving, dtype=dtype)
+        normals = np.asarray(self.normals, dtype=dtype)
+        sample = self._sample()
+        sampled = moving if sample is None else moving[sample]
 
         cumulative_transform = np.eye(4)
-        moving_transformed = moving
         rmse = np.float64(0.0)
-        previous_rmse = np.float64(1e-12)
+        iterations = 0
 
         alpha = 2.0
-        beta = (self.resolution) / 2 + 0.5
         tau = 0.2
 
-        for i in range(self.config["ICP_MAX_ITER"]):
-            _, idx = fixed_tree.query(
-                moving_transformed, k=1, distance_upper_bound=self.outlier_thresh
-            )
-
-            include_fixed = idx[idx < fixed.shape[0]]
-            include_moving = idx < fixed.shape[0]
-            temp_fixed = fixed[include_fixed]
-            temp_normals = self.normals[include_fixed]
-            temp_moving_transformed = moving_transformed[include_moving]
-
-            if temp_fixed.shape[0] < 7:
-                raise RuntimeError(
-                    "At least 7 points within the ICP outlier threshold are required."
-                )
+        accelerate = self.config["ICP_ACCELERATE"]
+        anderson = AndersonAcceleration()
 
-            weights = self._get_weights(
-                temp_fixed, temp_normals, temp_moving_transformed, alpha, beta
+        for level in range(self.config["ICP_LEVELS"], -1, -1):
+            factor = 2**level
+            level_fixed, level_normals, level_moving, correspondence = self._level(
+                fixed, normals, sampled, fixed_mean, factor
             )
-            alpha -= tau
-
-            if self.config["ICP_SOLVE_SCALE"]:
-                current_transform, euler, distance = self._scaled(
-                    temp_fixed, temp_normals, temp_moving_transformed, weights
-                )
-            else:
-                current_transform, euler, distance = self._unscaled(
-                    temp_fixed, temp_normals, temp_moving_transformed, weights
-                )
-
-            cumulative_transform = current_transform @ cumulative_transform
-            moving_transformed = self._apply_transform(moving, cumulative_transform)
-
-            temp_moving_transformed = self._apply_transform(
-                temp_moving_transformed, current_transform
+            self.logger.debug(
+                f"ICP level {level}: {level_fixed.shape[0]} fixed and "
+                f"{level_moving.shape[0]} moving points."
             )
-            squared_error = (temp_fixed - temp_moving_transformed) ** 2
-            rmse = np.sqrt(
-                np.sum(np.sum(squared_error, axis=1)) / temp_moving_transformed.shape[0]
+            # transformed and matched points are written into buffers that are
+            # reused by every iteration of the level
+            moving_transformed = np.empty_like(level_moving)
+            error = np.empty_like(level_moving)
+            buffers = (
+                np.empty_like(level_moving),
+                np.empty_like(level_moving),
+                np.empty_like(level_moving),
             )
+            self._apply_transform(
+                level_moving, cumulative_transform, out=moving_transformed
+            )
+            previous_rmse = np.float64(1e-12)
+            beta = (self.resolution * factor) / 2 + 0.5
+            previous_energy = np.inf
+            fallback_transform = cumulative_transform
+            accelerated = False
+            anderson.reset()
+
+            # decimated levels only bring the points close to the solution, so
+            # they run a bounded number of iterations
+            max_iter = self.config["ICP_MAX_ITER"]
+            if level > 0:
+                max_iter = min(max_iter, self.config["ICP_LEVEL_ITER"])
+
+            for i in range(max_iter):
+                iterations += 1
+                matches = self._match(
+                    correspondence,
+                    level_fixed,
+                    level_normals,
+                    moving_transformed,
+                    buffers,
+                )
+                if accelerate:
+                    energy = self._energy(*matches[1:], level_moving.shape[0])
+                    if accelerated and energy > previous_energy:
+                        # the extrapolation overshot; resume from the plain step
+                        cumulative_transform = fallback_transform
+                        self._apply_transform(
+                            level_moving, cumulative_transform, out=moving_transformed
+                        )
+                        anderson.reset()
+                        matches = self._match(
+                            correspondence,
+                            level_fixed,
+                            level_normals,
+                            moving_transformed,
+                            buffers,
+                        )
+                        energy = self._energy(*matches[1:], level_moving.shape[0])
+                    previous_energy = energy
+                idx, temp_fixed, temp_normals, temp_moving_transformed = matches
+
+                if temp_fixed.shape[0] < 7:
+                    raise RuntimeError(
+                        "At least 7 points within the ICP outlier threshold are required."
+                    )
+
+                weights = self._get_weights(
+                    temp_fixed, temp_normals, temp_moving_transformed, alpha, beta
+                )
+                alpha -= tau
+
+                if self.config["ICP_SOLVE_SCALE"]:
+                    current_transform, euler, distance = self._scaled(
+                        temp_fixed, temp_normals, temp_moving_transformed, weights
+                    )
+                else:
+                    current_transform, euler, distance = self._unscaled(
+                        temp_fixed, temp_normals, temp_moving_transformed, weights
+                    )
+
+                previous_transform = cumulative_transform
+                cumulative_transform = current_transform @ cumulative_transform
+
+                self._apply_transform(
+                    temp_moving_transformed,
+                    current_transform,
+                    out=temp_moving_transformed,
+                )
+                temp_error = np.subtract(
+                    temp_fixed,
+                    temp_moving_transformed,
+                    out=error[: temp_fixed.shape[0]],
+                )
+                rmse = np.sqrt(
+                    np.einsum("ij,ij->", temp_error, temp_error, dtype=np.float64)
+                    / temp_moving_transformed.shape[0]
+                )
 
-            relative_change_rmse = np.abs((rmse - previous_rmse) / previous_rmse)
-            previous_rmse = rmse
-
-            if relative_change_rmse < self.config["ICP_RMSE_THRESHOLD"]:
-                self.logger.debug("ICP converged via minimum relative change in RMSE.")
-                break
-
-            if (
-                euler < self.config["ICP_ANGLE_THRESHOLD"]
-                and distance < self.config["ICP_DISTANCE_THRESHOLD"]
-            ):
-                self.logger.debug("ICP converged via angle and distance thresholds.")
-                break
+                relative_change_rmse = np.abs((rmse - previous_rmse) / previous_rmse)
+                previous_rmse = rmse
+
+                converged = False
+                if relative_change_rmse < self.config["ICP_RMSE_THRESHOLD"]:
+                    self.logger.debug(
+                        "ICP converged via minimum relative change in RMSE."
+                    )
+                    converged = True
+                elif (
+                    euler < self.config["ICP_ANGLE_THRESHOLD"]
+                    and distance < self.config["ICP_DISTANCE_THRESHOLD"]
+                ):
+                    self.logger.debug(
+                        "ICP converged via angle and distance thresholds."
+                    )
+                    converged = True
+
+                # each level ends on a plain ICP step, which needs no check
+                accelerated = False
+                if accelerate and not converged and i < max_iter - 1:
+                    fallback_transform = cumulative_transform
+                    cumulative_transform = anderson.step(
+                        previous_transform, fallback_transform
+                    )
+                    accelerated = cumulative_transform is not fallback_transform
+
+                self._apply_transform(
+                    level_moving, cumulative_transform, out=moving_transformed
+                )
+                if converged:
+                    break
 
         self.rmse_3d = rmse
         self.rmse_xyz = np.sqrt(
-            np.sum((temp_fixed - temp_moving_transformed) ** 2, axis=0)
+            np.sum(
+                (temp_fixed - temp_moving_transformed) ** 2, axis=0, dtype=np.float64
+            )
             / temp_moving_transformed.shape[0]
         )
         self.number_points = temp_moving_transformed.shape[0]
-        self.logger.debug(f"ICP number of iterations = {i+1}, RMSE = {rmse}")
+        self.logger.debug(f"ICP number of iterations = {iterations}, RMSE = {rmse}")
 
         # The mean removal must be accommodated to generate the actual transform
         pre_transform = np.eye(4)
@@ -211,28 +350,265 @@ class IcpRegistration:
                 stacklevel=2,
             )
         if self.config["ICP_SAVE_RESIDUALS"]:
-            self.residual_origins = self._apply_transform(self.moving, T)
+            self.residual_origins = self._apply_transform(
+                self.moving, T @ moving_origin
+            )
+            if sample is not None:
+                # points left out of the sample have not been searched yet
+                sample_idx = idx
+                idx = np.full(moving.shape[0], fixed.shape[0])
+                idx[sample] = sample_idx
+                moving_transformed = self._apply_transform(moving, cumulative_transform)
             self.residual_vectors = self._residuals(
-                fixed_tree, fixed, self.normals, moving_transformed
+                correspondence, fixed, normals, moving_transformed, idx
             )
 
         self.transformation = T
         self._output()
 
+    def _match(
+        self,
+        correspondence: Union[GridCorrespondence, KdTreeCorrespondence],
+        fixed: np.ndarray,
+        normals: np.ndarray,
+        moving: np.ndarray,
+        out: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Finds the closest fixed point to each moving point within the outlier
+        threshold. The matched points and normals are gathered into the
+        leading rows of the three out buffers, each shaped like the moving
+        points, and the returned arrays are views of them.
+
+        Returns
+        -------
+        idx: np.array
+            Index of the closest fixed point of each moving point, equal to the
+            number of fixed points where none is within the threshold
+        fixed: np.array
+            Closest fixed points of the matched moving points
+        normals: np.array
+            Normals of the closest fixed points
+        moving: np.array
+            Matched moving points
+        """
+        _, idx = correspondence.query(moving, distance_upper_bound=self.outlier_thresh)
+        include_moving = np.flatnonzero(idx < fixed.shape[0])
+        include_fixed = idx[include_moving]
+        n_matched = include_moving.shape[0]
+        temp_fixed = np.take(fixed, include_fixed, axis=0, out=out[0][:n_matched])
+        temp_normals = np.take(normals, include_fixed, axis=0, out=out[1][:n_matched])
+        temp_moving = np.take(moving, include_moving, axis=0, out=out[2][:n_matched])
+        return idx, temp_fixed, temp_normals, temp_moving
+
+    def _energy(
+        self,
+        fixed: np.ndarray,
+        normals: np.ndarray,
+        moving: np.ndarray,
+        n_moving: int,
+    ) -> float:
+        """
+        Computes the mean squared point-to-plane distance of all moving points,
+        truncated at the outlier threshold; moving points without a closest
+        point within the threshold count at the threshold. Unlike the robust
+        weights, it does not change between iterations, so the energies of
+        successive iterations can be compared.
+        """
+        threshold = float(self.outlier_thresh) ** 2
+        residuals = np.sum((moving - fixed) * normals, axis=1) ** 2
+        truncated = np.sum(np.minimum(residuals, threshold))
+        return float(truncated + (n_moving - moving.shape[0]) * threshold) / n_moving
+
+    def _sample(self) -> Optional[np.ndarray]:
+        """
+        Samples the moving points used by the ICP iterations with the method
+        set by ICP_SAMPLING. The normal vectors and surface variation of the
+        moving points are computed on the AOI raster; if the moving points do
+        not follow it, they are sampled at random.
+
+        Returns
+        -------
+        sample: Optional[np.array]
+            Sorted indices of the sampled moving points, or None if all of
+            them are used
+        """
+        method = self.config["ICP_SAMPLING"]
+        count = self.config["ICP_SAMPLE_SIZE"]
+        n_points = self.moving.shape[0]
+        if method == "none" or count >= n_points:
+            return None
+        self.logger.debug(f"Sampling {count} of {n_points} ICP moving points.")
+
+        rng = np.random.default_rng(0)
+        mask = np.asarray(self.moving_mask, dtype=bool)
+        if method == "random":
+            return random_sampling(n_points, count, rng)
+        if self.moving_transform is None or np.count_nonzero(mask) != n_points:
+            self.logger.debug(
+                "AOI points do not follow the AOI raster, "
+                "falling back to random sampling."
+            )
+            return random_sampling(n_points, count, rng)
+
+        normals = grid_normals(self.moving_surface, self.moving_transform)
+        if method == "normal":
+            return normal_space_sampling(normals[mask], count, rng)
+        return curvature_sampling(surface_variation(normals)[mask], count, rng)
+
+    def _level(
+        self,
+        fixed: np.ndarray,
+        normals: np.ndarray,
+        moving: np.ndarray,
+        fixed_mean: np.ndarray,
+        factor: int,
+    ) -> Tuple[
+        np.ndarray,
+        np.ndarray,
+        np.ndarray,
+        Union[GridCorrespondence, KdTreeCorrespondence],
+    ]:
+        """
+        Decimates the fixed and moving points for a level of the ICP schedule
+        and creates the closest point search backend for the decimated fixed
+        points. Fixed points that follow the foundation raster keep every
+        factor-th row and column of it, so the grid backend still applies;
+        otherwise, like the moving points, every factor**2-th point is kept.
+
+        Parameters
+        ----------
+        fixed: np.array
+            Array of fixed points with the fixed mean removed
+        normals: np.array
+            Array of normal vectors of the fixed points
+        moving: np.array
+            Array of moving points with the fixed mean removed
+        fixed_mean: np.array
+            Mean of the fixed points
+        factor: int
+            Decimation factor of the level
+
+        Returns
+        -------
+        fixed: np.array
+            Decimated fixed points
+        normals: np.array
+            Normals of the decimated fixed points
+        moving: np.array
+            Decimated moving points
+        correspondence: GridCorrespondence or KdTreeCorrespondence
+            Closest point search backend for the decimated fixed points
+        """
+        if factor == 1:
+            return (
+                fixed,
+                normals,
+                moving,
+                self._correspondence(fixed, fixed_mean),
+            )
+
+        mask = np.asarray(self.fixed_mask, dtype=bool)
+        if np.count_nonzero(mask) == fixed.shape[0]:
+            index = np.full(mask.shape, -1, dtype=np.int64)
+            index[mask] = np.arange(fixed.shape[0])
+            fixed_idx = index[::factor, ::factor]
+            fixed_idx = fixed_idx[fixed_idx >= 0]
+        else:
+            fixed_idx = np.arange(0, fixed.shape[0], factor**2)
+        return (
+            fixed[fixed_idx],
+            normals[fixed_idx],
+            moving[:: factor**2],
+            self._correspondence(fixed[fixed_idx], fixed_mean, factor),
+        )
+
+    def _correspondence(
+        self, fixed: np.ndarray, fixed_mean: np.ndarray, factor: int = 1
+    ) -> Union[GridCorrespondence, KdTreeCorrespondence]:
+        """
+        Creates the closest point search backend for the fixed points. The grid
+        backend indexes the foundation raster directly and is used when the
+        fixed points map one-to-one onto the valid foundation cells; otherwise,
+        or when configured, a KD-tree is built. Unless ICP_GRID_RADIUS sets it,
+        the grid neighbourhood covers the outlier threshold, up to
+        _MAX_GRID_RADIUS cells.
+
+        Parameters
+        ----------
+        fixed: np.array
+            Array of fixed points with the fixed mean removed
+        fixed_mean: np.array
+            Mean of the fixed points
+        factor: int
+            Decimation factor of the foundation raster rows and columns that
+            the fixed points were taken from
+
+        Returns
+        -------
+        correspondence: GridCorrespondence or KdTreeCorrespondence
+            Closest point search backend
+        """
+        if self.config["ICP_CORRESPONDENCE"] == "grid":
+            mask = np.asarray(self.fixed_mask, dtype=bool)[::factor, ::factor]
+            if (
+                self.fixed_transform is not None
+                and np.count_nonzero(mask) == fixed.shape[0]
+            ):
+                # shift the transform into the mean-removed coordinate frame and
+                # step it over the decimated cells
+                transform = (
+                    rasterio.Affine.translation(-fixed_mean[0], -fixed_mean[1])
+                    * center_transform(self.fixed_transform, self.fixed_area_or_point)
+                    * rasterio.Affine.scale(factor)
+                )
+                radius = self.config["ICP_GRID_RADIUS"]
+                if radius == 0:
+                    # cover the outlier threshold, so the grid search finds the
+                    # same closest points as a KD-tree, unless it is too wide
+                    radius = covering_radius(
+                        transform, self.outlier_thresh, _MAX_GRID_RADIUS
+                    )
+                    if radius == _MAX_GRID_RADIUS:
+                        self.logger.debug(
+                            f"ICP grid search limited to {radius} cells, closest "
+                            "points beyond them are not found."
+                        )
+                    radius = max(radius, 1)
+                return GridCorrespondence(
+                    fixed,
+                    mask,
+                    transform,
+                    "Point",
+                    radius=radius,
+                    workers=self.config["WORKERS"],
+                )
+            self.logger.debug(
+                "Foundation points do not follow the foundation raster, "
+                "falling back to KD-tree correspondences."
+            )
+        return KdTreeCorrespondence(fixed, workers=self.config["WORKERS"])
+
     def _residuals(
         self,
-        fixed_tree: spatial.cKDTree,
+        correspondence: Union[GridCorrespondence, KdTreeCorrespondence],
         fixed: np.ndarray,
         normals: np.ndarray,
         moving: np.ndarray,
+        idx: np.ndarray,
     ) -> np.ndarray:
         """
         Generates residual vectors for visualization purposes to illustrate the
         approximate orthogonal difference between the foundation and AOI
         surfaces that remains after registration. Note that these residuals will
-        always be in meters.
+        always be in meters. The closest points found in the last ICP iteration
+        are reused, and only the moving points that had none within the outlier
+        threshold are searched again, without the threshold.
         """
-        _, idx = fixed_tree.query(moving, k=1)
+        idx = idx.copy()
+        missing = idx == fixed.shape[0]
+        if np.any(missing):
+            idx[missing] = correspondence.query(moving[missing])[1]
         include_fixed = idx[idx < fixed.shape[0]]
         include_moving = idx < fixed.shape[0]
         temp_fixed = fixed[include_fixed]
@@ -250,7 +626,7 @@ class IcpRegistration:
         moving: np.ndarray,
         alpha: float,
         beta: float,
-    ) -> diags:
+    ) -> np.ndarray:
         """
         A dynamic weight function from an as yet unpublished manuscript. Details
         will be inserted once the manuscript is published. Traditional robust
@@ -273,21 +649,28 @@ class IcpRegistration:
 
         Returns
         -------
-        weights: diags
-            Sparse matrix of weights
+        weights: np.array
+            Array of per-point weights
         """
         r = np.sum((moving - fixed) * normals, axis=1)
+        weights: np.ndarray
         if alpha != 0:
             weights = (1 + (r / beta) ** 2) ** (alpha / 2 - 1)
         else:
             weights = beta**2 / (beta**2 + r**2)
 
-        return diags(weights)
+        return weights
 
-    def _apply_transform(self, points: np.ndarray, transform: np.ndarray) -> np.ndarray:
+    def _apply_transform(
+        self,
+        points: np.ndarray,
+        transform: np.ndarray,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
         """
         Applies a 4x4 homogeneous transformation matrix to an array of 3D point
-        coordinates.
+        coordinates, as a rotation followed by a translation, without forming
+        homogeneous coordinates.
 
         Parameters
         ----------
@@ -295,6 +678,10 @@ class IcpRegistration:
             Array of 3D points to be transformed
         transform: np.array
             4x4 transformation matrix to apply to points
+        out: Optional[np.array]
+            Array shaped like points to write the transformed points to, which
+            may be points itself; the transformation is applied in its
+            precision. If None, a double precision array is allocated.
 
         Returns
         -------
@@ -305,12 +692,19 @@ class IcpRegistration:
             raise ValueError(
                 f"Transformation matrix is an invalid shape: {transform.shape}"
             )
-        points = np.hstack((points, np.ones((points.shape[0], 1))))
-        transformed_points: np.ndarray = np.transpose(transform @ points.T)[:, 0:3]
+        if out is None:
+            out = np.empty(points.shape, dtype=np.float64)
+        rotation = transform[0:3, 0:3].T.astype(out.dtype)
+        transformed_points: np.ndarray = np.matmul(points, rotation, out=out)
+        transformed_points += transform[0:3, 3].astype(out.dtype)
         return transformed_points
 
     def _scaled(
-        self, fixed: np.ndarray, normals: np.ndarray, moving: np.ndarray, weights: diags
+        self,
+        fixed: np.ndarray,
+        normals: np.ndarray,
+        moving: np.ndarray,
+        weights: np.ndarray,
     ) -> Tuple[np.ndarray, float, float]:
         """
         Solves a scaled rigid-body transformation (7-parameter) that minimizes
@@ -324,8 +718,8 @@ class IcpRegistration:
             Array of normal vectors corresponding to the fixed points
         moving: np.array
             Array of points to be transformed to the fixed point locations
-        weights: scipy.sparse.diags
-            Sparse matrix of weights for robustness against outliers
+        weights: np.array
+            Array of per-point weights for robustness against outliers
 
         Returns
         -------
@@ -336,16 +730,7 @@ class IcpRegistration:
         distance: float
             The translation distance
         """
-        b = np.sum(fixed * normals, axis=1)
-        A1 = np.cross(moving, normals)
-        A2 = normals
-        A3 = np.expand_dims(np.sum(moving * normals, axis=1), axis=1)
-        A = np.hstack((A1, A2, A3))
-
-        if self.config["ICP_ROBUST"]:
-            x = np.linalg.inv(A.T @ weights @ A) @ A.T @ weights @ b
-        else:
-            x = np.linalg.inv(A.T @ A) @ A.T @ b
+        x = self._solve(fixed, normals, moving, weights, scale=True)
 
         x[:3] /= x[6]
 
@@ -383,7 +768,11 @@ class IcpRegistration:
         return transform, euler, distance
 
     def _unscaled(
-        self, fixed: np.ndarray, normals: np.ndarray, moving: np.ndarray, weights: diags
+        self,
+        fixed: np.ndarray,
+        normals: np.ndarray,
+        moving: np.ndarray,
+        weights: np.ndarray,
     ) -> Tuple[np.ndarray, float, float]:
         """
         Solves a rigid-body transformation (6-parameter) that minimizes
@@ -397,8 +786,8 @@ class IcpRegistration:
             Array of normal vectors corresponding to the fixed points
         moving: np.array
             Array of points to be transformed to the fixed point locations
-        weights: scipy.sparse.diags
-            Sparse matrix of weights for robustness against outliers
+        weights: np.array
+            Array of per-point weights for robustness against outliers
 
         Returns
         -------
@@ -409,17 +798,7 @@ class IcpRegistration:
         distance: float
             The translation distance
         """
-        b1 = np.sum(fixed * normals, axis=1)
-        b2 = np.sum(moving * normals, axis=1)
-        b = np.expand_dims(b1 - b2, axis=1)
-        A1 = np.cross(moving, normals)
-        A2 = normals
-        A = np.hstack((A1, A2))
-
-        if self.config["ICP_ROBUST"]:
-            x = np.linalg.inv(A.T @ weights @ A) @ A.T @ weights @ b
-        else:
-            x = np.linalg.inv(A.T @ A) @ A.T @ b
+        x = self._solve(fixed, normals, moving, weights, scale=False)
 
         R = np.eye(3)
         T = np.zeros(3)
@@ -453,6 +832,76 @@ class IcpRegistration:
 
         return transform, euler, distance
 
+    def _solve(
+        self,
+        fixed: np.ndarray,
+        normals: np.ndarray,
+        moving: np.ndarray,
+        weights: np.ndarray,
+        scale: bool,
+    ) -> np.ndarray:
+        """
+        Solves the linearized point to plane least squares problem through its
+        normal equations. The 6x6 (or 7x7 with scale) normal matrix is
+        accumulated from fixed-size chunks of row-scaled Jacobian blocks, so
+        memory use is bounded by the chunk size rather than the number of
+        points, and is solved by Cholesky factorization with a least squares
+        fallback for ill-conditioned systems.
+
+        Parameters
+        ----------
+        fixed: np.array
+            Array of fixed points ordered to correspond to the moving points
+        normals: np.array
+            Array of normal vectors corresponding to the fixed points
+        moving: np.array
+            Array of points to be transformed to the fixed point locations
+        weights: np.array
+            Array of per-point weights, ignored unless ICP_ROBUST is set
+        scale: bool
+            Whether to solve for a scale factor (7-parameter) or not (6-parameter)
+
+        Returns
+        -------
+        x: np.array
+            Solved rotation angles, translations and, if solved, scale factor
+        """
+        n_params = 7 if scale else 6
+        normal_matrix = np.zeros((n_params, n_params))
+        normal_vector = np.zeros(n_params)
+
+        for start in range(0, fixed.shape[0], _CHUNK_SIZE):
+            chunk = slice(start, start + _CHUNK_SIZE)
+            chunk_normals = normals[chunk].astype(np.float64, copy=False)
+            chunk_moving = moving[chunk].astype(np.float64, copy=False)
+
+            A = np.empty((chunk_normals.shape[0], n_params))
+            A[:, :3] = np.cross(chunk_moving, chunk_normals)
+            A[:, 3:6] = chunk_normals
+            b = np.einsum(
+                "ij,ij->i", fixed[chunk].astype(np.float64, copy=False), chunk_normals
+            )
+            moving_distance = np.einsum("ij,ij->i", chunk_moving, chunk_normals)
+            if scale:
+                A[:, 6] = moving_distance
+            else:
+                b -= moving_distance
+
+            if self.config["ICP_ROBUST"]:
+                weighted = A * weights[chunk, np.newaxis]
+            else:
+                weighted = A
+            normal_matrix += weighted.T @ A
+            normal_vector += weighted.T @ b
+
+        try:
+            x: np.ndarray = linalg.cho_solve(
+                linalg.cho_factor(normal_matrix), normal_vector
+            )
+        except linalg.LinAlgError:
+            x = linalg.lstsq(normal_matrix, normal_vector)[0]
+        return x
+
     def _output(self) -> None:
         """
         Stores registration results in a dictionary and writes them to a file
@@ -0,0 +1,243 @@
+"""
+keypoints.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+This module contains a tiled AKAZE feature extractor for large normalized
+DSMs. A single detectAndCompute call over a large image runs on one thread and
+builds a nonlinear scale space the size of the whole image. The extractor
+instead splits the image into tiles that overlap by a fixed margin, detects and
+describes the tiles concurrently and keeps each keypoint only from the tile
+whose core, the tile without its margin, contains it. The cores partition the
+image, so keypoints in the overlaps are never duplicated, and keypoints close
+to a tile edge, whose descriptors would be truncated, are always taken from a
+neighbouring tile instead.
+
+A keypoint budget can then be imposed with a spatially uniform selection that
+keeps the strongest responses of every cell of a coarse grid over the image.
+
+This module contains the following class and method:
+
+* TiledAkaze - class for extracting AKAZE features tile by tile
+* bucket_keypoints - limits keypoints to a budget spread evenly over the image
+"""
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+
+# margin in pixels added around each tile core, which covers the support of
+# the descriptors of all but the coarsest AKAZE scales
+TILE_OVERLAP = 128
+
+# bytes in an AKAZE descriptor
+_DESCRIPTOR_SIZE = 61
+
+# number of grid cells keypoints are bucketed into by bucket_keypoints
+BUCKETS = 1024
+
+
+class TiledAkaze:
+    """
+    Extracts AKAZE keypoints and descriptors from overlapping tiles of an
+    8-bit grayscale image. Images that fit in a single tile are processed with
+    one detectAndCompute call.
+
+    Parameters
+    ----------
+    threshold: float
+        AKAZE detector response threshold
+    tile_size: int
+        Side length in pixels of the tile cores
+    workers: int
+        Number of threads detecting tiles concurrently; 0 uses all CPUs
+
+    Methods
+    -------
+    detect_and_compute
+    tiles
+    _detect_tile
+    _detect
+    """
+
+    def __init__(self, threshold: float, tile_size: int, workers: int = 0) -> None:
+        if tile_size <= 0:
+            raise ValueError("Tile size must be greater than 0.")
+        self.threshold = threshold
+        self.tile_size = tile_size
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+
+    def tiles(self, shape: Tuple[int, ...]) -> List[Tuple[slice, slice, slice, slice]]:
+        """
+        Lays out the tiles covering an image.
+
+        Parameters
+        ----------
+        shape: tuple
+            Image shape
+
+        Returns
+        -------
+        tiles: list
+            Row and column slices of each tile core followed by the row and
+            column slices of the tile including its margin
+        """
+        rows, cols = shape[:2]
+        tiles = []
+        for top in range(0, rows, self.tile_size):
+            for left in range(0, cols, self.tile_size):
+                bottom = min(top + self.tile_size, rows)
+                right = min(left + self.tile_size, cols)
+                tiles.append(
+                    (
+                        slice(top, bottom),
+                        slice(left, right),
+                        slice(
+                            max(top - TILE_OVERLAP, 0), min(bottom + TILE_OVERLAP, rows)
+                        ),
+                        slice(
+                            max(left - TILE_OVERLAP, 0), min(right + TILE_OVERLAP, cols)
+                        ),
+                    )
+                )
+        return tiles
+
+    def detect_and_compute(
+        self, img: np.ndarray, mask: Optional[np.ndarray] = None
+    ) -> Tuple[Tuple[cv2.KeyPoint, ...], np.ndarray]:
+        """
+        Extracts keypoints and descriptors from an image.
+
+        Parameters
+        ----------
+        img: np.array
+            Normalized 8-bit grayscale image
+        mask: Optional[np.array]
+            8-bit mask of locations where keypoints may be detected
+
+        Returns
+        -------
+        kp: tuple(cv2.KeyPoint,...)
+            OpenCV keypoints in image pixel coordinates
+        desc: np.array
+            OpenCV AKAZE descriptors, one row per keypoint
+        """
+        if mask is None:
+            mask = np.ones(img.shape[:2], dtype=np.uint8)
+        tiles = self.tiles(img.shape)
+        if len(tiles) == 1:
+            kp, desc = self._detect(img, mask)
+            return tuple(kp), desc
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(
+                executor.map(lambda tile: self._detect_tile(img, mask, tile), tiles)
+            )
+        keypoints = [kp for tile_kp, _ in results for kp in tile_kp]
+        descriptors = [desc for _, desc in results]
+        return tuple(keypoints), np.vstack(descriptors)
+
+    def _detect_tile(
+        self,
+        img: np.ndarray,
+        mask: np.ndarray,
+        tile: Tuple[slice, slice, slice, slice],
+    ) -> Tuple[List[cv2.KeyPoint], np.ndarray]:
+        """
+        Extracts the keypoints lying in the core of a tile and shifts them to
+        image pixel coordinates.
+        """
+        core_rows, core_cols, rows, cols = tile
+        kp, desc = self._detect(
+            np.ascontiguousarray(img[rows, cols]),
+            np.ascontiguousarray(mask[rows, cols]),
+        )
+        keep = []
+        for i, point in enumerate(kp):
+            x = point.pt[0] + cols.start
+            y = point.pt[1] + rows.start
+            if (
+                core_cols.start <= x < core_cols.stop
+                and core_rows.start <= y < core_rows.stop
+            ):
+                point.pt = (x, y)
+                keep.append(i)
+        return [kp[i] for i in keep], desc[keep]
+
+    def _detect(
+        self, img: np.ndarray, mask: np.ndarray
+    ) -> Tuple[List[cv2.KeyPoint], np.ndarray]:
+        """
+        Runs the AKAZE detector and descriptor on a single image.
+        """
+        detector = cv2.AKAZE_create(threshold=self.threshold)
+        kp, desc = detector.detectAndCompute(img, mask)
+        if desc is None:
+            return [], np.empty((0, _DESCRIPTOR_SIZE), dtype=np.uint8)
+        return list(kp), desc
+
+
+def bucket_keypoints(
+    kp: Sequence[cv2.KeyPoint],
+    desc: np.ndarray,
+    shape: Tuple[int, ...],
+    budget: int,
+    buckets: int = BUCKETS,
+) -> Tuple[Tuple[cv2.KeyPoint, ...], np.ndarray]:
+    """
+    Keeps at most budget keypoints, spread evenly over the image. The image is
+    divided into roughly square grid cells and the keypoints of each cell are
+    ranked by response. Keypoints are then taken rank by rank - the strongest
+    of every cell first, then the second strongest, and so on - with stronger
+    responses first within a rank, so sparse cells keep all their keypoints
+    and the budget left over goes to the densest cells.
+
+    Parameters
+    ----------
+    kp: Sequence[cv2.KeyPoint]
+        OpenCV keypoints
+    desc: np.array
+        Descriptors, one row per keypoint
+    shape: tuple
+        Shape of the image the keypoints were extracted from
+    budget: int
+        Maximum number of keypoints to keep
+    buckets: int
+        Approximate number of grid cells
+
+    Returns
+    -------
+    kp: tuple(cv2.KeyPoint,...)
+        Kept keypoints, in their original order
+    desc: np.array
+        Descriptors of the kept keypoints
+    """
+    if len(kp) <= budget:
+        return tuple(kp), desc
+
+    rows, cols = shape[:2]
+    cell = max(math.sqrt(rows * cols / buckets), 1.0)
+    grid_cols = int(math.ceil(cols / cell))
+    points = np.array([point.pt for point in kp]).reshape(-1, 2)
+    response = np.array([point.response for point in kp])
+    bucket = (points[:, 1] // cell).astype(np.int64) * grid_cols + (
+        points[:, 0] // cell
+    ).astype(np.int64)
+
+    # rank of each keypoint by response within its bucket
+    order = np.lexsort((-response, bucket))
+    sorted_bucket = bucket[order]
+    first = np.flatnonzero(np.r_[True, sorted_bucket[1:] != sorted_bucket[:-1]])
+    starts = np.repeat(first, np.diff(np.r_[first, len(order)]))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order)) - starts
+
+    keep = np.sort(np.lexsort((-response, rank))[:budget])
+    return tuple(kp[i] for i in keep), desc[keep]
@@ -0,0 +1,283 @@
+"""
+matching.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+This module contains descriptor matching routines for DSM registration. When
+the AOI is already georeferenced to within a known distance of the foundation,
+an AOI keypoint can only match foundation keypoints lying within that distance
+of it in object space. Constrained matching hashes the foundation keypoints
+into a grid of cells the size of the search radius, so each AOI descriptor is
+only compared against the descriptors in the 3x3 cells around it. The work is
+proportional to the number of nearby keypoint pairs rather than to the product
+of the keypoint counts, and distant look-alike features can no longer produce
+putative matches.
+
+For descriptor sets too large for OpenCV's brute force matcher, exhaustive
+matching compares all descriptors block by block in a thread pool. With the
+bits of two descriptors mapped to +1 and -1, their Hamming distance is half the
+bit count minus half their dot product, so each block of distances is a single
+matrix product, which is exact in single precision and runs at BLAS speed.
+Memory is bounded by the block sizes regardless of the descriptor counts.
+
+This module contains the following methods:
+
+* hamming - Hamming distances between paired binary descriptors
+* constrained_match - nearest neighbor descriptor matching within a radius
+* exhaustive_match - exact nearest neighbor descriptor matching in blocks
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+
+# number of set bits in each byte value
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(
+    axis=1, dtype=np.uint16
+)
+
+# descriptor pairs compared per block
+_BLOCK_SIZE = 1 << 16
+
+# query and train descriptors per block of exhaustive_match, which bound the
+# distance matrix of each worker to 64 MB
+QUERY_BLOCK = 1024
+TRAIN_BLOCK = 16384
+
+
+def hamming(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Computes the Hamming distances between paired rows of two arrays of
+    binary descriptors.
+
+    Parameters
+    ----------
+    a: np.array
+        Array of uint8 descriptors, one row per descriptor
+    b: np.array
+        Array of uint8 descriptors of the same shape as a
+
+    Returns
+    -------
+    distances: np.array
+        Number of differing bits between each pair of rows
+    """
+    distances: np.ndarray = _POPCOUNT[np.bitwise_xor(a, b)].sum(axis=1, dtype=np.int64)
+    return distances
+
+
+def constrained_match(
+    query_xy: np.ndarray,
+    query_desc: np.ndarray,
+    train_xy: np.ndarray,
+    train_desc: np.ndarray,
+    radius: float,
+    ratio: float,
+) -> List[cv2.DMatch]:
+    """
+    Matches each query descriptor to its nearest train descriptor in Hamming
+    distance among the train keypoints within a radius of the query keypoint.
+    Matches are kept if they pass Lowe's ratio test against the second nearest
+    train descriptor within the radius; query keypoints with fewer than two
+    train keypoints within the radius are not matched.
+
+    Parameters
+    ----------
+    query_xy: np.array
+        Object space coordinates of the query keypoints
+    query_desc: np.array
+        Binary descriptors of the query keypoints
+    train_xy: np.array
+        Object space coordinates of the train keypoints
+    train_desc: np.array
+        Binary descriptors of the train keypoints
+    radius: float
+        Maximum horizontal distance between matched keypoints
+    ratio: float
+        Lowe's ratio test threshold
+
+    Returns
+    -------
+    matches: List[cv2.DMatch]
+        Matches ordered by query index, with queryIdx and trainIdx indexing
+        the query and train keypoints
+    """
+    if radius <= 0:
+        raise ValueError("Search radius must be greater than 0.")
+    if len(query_xy) == 0 or len(train_xy) < 2:
+        return []
+
+    # sort the train keypoints by the grid cell containing them
+    origin = train_xy.min(axis=0)
+    train_cell = np.floor((train_xy - origin) / radius).astype(np.int64)
+    width = int(train_cell[:, 0].max()) + 1
+    height = int(train_cell[:, 1].max()) + 1
+    train_key = train_cell[:, 1] * width + train_cell[:, 0]
+    order = np.argsort(train_key, kind="stable")
+    sorted_key = train_key[order]
+
+    # gather the train keypoints of the 3x3 cells around each query keypoint
+    query_cell = np.floor((query_xy - origin) / radius).astype(np.int64)
+    query_idx = []
+    train_idx = []
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            col = query_cell[:, 0] + dx
+            row = query_cell[:, 1] + dy
+            inside = (col >= 0) & (col < width) & (row >= 0) & (row < height)
+            key = np.where(inside, row * width + col, -1)
+            start = np.searchsorted(sorted_key, key, side="left")
+            stop = np.searchsorted(sorted_key, key, side="right")
+            counts = stop - start
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            query_idx.append(np.repeat(np.arange(len(query_xy)), counts))
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            train_idx.append(order[np.repeat(start, counts) + offsets])
+    if not query_idx:
+        return []
+    pair_query = np.concatenate(query_idx)
+    pair_train = np.concatenate(train_idx)
+
+    near = (
+        np.sum((query_xy[pair_query] - train_xy[pair_train]) ** 2, axis=1)
+        <= radius**2
+    )
+    pair_query = pair_query[near]
+    pair_train = pair_train[near]
+
+    distances = np.empty(len(pair_query), dtype=np.int64)
+    for begin in range(0, len(pair_query), _BLOCK_SIZE):
+        block = slice(begin, begin + _BLOCK_SIZE)
+        distances[block] = hamming(
+            query_desc[pair_query[block]], train_desc[pair_train[block]]
+        )
+
+    # nearest and second nearest train descriptor of each query descriptor
+    ranked = np.lexsort((distances, pair_query))
+    pair_query = pair_query[ranked]
+    pair_train = pair_train[ranked]
+    distances = distances[ranked]
+    first = np.flatnonzero(np.r_[True, pair_query[1:] != pair_query[:-1]])
+    second = first + 1
+    has_second = second < len(pair_query)
+    has_second[has_second] = (
+        pair_query[second[has_second]] == pair_query[first[has_second]]
+    )
+    first = first[has_second]
+    second = second[has_second]
+    good = distances[first] < ratio * distances[second]
+
+    return [
+        cv2.DMatch(int(q), int(t), float(d))
+        for q, t, d in zip(
+            pair_query[first[good]], pair_train[first[good]], distances[first[good]]
+        )
+    ]
+
+
+def _signs(desc: np.ndarray) -> np.ndarray:
+    """
+    Maps the bits of binary descriptors to +1 and -1.
+    """
+    signs: np.ndarray = np.unpackbits(desc, axis=1).astype(np.float32)
+    signs *= 2
+    signs -= 1
+    return signs
+
+
+def _match_block(
+    query_desc: np.ndarray, train_desc: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Finds the nearest and second nearest train descriptor of each query
+    descriptor in a block.
+
+    Returns
+    -------
+    best_idx: np.array
+        Index of the nearest train descriptor
+    best: np.array
+        Hamming distance to the nearest train descriptor
+    second: np.array
+        Hamming distance to the second nearest train descriptor
+    """
+    bits = query_desc.shape[1] * 8
+    query = _signs(query_desc)
+    rows = np.arange(query.shape[0])
+    best_idx = np.zeros(query.shape[0], dtype=np.int64)
+    best = np.full(query.shape[0], np.inf, dtype=np.float32)
+    second = np.full(query.shape[0], np.inf, dtype=np.float32)
+    for begin in range(0, train_desc.shape[0], TRAIN_BLOCK):
+        train = _signs(train_desc[begin : begin + TRAIN_BLOCK])
+        distances = query @ train.T
+        distances *= -0.5
+        distances += bits / 2
+
+        idx = np.argmin(distances, axis=1)
+        block_best = distances[rows, idx]
+        if distances.shape[1] > 1:
+            distances[rows, idx] = np.inf
+            block_second = distances.min(axis=1)
+        else:
+            block_second = np.full_like(block_best, np.inf)
+
+        # merge the two smallest distances of the block with the running pair
+        second = np.minimum(
+            np.minimum(second, block_second), np.maximum(best, block_best)
+        )
+        better = block_best < best
+        best_idx[better] = idx[better] + begin
+        best = np.minimum(best, block_best)
+    return best_idx, best, second
+
+
+def exhaustive_match(
+    query_desc: np.ndarray, train_desc: np.ndarray, ratio: float, workers: int = 0
+) -> List[cv2.DMatch]:
+    """
+    Matches each query descriptor to its nearest train descriptor in Hamming
+    distance, comparing every pair of descriptors, and keeps the matches that
+    pass Lowe's ratio test against the second nearest train descriptor. The
+    result is the same as that of OpenCV's brute force k=2 matcher followed
+    by the ratio test.
+
+    Parameters
+    ----------
+    query_desc: np.array
+        Binary descriptors of the query keypoints
+    train_desc: np.array
+        Binary descriptors of the train keypoints
+    ratio: float
+        Lowe's ratio test threshold
+    workers: int
+        Number of threads matching blocks of query descriptors; 0 uses all CPUs
+
+    Returns
+    -------
+    matches: List[cv2.DMatch]
+        Matches ordered by query index, with queryIdx and trainIdx indexing
+        the query and train keypoints
+    """
+    if query_desc.shape[0] == 0 or train_desc.shape[0] < 2:
+        return []
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    blocks = [
+        query_desc[begin : begin + QUERY_BLOCK]
+        for begin in range(0, query_desc.shape[0], QUERY_BLOCK)
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(
+            executor.map(lambda block: _match_block(block, train_desc), blocks)
+        )
+
+    best_idx = np.concatenate([result[0] for result in results])
+    best = np.concatenate([result[1] for result in results])
+    second = np.concatenate([result[2] for result in results])
+    good = np.flatnonzero(best < ratio * second)
+    return [cv2.DMatch(int(q), int(best_idx[q]), float(best[q])) for q in good]
@@ -0,0 +1,140 @@
+"""
+phase.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+This module contains an FFT phase correlation estimator for the in-plane
+rotation and shift between two images. It provides a fast coarse registration
+for AOIs that are only shifted, and perhaps slightly rotated, relative to the
+foundation, where feature extraction, matching and RANSAC are unnecessary.
+
+The rotation is estimated first, from the shift between the log-polar
+resampled magnitude spectra of the images, which depend on rotation but not
+on translation. The spectra are symmetric, so the rotation is only known up to
+180 degrees. The moving image is rotated by both candidates, and by none, and
+the shift found by phase correlation; the candidate with the strongest
+correlation peak is kept. Large images are downsampled before
+correlating, which bounds the cost of the transforms.
+
+This module contains the following method:
+
+* phase_correlate - estimates the rotation and shift between two images
+"""
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+
+# longest image side correlated; larger images are downsampled to it
+MAX_SIDE = 2048
+
+
+def _homogeneous(matrix: np.ndarray) -> np.ndarray:
+    return np.vstack((matrix, [0.0, 0.0, 1.0]))
+
+
+def _rotation(fixed: np.ndarray, moving: np.ndarray) -> float:
+    """
+    Estimates the angle, in degrees, by which the moving image must be rotated
+    with cv2.getRotationMatrix2D to match the fixed image, up to 180 degrees.
+    """
+    window = cv2.createHanningWindow(fixed.shape[::-1], cv2.CV_32F)
+    # spectra are sampled on a square grid so that they rotate with the images
+    side = max(fixed.shape)
+    center = (side / 2, side / 2)
+    # emphasize the high frequencies, which carry the orientation of edges
+    v, u = np.mgrid[0:side, 0:side]
+    highpass = np.hypot(u - center[0], v - center[1]) / side
+
+    polar = []
+    for image in (fixed, moving):
+        spectrum = np.abs(np.fft.fftshift(np.fft.fft2(image * window, s=(side, side))))
+        spectrum = (np.log1p(spectrum) * highpass).astype(np.float32)
+        polar.append(
+            cv2.warpPolar(
+                spectrum,
+                (side, side),
+                center,
+                side / 2,
+                cv2.INTER_LINEAR + cv2.WARP_POLAR_LOG,
+            )
+        )
+    (_, rows), _ = cv2.phaseCorrelate(polar[0], polar[1])
+    return float(rows * 360.0 / side)
+
+
+def phase_correlate(
+    fixed: np.ndarray, moving: np.ndarray, rotation: bool = True
+) -> Tuple[np.ndarray, float]:
+    """
+    Estimates the rigid in-plane transformation aligning the moving image with
+    the fixed image. Both images must have the same shape, with zeros outside
+    their data and their means removed.
+
+    Parameters
+    ----------
+    fixed: np.array
+        Fixed image
+    moving: np.array
+        Moving image
+    rotation: bool
+        Whether to estimate a rotation in addition to the shift
+
+    Returns
+    -------
+    matrix: np.array
+        2x3 matrix mapping pixel coordinates of the moving image to the pixel
+        coordinates of the matching location in the fixed image
+    response: float
+        Phase correlation peak response, near 1 for identical images and near
+        0 for unrelated ones
+    """
+    if fixed.shape != moving.shape:
+        raise ValueError("Phase correlated images must have the same shape.")
+
+    # pixel coordinates of the downsampled images from those of the originals
+    factor = max(max(fixed.shape) / MAX_SIDE, 1.0)
+    shrink = np.array(
+        [
+            [1 / factor, 0.0, 0.5 / factor - 0.5],
+            [0.0, 1 / factor, 0.5 / factor - 0.5],
+            [0.0, 0.0, 1.0],
+        ]
+    )
+    if factor > 1:
+        size = (
+            max(int(round(fixed.shape[1] / factor)), 1),
+            max(int(round(fixed.shape[0] / factor)), 1),
+        )
+        fixed = cv2.resize(fixed, size, interpolation=cv2.INTER_AREA)
+        moving = cv2.resize(moving, size, interpolation=cv2.INTER_AREA)
+    fixed = fixed.astype(np.float32)
+    moving = moving.astype(np.float32)
+    height, width = fixed.shape
+    window = cv2.createHanningWindow((width, height), cv2.CV_32F)
+
+    angles = [0.0]
+    if rotation:
+        # compare the spectra over the extent of the moving data only
+        rows = np.flatnonzero(np.any(moving != 0, axis=1))
+        cols = np.flatnonzero(np.any(moving != 0, axis=0))
+        if rows.size > 1 and cols.size > 1:
+            extent = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+            angle = _rotation(fixed[extent], moving[extent])
+            angles += [angle, angle + 180.0]
+
+    best_matrix = np.eye(3)
+    best_response = -1.0
+    for angle in angles:
+        rotate = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        rotated = cv2.warpAffine(moving, rotate, (width, height))
+        (dx, dy), response = cv2.phaseCorrelate(fixed, rotated, window)
+        if response > best_response:
+            # the rotated image matches the fixed image shifted by -(dx, dy)
+            shift = np.array([[1.0, 0.0, -dx], [0.0, 1.0, -dy], [0.0, 0.0, 1.0]])
+            best_matrix = shift @ _homogeneous(rotate)
+            best_response = response
+
+    matrix = np.linalg.inv(shrink) @ best_matrix @ shrink
+    return matrix[:2], float(best_response)
@@ -0,0 +1,179 @@
+"""
+pyramid.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+This module contains the image pyramid used for coarse-to-fine DSM
+registration. Features are first extracted and matched on heavily decimated
+copies of the DSMs, where a full foundation is small enough to search
+globally. Each finer level then only extracts foundation features in a window
+around the AOI footprint predicted by the previous level's transformation, so
+the full resolution foundation is never processed in its entirety.
+
+This module contains the following class and methods:
+
+* DsmLevel - class for a decimated and cropped view of a prepared DSM
+* pyramid_levels - number of decimated levels that fit an image
+* search_window - foundation window around the predicted AOI footprint
+"""
+import math
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import cv2
+import numpy as np
+from codem.preprocessing.preprocess import GeoData
+from rasterio import Affine
+
+
+# shortest image side, in pixels, of the coarsest pyramid level
+MIN_SIDE = 128
+
+
+def _corner_transform(geo_obj: Union[GeoData, "DsmLevel"]) -> Affine:
+    """
+    Returns the transform of a DSM from pixel coordinates relative to the
+    upper left corner of the upper left pixel.
+    """
+    if geo_obj.transform is None:
+        raise RuntimeError(
+            "DSM transform has not been set, did you run the prep() method?"
+        )
+    if geo_obj.area_or_point == "Area":
+        return geo_obj.transform
+    return geo_obj.transform * Affine.translation(-0.5, -0.5)
+
+
+class DsmLevel:
+    """
+    A view of a prepared DSM decimated by a factor and optionally cropped to
+    a window, with the attributes of GeoData used by DsmRegistration. The
+    normalized DSM and the elevations are area averaged, and a decimated cell
+    is valid when most of the cells it covers are valid. The transform always
+    refers to pixel corners.
+
+    Parameters
+    ----------
+    geo_obj: Union[GeoData, DsmLevel]
+        The prepared DSM
+    factor: int
+        Decimation factor
+    window: Optional[Tuple[slice, slice]]
+        Row and column slices of the full resolution DSM to keep
+    """
+
+    def __init__(
+        self,
+        geo_obj: Union[GeoData, "DsmLevel"],
+        factor: int = 1,
+        window: Optional[Tuple[slice, slice]] = None,
+    ) -> None:
+        if factor < 1:
+            raise ValueError("Decimation factor must be a positive integer.")
+        if window is None:
+            window = (
+                slice(0, geo_obj.normed.shape[0]),
+                slice(0, geo_obj.normed.shape[1]),
+            )
+        rows, cols = window
+        normed = geo_obj.normed[rows, cols]
+        infilled = geo_obj.infilled[rows, cols]
+        valid: np.ndarray = np.asarray(geo_obj.nodata_mask[rows, cols], np.float32)
+        transform = _corner_transform(geo_obj) * Affine.translation(
+            cols.start, rows.start
+        )
+
+        if factor > 1:
+            height, width = normed.shape
+            size = (
+                max(int(round(width / factor)), 1),
+                max(int(round(height / factor)), 1),
+            )
+            normed = cv2.resize(normed, size, interpolation=cv2.INTER_AREA)
+            infilled = cv2.resize(infilled, size, interpolation=cv2.INTER_AREA)
+            valid = cv2.resize(valid, size, interpolation=cv2.INTER_AREA)
+            transform = transform * Affine.scale(width / size[0], height / size[1])
+
+        self.normed: np.ndarray = normed
+        self.infilled: np.ndarray = infilled
+        self.nodata_mask: np.ndarray = valid >= 0.5
+        self.transform: Optional[Affine] = transform
+        self.area_or_point = "Area"
+        self.processed = True
+        self.factor = factor
+        self.offset = (cols.start, rows.start)
+
+
+def pyramid_levels(shape: Tuple[int, ...], levels: int) -> int:
+    """
+    Limits the number of decimated pyramid levels so that the shortest side
+    of the coarsest level is at least MIN_SIDE pixels.
+
+    Parameters
+    ----------
+    shape: tuple
+        Shape of the full resolution image
+    levels: int
+        Requested number of decimated levels
+
+    Returns
+    -------
+    levels: int
+        Number of decimated levels; level k is decimated by 2**k
+    """
+    side = min(shape[:2])
+    if side < 2 * MIN_SIDE:
+        return 0
+    return min(levels, int(math.log2(side / MIN_SIDE)))
+
+
+def search_window(
+    aoi_obj: Union[GeoData, DsmLevel],
+    fnd_obj: Union[GeoData, DsmLevel],
+    transformation: np.ndarray,
+    margin: float,
+) -> Optional[Tuple[slice, slice]]:
+    """
+    Finds the window of the foundation containing the AOI footprint, as
+    located by a transformation, padded by a margin.
+
+    Parameters
+    ----------
+    aoi_obj: Union[GeoData, DsmLevel]
+        The prepared AOI DSM
+    fnd_obj: Union[GeoData, DsmLevel]
+        The prepared foundation DSM
+    transformation: np.array
+        4x4 transformation from AOI to foundation object space
+    margin: float
+        Padding around the footprint in object space units
+
+    Returns
+    -------
+    window: Optional[Tuple[slice, slice]]
+        Row and column slices of the foundation, or None if the footprint
+        does not overlap the foundation
+    """
+    height, width = aoi_obj.normed.shape
+    u = np.array([0.0, width, width, 0.0])
+    v = np.array([0.0, 0.0, height, height])
+    x, y = _corner_transform(aoi_obj) * (u, v)
+    z = np.full(4, np.mean(aoi_obj.infilled))
+    corners = np.vstack((x, y, z)).T @ transformation[0:3, 0:3].T
+    corners += transformation[0:3, 3]
+
+    fnd_transform = _corner_transform(fnd_obj)
+    col, row = ~fnd_transform * (corners[:, 0], corners[:, 1])
+    pad = margin / math.hypot(fnd_transform.a, fnd_transform.d)
+    rows = slice(
+        max(int(math.floor(np.min(row) - pad)), 0),
+        min(int(math.ceil(np.max(row) + pad)), fnd_obj.normed.shape[0]),
+    )
+    cols = slice(
+        max(int(math.floor(np.min(col) - pad)), 0),
+        min(int(math.ceil(np.max(col) + pad)), fnd_obj.normed.shape[1]),
+    )
+    if rows.start >= rows.stop or cols.start >= cols.stop:
+        return None
+    return rows, cols
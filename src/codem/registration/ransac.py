@@ -0,0 +1,435 @@
+"""
+ransac.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+This module contains a vectorized RANSAC engine for solving the 3D similarity
+transformation between matched feature locations. Rather than estimating and
+scoring one hypothesis per Python-level trial, all minimal samples are drawn up
+front, the hypotheses are solved in batches with stacked SVDs, and every
+hypothesis in a batch is scored against all matches with blocked array
+operations. Model selection follows scikit-image's ransac: the hypothesis with
+the most inliers wins, ties are broken by the smaller sum of squared residuals,
+and the winning model is re-estimated from its inliers.
+
+Three refinements reduce the number of hypotheses needed on clean match sets.
+Each new best hypothesis is locally optimized by re-estimating it from its
+inliers until its inlier count stops growing, which brings the inlier ratio of
+the best model close to the true ratio after few trials. Trials stop once
+enough hypotheses have been evaluated to draw an all-inlier sample with the
+requested confidence at that ratio. When a quality is supplied for each match,
+samples are drawn progressively as in PROSAC: early hypotheses only use the
+best ranked matches, and the sampling pool grows to all matches by the last
+trial.
+
+For DSMs that are level relative to each other, the transformation can be
+restricted to a rotation about the vertical axis, a 3D translation and an
+optional scale. Its hypotheses are solved in closed form from two point
+samples, and the chance of drawing an all-inlier sample rises from the cube to
+the square of the inlier ratio, so far fewer trials are needed.
+
+References
+----------
+.. [1] "Matching with PROSAC - progressive sample consensus", Ondrej Chum and
+        Jiri Matas, CVPR 2005, :DOI:`10.1109/CVPR.2005.221`
+.. [2] "Locally optimized RANSAC", Ondrej Chum, Jiri Matas and Josef Kittler,
+        DAGM 2003, :DOI:`10.1007/978-3-540-45243-0_31`
+
+This module contains the following methods:
+
+* umeyama - batched least squares similarity transformation between point sets
+* level_similarity - batched similarity transformation without tilt
+* ransac - robust similarity transformation estimation from putative matches
+"""
+import math
+from typing import Callable
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+
+
+# hypotheses solved and scored per batch, which is also the granularity of
+# the adaptive stopping test
+_BATCH_SIZE = 256
+
+# maximum number of re-estimations in the local optimization of a model
+_LO_ITERATIONS = 10
+
+# upper bound on hypothesis-by-match residual elements held in memory at once
+_SCORE_BLOCK = 1 << 21
+
+
+def umeyama(src: np.ndarray, dst: np.ndarray, estimate_scale: bool) -> np.ndarray:
+    """
+    Estimates the N-D similarity transformation with or without scaling for
+    a stack of point set pairs. A vectorized form of the _umeyama method of
+    Scaled3dSimilarityTransform and Unscaled3dSimilarityTransform.
+
+    Parameters
+    ----------
+    src: np.array
+        (..., M, N) source coordinates
+    dst: np.array
+        (..., M, N) destination coordinates
+    estimate_scale: bool
+        Whether to estimate the scaling factor
+
+    Returns
+    -------
+    T: np.array
+        (..., N + 1, N + 1) homogeneous similarity transformation matrices.
+        Matrices contain NaN values where the problem is not well-conditioned.
+
+    References
+    ----------
+    .. [1] "Least-squares estimation of transformation parameters between two
+            point patterns", Shinji Umeyama, PAMI 1991, :DOI:`10.1109/34.88573`
+    """
+    num, dim = src.shape[-2:]
+
+    src_mean = src.mean(axis=-2)
+    dst_mean = dst.mean(axis=-2)
+    src_demean = src - src_mean[..., np.newaxis, :]
+    dst_demean = dst - dst_mean[..., np.newaxis, :]
+
+    # Eq. (38).
+    A = np.swapaxes(dst_demean, -1, -2) @ src_demean / num
+
+    # Eq. (39).
+    d = np.ones(A.shape[:-1], dtype=np.double)
+    d[np.linalg.det(A) < 0, dim - 1] = -1
+
+    U, S, V = np.linalg.svd(A)
+
+    # Eq. (40) and (43). Rank deficient problems, which include every three
+    # point sample, only flip the last axis when required to form a rotation.
+    tol = S.max(axis=-1) * dim * np.finfo(S.dtype).eps
+    rank = np.sum(S > tol[..., np.newaxis], axis=-1)
+    d_rotation = d.copy()
+    deficient = rank == dim - 1
+    flip = np.linalg.det(U) * np.linalg.det(V) <= 0
+    d_rotation[deficient, dim - 1] = np.where(flip[deficient], -1.0, 1.0)
+    R = (U * d_rotation[..., np.newaxis, :]) @ V
+
+    if estimate_scale:
+        scale = np.sum(S * d, axis=-1) / src_demean.var(axis=-2).sum(axis=-1)
+    else:
+        scale = np.ones(A.shape[:-2], dtype=np.double)
+
+    T = np.zeros(A.shape[:-2] + (dim + 1, dim + 1), dtype=np.double)
+    T[..., dim, dim] = 1.0
+    T[..., :dim, dim] = dst_mean - scale[..., np.newaxis] * np.einsum(
+        "...ij,...j->...i", R, src_mean
+    )
+    T[..., :dim, :dim] = scale[..., np.newaxis, np.newaxis] * R
+    T[rank == 0] = np.nan
+    return T
+
+
+def level_similarity(
+    src: np.ndarray, dst: np.ndarray, estimate_scale: bool
+) -> np.ndarray:
+    """
+    Estimates the 3D similarity transformation without tilt, a rotation about
+    the vertical axis, a 3D translation and optionally a scale, for a stack of
+    point set pairs. The rotation and scale are the least squares solution for
+    the horizontal coordinates and the translation aligns the centroids.
+
+    Parameters
+    ----------
+    src: np.array
+        (..., M, 3) source coordinates
+    dst: np.array
+        (..., M, 3) destination coordinates
+    estimate_scale: bool
+        Whether to estimate the scaling factor
+
+    Returns
+    -------
+    T: np.array
+        (..., 4, 4) homogeneous similarity transformation matrices. Matrices
+        contain NaN values where the horizontal source coordinates coincide.
+    """
+    src_mean = src.mean(axis=-2)
+    dst_mean = dst.mean(axis=-2)
+    src_demean = src - src_mean[..., np.newaxis, :]
+    dst_demean = dst - dst_mean[..., np.newaxis, :]
+
+    # with horizontal coordinates as complex numbers, the rotation and scale
+    # are a single complex factor
+    src_xy = src_demean[..., 0] + 1j * src_demean[..., 1]
+    dst_xy = dst_demean[..., 0] + 1j * dst_demean[..., 1]
+    factor = np.sum(np.conj(src_xy) * dst_xy, axis=-1)
+    magnitude = np.abs(factor)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cos = factor.real / magnitude
+        sin = factor.imag / magnitude
+        if estimate_scale:
+            scale = magnitude / np.sum(np.abs(src_xy) ** 2, axis=-1)
+        else:
+            scale = np.ones(factor.shape, dtype=np.double)
+
+    T = np.zeros(factor.shape + (4, 4), dtype=np.double)
+    T[..., 0, 0] = scale * cos
+    T[..., 0, 1] = -scale * sin
+    T[..., 1, 0] = scale * sin
+    T[..., 1, 1] = scale * cos
+    T[..., 2, 2] = scale
+    T[..., 3, 3] = 1.0
+    T[..., :3, 3] = dst_mean - np.einsum("...ij,...j->...i", T[..., :3, :3], src_mean)
+    T[magnitude == 0] = np.nan
+    return T
+
+
+def _draw_samples(
+    pools: np.ndarray, min_samples: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Draws minimal samples of distinct indices for all trials at once, with the
+    indices of each trial's sample below its pool size. Samples containing a
+    repeated index are redrawn until none remain.
+    """
+    pools = pools[:, np.newaxis]
+    samples = rng.integers(0, pools, size=(pools.shape[0], min_samples))
+    while True:
+        ordered = np.sort(samples, axis=1)
+        repeated = np.any(ordered[:, 1:] == ordered[:, :-1], axis=1)
+        if not np.any(repeated):
+            return samples
+        samples[repeated] = rng.integers(
+            0, pools[repeated], size=(np.count_nonzero(repeated), min_samples)
+        )
+
+
+def _progressive_pools(n: int, min_samples: int, trials: int) -> np.ndarray:
+    """
+    Computes PROSAC's growth function, the number of best ranked matches each
+    trial samples from. Among trials uniform samples of all n matches, T_k are
+    expected to lie within the best k matches; the pool grows from min_samples
+    to k once the trial count reaches the sum of the rounded-up increments of
+    T_k, and every sample includes the newest match of its pool.
+    """
+    sizes = np.arange(min_samples, n + 1)
+    log_first = math.log(trials) + sum(
+        math.log((min_samples - i) / (n - i)) for i in range(min_samples)
+    )
+    log_t = log_first + np.concatenate(
+        ([0.0], np.cumsum(np.log(sizes[1:] / (sizes[1:] - min_samples))))
+    )
+    growth = np.concatenate(([1.0], 1.0 + np.cumsum(np.ceil(np.diff(np.exp(log_t))))))
+    stage = np.searchsorted(growth, np.arange(1, trials + 1), side="left")
+    pools: np.ndarray = sizes[np.minimum(stage, sizes.shape[0] - 1)]
+    return pools
+
+
+def _required_trials(inlier_ratio: float, min_samples: int, confidence: float) -> float:
+    """
+    Number of trials needed to draw at least one all-inlier sample with the
+    given confidence.
+    """
+    if confidence >= 1:
+        return math.inf
+    probability = inlier_ratio**min_samples
+    if probability >= 1:
+        return 0
+    if probability <= 0:
+        return math.inf
+    return math.ceil(math.log(1 - confidence) / math.log1p(-probability))
+
+
+def _score(
+    models: np.ndarray, src: np.ndarray, dst: np.ndarray, threshold: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Counts the inliers and sums the squared residuals of every match for each
+    hypothesis. The squared residual |A s + t - d|^2 is expanded into products
+    of per-match features and per-hypothesis coefficients, so scoring a block
+    of hypotheses against all matches is a single matrix product. Points are
+    centered first to limit cancellation error in the expansion, and blocks
+    are sized to bound memory use.
+    """
+    n = src.shape[0]
+    src_mean = src.mean(axis=0)
+    dst_mean = dst.mean(axis=0)
+    s = src - src_mean
+    d = dst - dst_mean
+    features = np.hstack(
+        (
+            (s[:, :, np.newaxis] * s[:, np.newaxis, :]).reshape(n, 9),
+            (d[:, :, np.newaxis] * s[:, np.newaxis, :]).reshape(n, 9),
+            s,
+            d,
+            np.ones((n, 1)),
+        )
+    )
+    d_squared = np.sum(d**2, axis=1)[:, np.newaxis]
+
+    counts = np.empty(models.shape[0], dtype=np.int64)
+    sums = np.empty(models.shape[0], dtype=np.double)
+    block = max(1, _SCORE_BLOCK // n)
+    with np.errstate(invalid="ignore"):
+        for start in range(0, models.shape[0], block):
+            A = models[start : start + block, :3, :3]
+            t = models[start : start + block, :3, 3] + A @ src_mean - dst_mean
+            b = A.shape[0]
+            coefficients = np.hstack(
+                (
+                    (np.swapaxes(A, 1, 2) @ A).reshape(b, 9),
+                    -2 * A.reshape(b, 9),
+                    2 * np.einsum("bji,bj->bi", A, t),
+                    -2 * t,
+                    np.sum(t**2, axis=1, keepdims=True),
+                )
+            )
+            squared = features @ coefficients.T
+            squared += d_squared
+            counts[start : start + block] = np.count_nonzero(
+                squared < threshold**2, axis=0
+            )
+            sums[start : start + block] = squared.sum(axis=0)
+    sums[np.isnan(sums)] = np.inf
+    return counts, sums
+
+
+def _local_optimization(
+    model: np.ndarray,
+    count: int,
+    total: float,
+    src: np.ndarray,
+    dst: np.ndarray,
+    estimate_scale: bool,
+    threshold: float,
+    solver: Callable[[np.ndarray, np.ndarray, bool], np.ndarray],
+    min_samples: int,
+) -> Tuple[np.ndarray, int, float]:
+    """
+    Re-estimates a model from its inliers for as long as the inlier count, or
+    the residual sum at an equal count, improves.
+    """
+    for _ in range(_LO_ITERATIONS):
+        residuals = np.linalg.norm(src @ model[:3, :3].T + model[:3, 3] - dst, axis=1)
+        inliers = residuals < threshold
+        if np.count_nonzero(inliers) < min_samples:
+            break
+        refit = solver(src[inliers], dst[inliers], estimate_scale)
+        counts, sums = _score(refit[np.newaxis], src, dst, threshold)
+        if counts[0] > count or (counts[0] == count and sums[0] < total):
+            model, count, total = refit, int(counts[0]), float(sums[0])
+        else:
+            break
+    return model, count, total
+
+
+def ransac(
+    src: np.ndarray,
+    dst: np.ndarray,
+    estimate_scale: bool,
+    residual_threshold: float,
+    max_trials: int,
+    rng: Union[None, int, np.random.Generator] = None,
+    confidence: float = 1.0,
+    quality: Optional[np.ndarray] = None,
+    solve_tilt: bool = True,
+) -> Tuple[Optional[np.ndarray], np.ndarray]:
+    """
+    Robustly estimates the 3D similarity transformation from src to dst
+    points with a vectorized, locally optimized RANSAC.
+
+    Parameters
+    ----------
+    src: np.array
+        (M, 3) array of points to be transformed to the dst point locations
+    dst: np.array
+        (M, 3) array of fixed points ordered to correspond to the src points
+    estimate_scale: bool
+        Whether to estimate a scale factor (7-parameter) or not (6-parameter)
+    residual_threshold: float
+        Maximum distance for a transformed src point to be counted as an inlier
+    max_trials: int
+        Number of hypotheses to evaluate
+    rng: Optional[int, np.random.Generator]
+        Seed or generator for drawing the minimal samples
+    confidence: float
+        Probability of having drawn an all-inlier sample at which trials stop
+        early; 1 evaluates all max_trials hypotheses
+    quality: Optional[np.array]
+        (M,) match quality, lower is better, by which matches are ranked for
+        progressive sampling; None samples uniformly
+    solve_tilt: bool
+        Whether to solve the full 3D rotation from three point samples, or
+        only the rotation about the vertical axis from two point samples
+
+    Returns
+    -------
+    transform: Optional[np.array]
+        4x4 transformation matrix re-estimated from the inliers of the best
+        hypothesis, or None if no hypothesis has any inliers
+    inliers: np.array
+        Boolean array flagging the inliers of the best hypothesis
+    """
+    solver = umeyama if solve_tilt else level_similarity
+    min_samples = 3 if solve_tilt else 2
+    n = src.shape[0]
+    if n < min_samples:
+        raise ValueError(
+            f"{n} matches were supplied to RANSAC ({min_samples} required)."
+        )
+    src = np.asarray(src, dtype=np.double)
+    dst = np.asarray(dst, dtype=np.double)
+    generator = np.random.default_rng(rng)
+
+    if quality is None:
+        samples = _draw_samples(np.full(max_trials, n), min_samples, generator)
+    else:
+        pools = _progressive_pools(n, min_samples, max_trials)
+        samples = np.column_stack(
+            (_draw_samples(pools - 1, min_samples - 1, generator), pools - 1)
+        )
+        # the final pool holds every match, where PROSAC reduces to RANSAC
+        uniform = pools == n
+        samples[uniform] = _draw_samples(
+            np.full(np.count_nonzero(uniform), n), min_samples, generator
+        )
+        samples = np.argsort(quality, kind="stable")[samples]
+
+    best_count = 0
+    best_sum = np.inf
+    best_model: Optional[np.ndarray] = None
+    for start in range(0, max_trials, _BATCH_SIZE):
+        batch = samples[start : start + _BATCH_SIZE]
+        models = solver(src[batch], dst[batch], estimate_scale)
+        counts, sums = _score(models, src, dst, residual_threshold)
+
+        # most inliers first, then the smallest residual sum, then earliest
+        order = np.lexsort((sums, -counts))
+        candidate = order[0]
+        if counts[candidate] > best_count or (
+            counts[candidate] == best_count and sums[candidate] < best_sum
+        ):
+            best_model, best_count, best_sum = _local_optimization(
+                models[candidate],
+                int(counts[candidate]),
+                float(sums[candidate]),
+                src,
+                dst,
+                estimate_scale,
+                residual_threshold,
+                solver,
+                min_samples,
+            )
+
+        trials = start + batch.shape[0]
+        if trials >= _required_trials(best_count / n, min_samples, confidence):
+            break
+
+    if best_model is None or best_count == 0:
+        return None, np.zeros(n, dtype=bool)
+
+    residuals = np.linalg.norm(
+        src @ best_model[:3, :3].T + best_model[:3, 3] - dst, axis=1
+    )
+    inliers = residuals < residual_threshold
+    transform: np.ndarray = solver(src[inliers], dst[inliers], estimate_scale)
+    return transform, inliers
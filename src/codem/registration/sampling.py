@@ -0,0 +1,178 @@
+"""
+sampling.py
+Project: CRREL-NEGGS University of Houston Collaboration
+Date: October 2026
+
+This module contains the moving point samplers of the ICP registration. Every
+valid AOI cell becomes a moving point, but a flat surface adds many nearly
+identical point-to-plane constraints: the rows of the ICP solve are dominated
+by a few normal directions, while the points that constrain the horizontal
+translation and the heading, on slopes and building walls, are a small
+minority. Sampling a fixed number of points keeps the solve small; sampling
+them informatively keeps the transformation well constrained.
+
+* Random sampling draws points uniformly.
+* Normal-space sampling bins the points by the direction of their normal
+  vectors and draws from the bins as evenly as possible, so rare orientations
+  are kept and common ones are thinned.
+* Curvature sampling draws points with probability increasing with the
+  surface variation around them, with a floor so that planar areas still
+  contribute.
+
+All samplers return the sorted indices of the sampled points.
+
+This module contains the following methods:
+
+* surface_variation - deviation from planarity of a raster of normal vectors
+* random_sampling - uniform sample of the points
+* normal_space_sampling - sample spread evenly over normal directions
+* curvature_sampling - sample weighted by surface variation
+"""
+import cv2
+import numpy as np
+
+
+# bins along each horizontal component of the normal vectors
+NORMAL_BINS = 16
+
+# share of the mean surface variation added to every curvature weight
+CURVATURE_FLOOR = 0.1
+
+
+def surface_variation(normals: np.ndarray) -> np.ndarray:
+    """
+    Measures the deviation from planarity of a surface as one minus the length
+    of the mean unit normal vector of the 3x3 neighbourhood of each cell. It
+    is 0 on planes and grows with the curvature of the surface.
+
+    Parameters
+    ----------
+    normals: np.array
+        Array of shape (rows, cols, 3) of unit normal vectors
+
+    Returns
+    -------
+    variation: np.array
+        Array of shape (rows, cols) of surface variation in [0, 1]
+    """
+    mean = cv2.blur(
+        np.asarray(normals, dtype=np.double), (3, 3), borderType=cv2.BORDER_REFLECT
+    )
+    variation: np.ndarray = np.clip(1.0 - np.linalg.norm(mean, axis=2), 0.0, 1.0)
+    return variation
+
+
+def random_sampling(n_points: int, count: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Samples points uniformly without replacement.
+
+    Parameters
+    ----------
+    n_points: int
+        Number of points
+    count: int
+        Number of points to sample
+    rng: np.random.Generator
+        Random number generator
+
+    Returns
+    -------
+    indices: np.array
+        Sorted indices of the sampled points
+    """
+    if count >= n_points:
+        return np.arange(n_points)
+    return np.sort(rng.choice(n_points, count, replace=False))
+
+
+def normal_space_sampling(
+    normals: np.ndarray, count: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Samples points spread as evenly as possible over the directions of their
+    normal vectors. The normals are binned on their horizontal components and
+    the same number of points is drawn at random from every bin, except the
+    bins holding fewer points, which are kept entirely.
+
+    Parameters
+    ----------
+    normals: np.array
+        Array of unit normal vectors, one per point
+    count: int
+        Number of points to sample
+    rng: np.random.Generator
+        Random number generator
+
+    Returns
+    -------
+    indices: np.array
+        Sorted indices of the sampled points
+    """
+    n_points = normals.shape[0]
+    if count >= n_points:
+        return np.arange(n_points)
+
+    cells = np.clip(
+        ((normals[:, 0:2] + 1.0) * (NORMAL_BINS / 2)).astype(np.intp),
+        0,
+        NORMAL_BINS - 1,
+    )
+    bins = cells[:, 0] * NORMAL_BINS + cells[:, 1]
+
+    # the rank of each point within its bin, in random order
+    order = rng.permutation(n_points)
+    order = order[np.argsort(bins[order], kind="stable")]
+    counts = np.bincount(bins, minlength=NORMAL_BINS**2)
+    starts = np.cumsum(counts) - counts
+    rank = np.empty(n_points, dtype=np.intp)
+    rank[order] = np.arange(n_points) - np.repeat(starts, counts)
+
+    # the largest per-bin quota that does not exceed the count
+    low, high = 0, int(counts.max())
+    while low < high:
+        middle = (low + high + 1) // 2
+        if np.sum(np.minimum(counts, middle)) <= count:
+            low = middle
+        else:
+            high = middle - 1
+    per_bin = low
+
+    selected = np.flatnonzero(rank < per_bin)
+    remaining = count - selected.shape[0]
+    if remaining > 0:
+        extra = np.flatnonzero(rank == per_bin)
+        selected = np.concatenate(
+            (selected, rng.choice(extra, remaining, replace=False))
+        )
+    return np.sort(selected)
+
+
+def curvature_sampling(
+    variation: np.ndarray, count: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Samples points without replacement with probability proportional to their
+    surface variation plus a floor of CURVATURE_FLOOR times its mean.
+
+    Parameters
+    ----------
+    variation: np.array
+        Surface variation of each point
+    count: int
+        Number of points to sample
+    rng: np.random.Generator
+        Random number generator
+
+    Returns
+    -------
+    indices: np.array
+        Sorted indices of the sampled points
+    """
+    n_points = variation.shape[0]
+    if count >= n_points:
+        return np.arange(n_points)
+
+    weights = variation + CURVATURE_FLOOR * np.mean(variation) + 1e-12
+    # weighted sampling without replacement keeps the largest u**(1/w) keys
+    keys = np.log(rng.random(n_points)) / weights
+    return np.sort(np.argpartition(-keys, count - 1)[:count])
@@ -0,0 +1,30 @@
+import cv2
+import numpy as np
+import pytest
+from codem.preprocessing.bandpass import histogram_percentiles
+from codem.preprocessing.bandpass import pyramid_blur
+
+
+@pytest.mark.parametrize("sigma", [1.5, 12.0, 30.0])
+def test_pyramid_blur_matches_gaussian(sigma: float) -> None:
+    rng = np.random.default_rng(0)
+    image = cv2.GaussianBlur(rng.normal(size=(600, 500)), (0, 0), 3).cumsum(axis=0)
+    expected = cv2.GaussianBlur(image, (0, 0), sigma)
+    blurred = pyramid_blur(image, sigma)
+
+    assert blurred.shape == image.shape
+    assert blurred.dtype == image.dtype
+    interior = (slice(100, -100), slice(100, -100))
+    error = np.abs(blurred - expected)[interior].max()
+    assert error < 1e-3 * np.ptp(image - expected)
+
+
+def test_histogram_percentiles_match_numpy() -> None:
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(500, 700))
+    low, high = histogram_percentiles(values, (1, 99))
+
+    width = np.ptp(values) / (1 << 16)
+    assert low == pytest.approx(np.percentile(values, 1), abs=width)
+    assert high == pytest.approx(np.percentile(values, 99), abs=width)
+    assert histogram_percentiles(np.ones((3, 3)), (1, 99)) == [1.0, 1.0]
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+import rasterio
+from codem.registration import correspondence
+from codem.registration.correspondence import covering_radius
+from codem.registration.correspondence import GridCorrespondence
+from codem.registration.correspondence import KdTreeCorrespondence
+
+
+def lattice(area_or_point: str):
+    rng = np.random.default_rng(0)
+    rows, cols = 60, 80
+    transform = rasterio.Affine(0.5, 0.0, 1000.0, 0.0, -0.5, 2000.0)
+    v, u = np.mgrid[0:rows, 0:cols].astype(np.double)
+    dsm = 3 * np.sin(u / 15) + 2 * np.cos(v / 10)
+    mask = rng.uniform(size=(rows, cols)) > 0.2
+    if area_or_point == "Area":
+        u += 0.5
+        v += 0.5
+    x, y = transform * (u[mask], v[mask])
+    fixed = np.column_stack((x, y, dsm[mask]))
+    return fixed, mask, transform
+
+
+@pytest.mark.parametrize("area_or_point", ["Area", "Point"])
+@pytest.mark.parametrize("distance_upper_bound", [0.3, 1.6, np.inf])
+def test_grid_matches_kdtree(area_or_point: str, distance_upper_bound: float) -> None:
+    fixed, mask, transform = lattice(area_or_point)
+    rng = np.random.default_rng(1)
+    moving = fixed[rng.choice(fixed.shape[0], 2000)]
+    # misaligned by several cells, as before the first ICP iterations
+    moving = moving + rng.normal(scale=[1.0, 1.0, 0.3], size=moving.shape)
+
+    radius = covering_radius(transform, distance_upper_bound, 6)
+    grid = GridCorrespondence(fixed, mask, transform, area_or_point, radius=radius)
+    kdtree = KdTreeCorrespondence(fixed)
+    grid_distances, grid_idx = grid.query(moving, distance_upper_bound)
+    tree_distances, tree_idx = kdtree.query(moving, distance_upper_bound)
+
+    if np.isfinite(distance_upper_bound):
+        assert np.array_equal(grid_idx, tree_idx)
+        assert np.allclose(grid_distances, tree_distances)
+    else:
+        # the limited neighbourhood still finds the closest point of most queries
+        assert np.mean(grid_idx == tree_idx) > 0.99
+
+
+def test_covering_radius() -> None:
+    transform = rasterio.Affine(0.5, 0.0, 1000.0, 0.0, -0.5, 2000.0)
+    assert covering_radius(transform, 0.2, 6) == 0
+    assert covering_radius(transform, 0.3, 6) == 1
+    assert covering_radius(transform, 1.6, 6) == 3
+    assert covering_radius(transform, 10.0, 6) == 6
+    assert covering_radius(transform, np.inf, 6) == 6
+    # the smallest spacing of a sheared lattice bounds the cell offsets
+    sheared = rasterio.Affine(1.0, 0.5, 0.0, 0.0, -1.0, 0.0)
+    assert covering_radius(sheared, 2.0, 6) == 3
+
+
+def test_grid_points_off_raster() -> None:
+    fixed, mask, transform = lattice("Area")
+    grid = GridCorrespondence(fixed, mask, transform, "Area")
+    distances, idx = grid.query(np.array([[0.0, 0.0, 0.0], [1e6, -1e6, 5.0]]))
+
+    assert np.all(idx == fixed.shape[0])
+    assert np.all(np.isinf(distances))
+
+
+def test_grid_rejects_unaligned_points() -> None:
+    fixed, mask, transform = lattice("Area")
+    with pytest.raises(ValueError):
+        GridCorrespondence(fixed[1:], mask, transform, "Area")
+
+
+@pytest.mark.parametrize("backend", ["grid", "kdtree"])
+def test_chunked_query_matches_single_query(monkeypatch, backend: str) -> None:
+    fixed, mask, transform = lattice("Point")
+    rng = np.random.default_rng(2)
+    moving = fixed[rng.choice(fixed.shape[0], 5000)]
+    moving = moving + rng.normal(scale=0.3, size=moving.shape)
+
+    if backend == "grid":
+        search = GridCorrespondence(fixed, mask, transform, "Point", workers=1)
+        chunked = GridCorrespondence(fixed, mask, transform, "Point", workers=3)
+    else:
+        search = KdTreeCorrespondence(fixed, workers=1)
+        chunked = KdTreeCorrespondence(fixed, workers=3)
+    expected_distances, expected_idx = search.query(moving, 0.4)
+    monkeypatch.setattr(correspondence, "QUERY_CHUNK", 1000)
+    distances, idx = chunked.query(moving, 0.4)
+
+    assert np.array_equal(idx, expected_idx)
+    assert np.array_equal(distances, expected_distances)
@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from codem.lib import georeference
+from codem.lib.georeference import raster_to_xyz
+from codem.lib.georeference import uv_to_xy
+from codem.lib.georeference import uv_to_xyz
+from codem.lib.georeference import xy_to_uv
+from codem.preprocessing.preprocess import GeoData
+from rasterio import Affine
+
+
+TRANSFORM = Affine(0.5, 0.1, 1000.0, -0.05, -0.5, 2000.0)
+UTM_TRANSFORM = Affine(0.5, 0.0, 500000.0, 0.0, -0.5, 4500000.0)
+
+
+@pytest.mark.parametrize("area_or_point", ["Area", "Point"])
+def test_uv_to_xyz_matches_per_point_transform(area_or_point: str) -> None:
+    rng = np.random.default_rng(0)
+    dsm = rng.normal(size=(40, 50))
+    uv = rng.uniform(0, 39, size=(100, 2))
+
+    offset = 0.5 if area_or_point == "Area" else 0.0
+    expected = []
+    for u, v in uv:
+        x, y = TRANSFORM * (u + offset, v + offset)
+        expected.append([x, y, dsm[int(np.rint(v)), int(np.rint(u))]])
+
+    xyz = uv_to_xyz(uv, TRANSFORM, area_or_point, dsm)
+    assert np.allclose(xyz, expected)
+    assert np.allclose(xy_to_uv(xyz[:, 0:2], TRANSFORM, area_or_point), uv)
+    assert np.allclose(uv_to_xy(uv, TRANSFORM, area_or_point), xyz[:, 0:2])
+
+
+@pytest.mark.parametrize("area_or_point", ["Area", "Point"])
+def test_raster_to_xyz_converts_valid_cells(monkeypatch, area_or_point: str) -> None:
+    monkeypatch.setattr(georeference, "BLOCK_SIZE", 64)
+    rng = np.random.default_rng(1)
+    dsm = rng.normal(size=(30, 20))
+    mask = rng.random(dsm.shape) < 0.7
+
+    rows, cols = np.nonzero(mask)
+    expected = uv_to_xyz(np.column_stack((cols, rows)), TRANSFORM, area_or_point, dsm)
+
+    assert np.allclose(raster_to_xyz(mask, TRANSFORM, area_or_point, dsm), expected)
+    xy = raster_to_xyz(mask, TRANSFORM, area_or_point, dtype=np.float32)
+    assert xy.dtype == np.float32
+    assert np.allclose(xy, expected[:, 0:2])
+
+
+def meshgrid_to_xyz(
+    dsm: np.ndarray, mask: np.ndarray, transform: Affine, area_or_point: str
+) -> np.ndarray:
+    # the full-raster conversion raster_to_xyz replaced in GeoData._dsm2pc
+    rows = np.arange(dsm.shape[0], dtype=np.float64)
+    cols = np.arange(dsm.shape[1], dtype=np.float64)
+    uu, vv = np.meshgrid(cols, rows)
+    u = np.reshape(uu, -1)
+    v = np.reshape(vv, -1)
+    if area_or_point == "Area":
+        u += 0.5
+        v += 0.5
+    xy = np.asarray(transform * (u, v))
+    z = np.reshape(dsm, -1)
+    xyz = np.vstack((xy, z)).T
+    return xyz[np.reshape(np.array(mask, dtype=bool), -1)]
+
+
+@pytest.mark.parametrize("transform", [TRANSFORM, UTM_TRANSFORM])
+@pytest.mark.parametrize("area_or_point", ["Area", "Point"])
+def test_raster_to_xyz_matches_meshgrid(
+    monkeypatch, transform: Affine, area_or_point: str
+) -> None:
+    monkeypatch.setattr(georeference, "BLOCK_SIZE", 64)
+    rng = np.random.default_rng(2)
+    dsm = rng.normal(size=(30, 20))
+    mask = rng.random(dsm.shape) < 0.7
+    dsm[~mask] = -9999.0
+    expected = meshgrid_to_xyz(dsm, mask, transform, area_or_point)
+
+    xyz = raster_to_xyz(mask, transform, area_or_point, dsm)
+    assert xyz.shape == expected.shape
+    assert np.allclose(xyz, expected, rtol=0.0, atol=1e-6)
+
+    for float32 in (False, True):
+        geo = SimpleNamespace(
+            transform=transform,
+            area_or_point=area_or_point,
+            dsm=dsm,
+            nodata_mask=mask,
+            config={"DSM_POINTS_FLOAT32": float32},
+        )
+        GeoData._dsm2pc(geo)
+        assert geo.point_cloud.dtype == (np.float32 if float32 else np.float64)
+        # single precision points are relative to the upper left corner
+        absolute = geo.point_cloud + geo.origin
+        assert np.allclose(absolute, expected, rtol=0.0, atol=1e-4 if float32 else 1e-6)
@@ -0,0 +1,45 @@
+import math
+
+import numpy as np
+import pytest
+from codem.preprocessing.gridding import MaxGrid
+
+
+def brute_force(points: np.ndarray, resolution: float, radius: float) -> np.ndarray:
+    min_x, min_y = points[:, :2].min(axis=0)
+    max_x, max_y = points[:, :2].max(axis=0)
+    width = int((max_x - min_x) / resolution) + 1
+    height = int((max_y - min_y) / resolution) + 1
+    dsm = np.full((height, width), -np.inf)
+    for x, y, z in points:
+        u = (x - min_x) / resolution
+        v = (y - min_y) / resolution
+        for r in range(height):
+            for c in range(width):
+                inside = c == math.floor(u) and r == math.floor(v)
+                near = math.hypot(c + 0.5 - u, r + 0.5 - v) * resolution <= radius
+                if inside or near:
+                    dsm[height - 1 - r, c] = max(dsm[height - 1 - r, c], z)
+    dsm[np.isneginf(dsm)] = -9999.0
+    return dsm
+
+
+@pytest.mark.parametrize("radius", [None, 0.4])
+def test_max_grid_matches_brute_force(radius: float) -> None:
+    rng = np.random.default_rng(0)
+    points = rng.uniform((100, 200, 0), (110, 206, 50), size=(300, 3))
+    resolution = 0.75
+
+    min_x, min_y = points[:, :2].min(axis=0)
+    max_x, max_y = points[:, :2].max(axis=0)
+    grid = MaxGrid((min_x, min_y, max_x, max_y), resolution, radius=radius)
+    for chunk in np.array_split(points, 7):
+        grid.insert(chunk[:, 0], chunk[:, 1], chunk[:, 2])
+    dsm, transform = grid.result()
+
+    expected = brute_force(
+        points, resolution, math.sqrt(2) * resolution if radius is None else radius
+    )
+    assert np.array_equal(dsm, expected)
+    assert transform.c == min_x
+    assert transform.f == pytest.approx(min_y + dsm.shape[0] * resolution)
@@ -0,0 +1,273 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import rasterio
+from codem.preprocessing.normals import grid_normals
+from codem.preprocessing.preprocess import GeoData
+from codem.registration import icp
+from codem.registration.anderson import AndersonAcceleration
+from codem.registration.correspondence import GridCorrespondence
+from codem.registration.icp import IcpRegistration
+from scipy import linalg
+from scipy.spatial.transform import Rotation
+
+
+def surface(rows: int, cols: int, x0: float, y0: float, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    transform = rasterio.Affine(1.0, 0.0, x0, 0.0, -1.0, y0)
+    v, u = np.mgrid[0:rows, 0:cols].astype(np.double)
+    x, y = transform * (u + 0.5, v + 0.5)
+    dsm = 6 * np.sin(x / 17) * np.cos(y / 23) + 4 * np.cos((x - y) / 31)
+    mask = rng.uniform(size=(rows, cols)) > 0.1
+    return SimpleNamespace(
+        point_cloud=np.column_stack((x[mask], y[mask], dsm[mask])),
+        normal_vectors=np.reshape(grid_normals(dsm, transform), (-1, 3))[
+            np.reshape(mask, -1)
+        ],
+        infilled=dsm,
+        nodata_mask=mask,
+        transform=transform,
+        area_or_point="Area",
+        resolution=1.0,
+        origin=np.zeros(3),
+    )
+
+
+def icp_config(tmp_path, **options) -> dict:
+    config = {
+        "ICP_ANGLE_THRESHOLD": 0.001,
+        "ICP_DISTANCE_THRESHOLD": 0.001,
+        "ICP_MAX_ITER": 100,
+        "ICP_RMSE_THRESHOLD": 0.0001,
+        "ICP_ROBUST": True,
+        "ICP_SOLVE_SCALE": False,
+        "ICP_CORRESPONDENCE": "grid",
+        "ICP_GRID_RADIUS": 0,
+        "ICP_LEVELS": 0,
+        "ICP_LEVEL_ITER": 10,
+        "ICP_SAMPLING": "none",
+        "ICP_SAMPLE_SIZE": 2000,
+        "ICP_ACCELERATE": False,
+        "ICP_FLOAT32": False,
+        "ICP_SAVE_RESIDUALS": True,
+        "WORKERS": 0,
+        "OUTPUT_DIR": str(tmp_path),
+    }
+    config.update(options)
+    return config
+
+
+@pytest.mark.parametrize(
+    "levels, sampling, accelerate",
+    [
+        (0, "none", False),
+        (2, "none", False),
+        (0, "random", False),
+        (0, "normal", False),
+        (1, "curvature", False),
+        (0, "none", True),
+        (1, "normal", True),
+    ],
+)
+@pytest.mark.parametrize("float32", [False, True])
+def test_icp_recovers_offset(
+    tmp_path, levels: int, sampling: str, accelerate: bool, float32: bool
+) -> None:
+    fnd = surface(200, 240, 500.0, 900.0)
+    aoi = surface(120, 150, 540.0, 860.0, seed=1)
+    # the AOI is offset from the foundation by an unsolved residual shift
+    aoi.point_cloud += [1.2, -0.8, 0.5]
+    dsm_reg = SimpleNamespace(
+        registration_parameters={"matrix": np.eye(4), "rmse_3d": 5.0}
+    )
+    config = icp_config(
+        tmp_path,
+        ICP_LEVELS=levels,
+        ICP_SAMPLING=sampling,
+        ICP_ACCELERATE=accelerate,
+        ICP_FLOAT32=float32,
+    )
+    icp = IcpRegistration(fnd, aoi, dsm_reg, config)
+    icp.register()
+
+    assert icp.transformation[0:3, 3] == pytest.approx([-1.2, 0.8, -0.5], abs=0.1)
+    assert icp.residual_origins.shape == aoi.point_cloud.shape
+    assert icp.residual_vectors.shape == aoi.point_cloud.shape
+    if sampling != "none":
+        assert icp.number_points <= 2000
+
+
+def test_icp_levels_are_bounded_by_level_iterations(monkeypatch, tmp_path) -> None:
+    fnd = surface(200, 240, 500.0, 900.0)
+    aoi = surface(120, 150, 540.0, 860.0, seed=1)
+    aoi.point_cloud += [1.2, -0.8, 0.5]
+    dsm_reg = SimpleNamespace(
+        registration_parameters={"matrix": np.eye(4), "rmse_3d": 5.0}
+    )
+    # thresholds that are never met, so every level runs to its cap
+    config = icp_config(
+        tmp_path,
+        ICP_ANGLE_THRESHOLD=0.0,
+        ICP_DISTANCE_THRESHOLD=0.0,
+        ICP_RMSE_THRESHOLD=0.0,
+        ICP_MAX_ITER=5,
+        ICP_LEVELS=2,
+        ICP_LEVEL_ITER=2,
+    )
+    sizes = []
+    match = IcpRegistration._match
+
+    def record(self, correspondence, fixed, normals, moving, buffers):
+        sizes.append(moving.shape[0])
+        return match(self, correspondence, fixed, normals, moving, buffers)
+
+    monkeypatch.setattr(IcpRegistration, "_match", record)
+    IcpRegistration(fnd, aoi, dsm_reg, config).register()
+
+    levels = [size for i, size in enumerate(sizes) if i == 0 or size != sizes[i - 1]]
+    assert len(levels) == 3
+    assert [sizes.count(size) for size in levels] == [2, 2, 5]
+    assert levels[-1] == aoi.point_cloud.shape[0]
+
+
+@pytest.mark.parametrize(
+    "grid_radius, outlier_thresh, factor, expected",
+    [(0, 5.0, 1, 5), (0, 5.0, 2, 3), (0, 0.1, 1, 1), (0, 50.0, 1, 6), (2, 5.0, 1, 2)],
+)
+def test_grid_radius_covers_outlier_threshold(
+    tmp_path, grid_radius: int, outlier_thresh: float, factor: int, expected: int
+) -> None:
+    fnd = surface(60, 80, 500.0, 900.0)
+    dsm_reg = SimpleNamespace(
+        registration_parameters={"matrix": np.eye(4), "rmse_3d": outlier_thresh}
+    )
+    config = icp_config(tmp_path, ICP_GRID_RADIUS=grid_radius)
+    icp = IcpRegistration(fnd, surface(30, 40, 510.0, 890.0), dsm_reg, config)
+    mask = fnd.nodata_mask[::factor, ::factor]
+    fixed = np.zeros((np.count_nonzero(mask), 3))
+
+    correspondence = icp._correspondence(fixed, np.zeros(3), factor)
+    assert isinstance(correspondence, GridCorrespondence)
+    assert correspondence.radius == expected
+
+
+def test_icp_adds_back_origin_of_float32_points(tmp_path) -> None:
+    registered = {}
+    for float32 in (False, True):
+        # projected coordinates at UTM northings
+        fnd = surface(200, 240, 500500.0, 4500900.0)
+        aoi = surface(120, 150, 500540.0, 4500860.0, seed=1)
+        expected = aoi.point_cloud.copy()
+        for obj in (fnd, aoi):
+            obj.dsm = obj.infilled
+            obj.config = {"DSM_POINTS_FLOAT32": float32}
+            GeoData._dsm2pc(obj)
+        assert aoi.point_cloud.dtype == (np.float32 if float32 else np.float64)
+        aoi.point_cloud += np.asarray([1.2, -0.8, 0.5], dtype=aoi.point_cloud.dtype)
+        dsm_reg = SimpleNamespace(
+            registration_parameters={"matrix": np.eye(4), "rmse_3d": 5.0}
+        )
+        icp = IcpRegistration(fnd, aoi, dsm_reg, icp_config(tmp_path))
+        icp.register()
+        registered[float32] = icp.residual_origins
+
+    # the registered AOI points are returned to their absolute positions
+    assert np.allclose(registered[False], expected, rtol=0.0, atol=0.01)
+    assert np.allclose(registered[True], expected, rtol=0.0, atol=0.01)
+    assert np.allclose(registered[True], registered[False], rtol=0.0, atol=0.001)
+
+
+def design(
+    fixed: np.ndarray, normals: np.ndarray, moving: np.ndarray, scale: bool
+) -> tuple:
+    # the point to plane system built as a whole, without chunking
+    moving_distance = np.sum(moving * normals, axis=1)
+    columns = [np.cross(moving, normals), normals]
+    b = np.sum(fixed * normals, axis=1)
+    if scale:
+        columns.append(moving_distance[:, np.newaxis])
+    else:
+        b = b - moving_distance
+    return np.hstack(columns), b
+
+
+@pytest.mark.parametrize("scale", [False, True])
+@pytest.mark.parametrize("robust", [False, True])
+def test_solve_matches_normal_equations(monkeypatch, scale: bool, robust: bool) -> None:
+    rng = np.random.default_rng(2)
+    n_points = 1000
+    moving = rng.uniform(-50, 50, (n_points, 3))
+    normals = rng.normal(size=(n_points, 3))
+    normals /= np.linalg.norm(normals, axis=1)[:, np.newaxis]
+    fixed = moving + rng.normal(scale=0.5, size=(n_points, 3))
+    weights = rng.uniform(0.1, 1.0, n_points)
+    # several chunks, the last one partial
+    monkeypatch.setattr(icp, "_CHUNK_SIZE", 64)
+
+    solver = SimpleNamespace(config={"ICP_ROBUST": robust})
+    x = IcpRegistration._solve(solver, fixed, normals, moving, weights, scale)
+
+    A, b = design(fixed, normals, moving, scale)
+    W = np.diag(weights if robust else np.ones(n_points))
+    expected = np.linalg.inv(A.T @ W @ A) @ A.T @ W @ b
+    assert x.shape == (7 if scale else 6,)
+    assert x == pytest.approx(expected, rel=1e-8, abs=1e-10)
+
+
+@pytest.mark.parametrize("scale", [False, True])
+def test_solve_falls_back_to_least_squares(monkeypatch, scale: bool) -> None:
+    rng = np.random.default_rng(3)
+    n_points = 300
+    # horizontal planes leave the x and y rotations and translations unsolved
+    moving = rng.uniform(-50, 50, (n_points, 3))
+    normals = np.tile([0.0, 0.0, 1.0], (n_points, 1))
+    fixed = moving + [0.0, 0.0, 0.7]
+    weights = np.ones(n_points)
+    monkeypatch.setattr(icp, "_CHUNK_SIZE", 64)
+    calls = []
+    solve_lstsq = linalg.lstsq
+
+    def lstsq(*args, **kwargs):
+        calls.append(args)
+        return solve_lstsq(*args, **kwargs)
+
+    monkeypatch.setattr(linalg, "lstsq", lstsq)
+
+    solver = SimpleNamespace(config={"ICP_ROBUST": True})
+    x = IcpRegistration._solve(solver, fixed, normals, moving, weights, scale)
+
+    A, b = design(fixed, normals, moving, scale)
+    expected = np.linalg.pinv(A.T @ A) @ A.T @ b
+    assert len(calls) == 1
+    assert x == pytest.approx(expected, abs=1e-8)
+
+
+def test_anderson_accelerates_linear_iteration() -> None:
+    # a slowly contracting iteration towards a fixed rotation and translation
+    target = np.eye(4)
+    target[0:3, 0:3] = Rotation.from_rotvec([0.01, -0.02, 0.3]).as_matrix()
+    target[0:3, 3] = [2.0, -1.0, 0.5]
+    target_vector = np.concatenate(
+        (Rotation.from_matrix(target[0:3, 0:3]).as_rotvec(), target[0:3, 3])
+    )
+
+    def iterate(transform: np.ndarray) -> np.ndarray:
+        vector = np.concatenate(
+            (Rotation.from_matrix(transform[0:3, 0:3]).as_rotvec(), transform[0:3, 3])
+        )
+        vector += 0.2 * (target_vector - vector)
+        mapped = np.eye(4)
+        mapped[0:3, 0:3] = Rotation.from_rotvec(vector[0:3]).as_matrix()
+        mapped[0:3, 3] = vector[3:6]
+        return mapped
+
+    plain = np.eye(4)
+    accelerated = np.eye(4)
+    anderson = AndersonAcceleration()
+    for _ in range(6):
+        plain = iterate(plain)
+        accelerated = anderson.step(accelerated, iterate(accelerated))
+
+    assert np.abs(plain - target).max() > 1e-2
+    assert accelerated == pytest.approx(target, abs=1e-6)
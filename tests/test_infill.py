@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from codem.preprocessing.infill import nearest_fill
+from codem.preprocessing.infill import pyramid_fill
+
+
+def surface():
+    rng = np.random.default_rng(0)
+    v, u = np.mgrid[0:97, 0:131].astype(np.double)
+    dsm = 0.2 * u + 0.1 * v + 50
+    valid = rng.uniform(size=dsm.shape) > 0.3
+    valid[20:60, 30:90] = False
+    return dsm, valid
+
+
+@pytest.mark.parametrize("fill", [pyramid_fill, nearest_fill])
+def test_fill_keeps_valid_and_fills_voids(fill) -> None:
+    dsm, valid = surface()
+    voided = np.where(valid, dsm, -9999.0)
+    filled, count = fill(voided, valid)
+
+    assert count == np.count_nonzero(~valid)
+    assert np.array_equal(filled[valid], dsm[valid])
+    assert np.all(filled[~valid] >= dsm.min())
+    assert np.all(filled[~valid] <= dsm.max())
+
+
+def test_nearest_fill_matches_brute_force() -> None:
+    dsm, valid = surface()
+    dsm = dsm[::4, ::4]
+    valid = valid[::4, ::4]
+    filled, _ = nearest_fill(dsm, valid)
+
+    rows, cols = np.nonzero(valid)
+    for r, c in zip(*np.nonzero(~valid)):
+        distances = np.hypot(rows - r, cols - c)
+        nearest = distances == distances.min()
+        assert filled[r, c] in dsm[rows[nearest], cols[nearest]]
+
+
+def test_pyramid_fill_is_smooth() -> None:
+    dsm, valid = surface()
+    filled, _ = pyramid_fill(np.where(valid, dsm, np.nan), valid)
+
+    assert np.abs(filled - dsm)[~valid].max() < 2.0
+    assert np.abs(np.diff(filled[20:60, 30:90], axis=1)).max() < 1.0
+
+
+@pytest.mark.parametrize("fill", [pyramid_fill, nearest_fill])
+def test_fill_rejects_empty(fill) -> None:
+    with pytest.raises(ValueError):
+        fill(np.zeros((4, 4)), np.zeros((4, 4), dtype=bool))
@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+from codem.registration.keypoints import bucket_keypoints
+from codem.registration.keypoints import TiledAkaze
+
+
+def image() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.normal(size=(900, 700)), (0, 0), 4)
+    normalized: np.ndarray = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX)
+    return normalized.astype(np.uint8)
+
+
+def test_single_tile_matches_akaze() -> None:
+    img = image()
+    kp, desc = TiledAkaze(0.001, 1000).detect_and_compute(img)
+    expected_kp, expected_desc = cv2.AKAZE_create(threshold=0.001).detectAndCompute(
+        img, np.ones(img.shape, dtype=np.uint8)
+    )
+
+    assert [k.pt for k in kp] == [k.pt for k in expected_kp]
+    assert np.array_equal(desc, expected_desc)
+
+
+def test_tiles_merge_without_duplicates() -> None:
+    img = image()
+    extractor = TiledAkaze(0.001, 300, workers=2)
+    assert len(extractor.tiles(img.shape)) == 9
+
+    expected_kp, _ = TiledAkaze(0.001, 1000).detect_and_compute(img)
+    kp, desc = extractor.detect_and_compute(img)
+    points = np.array([k.pt for k in kp])
+    expected = np.array([k.pt for k in expected_kp])
+
+    assert desc.shape == (len(kp), 61)
+    assert np.unique(points, axis=0).shape[0] == points.shape[0]
+    distances = np.linalg.norm(expected[:, None] - points[None], axis=2).min(axis=1)
+    assert np.mean(distances < 0.5) > 0.95
+
+
+def test_bucket_keypoints_spreads_budget() -> None:
+    rng = np.random.default_rng(0)
+    dense = rng.uniform((0, 0), (100, 100), size=(900, 2))
+    sparse = rng.uniform((0, 500), (1000, 1000), size=(100, 2))
+    points = np.vstack((dense, sparse))
+    kp = [
+        cv2.KeyPoint(float(x), float(y), 5.0, -1, float(r))
+        for (x, y), r in zip(points, rng.uniform(size=len(points)))
+    ]
+    desc = np.arange(len(kp), dtype=np.uint8)[:, None].repeat(61, axis=1)
+
+    kept, kept_desc = bucket_keypoints(kp, desc, (1000, 1000), 200, buckets=100)
+    indices = [kp.index(k) for k in kept]
+
+    assert len(kept) == 200
+    assert indices == sorted(indices)
+    assert np.array_equal(kept_desc, desc[indices])
+    assert set(range(900, 1000)) <= set(indices)
+    dense_kept = [i for i in indices if i < 900]
+    dense_responses = np.array([kp[i].response for i in range(900)])
+    assert np.sort(dense_responses[dense_kept]).min() >= np.sort(dense_responses)[-100]
@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+from codem.registration import matching
+from codem.registration.matching import constrained_match
+from codem.registration.matching import exhaustive_match
+from codem.registration.matching import hamming
+
+
+def keypoints(n: int, seed: int):
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, 2000, size=(n, 2))
+    desc = rng.integers(0, 256, size=(n, 61), dtype=np.uint8)
+    return xy, desc
+
+
+def test_hamming_counts_bits() -> None:
+    a = np.zeros((2, 61), dtype=np.uint8)
+    b = a.copy()
+    b[0, :3] = 0b10110000
+    b[1] = 255
+    assert hamming(a, b).tolist() == [9, 488]
+
+
+def test_constrained_match_matches_brute_force() -> None:
+    train_xy, train_desc = keypoints(3000, 0)
+    rng = np.random.default_rng(1)
+    source = rng.choice(3000, 500, replace=False)
+    query_xy = train_xy[source] + rng.normal(scale=10, size=(500, 2))
+    query_desc = train_desc[source] ^ (rng.uniform(size=(500, 61)) < 0.05).astype(
+        np.uint8
+    )
+
+    matches = constrained_match(query_xy, query_desc, train_xy, train_desc, 60, 0.8)
+    assert [m.queryIdx for m in matches] == sorted(m.queryIdx for m in matches)
+
+    expected = {}
+    for q in range(500):
+        near = np.flatnonzero(np.hypot(*(train_xy - query_xy[q]).T) <= 60)
+        if near.size < 2:
+            continue
+        distances = hamming(
+            np.repeat(query_desc[q : q + 1], near.size, 0), train_desc[near]
+        )
+        best, second = np.sort(distances)[:2]
+        if best < 0.8 * second:
+            expected[q] = (near[np.argmin(distances)], best)
+    assert {m.queryIdx: (m.trainIdx, m.distance) for m in matches} == expected
+    assert all(source[q] == t for q, (t, _) in expected.items())
+
+
+def test_exhaustive_match_matches_brute_force(monkeypatch) -> None:
+    monkeypatch.setattr(matching, "QUERY_BLOCK", 64)
+    monkeypatch.setattr(matching, "TRAIN_BLOCK", 300)
+    _, train_desc = keypoints(1000, 0)
+    rng = np.random.default_rng(1)
+    source = rng.choice(1000, 200, replace=False)
+    query_desc = train_desc[source] ^ (rng.uniform(size=(200, 61)) < 0.05).astype(
+        np.uint8
+    )
+    query_desc = np.vstack((query_desc, keypoints(100, 2)[1]))
+
+    matches = exhaustive_match(query_desc, train_desc, 0.8, workers=2)
+    knn = cv2.BFMatcher(cv2.NORM_HAMMING).knnMatch(query_desc, train_desc, k=2)
+    expected = [
+        (m.queryIdx, m.trainIdx, m.distance)
+        for m, n in knn
+        if m.distance < 0.8 * n.distance
+    ]
+    assert [(m.queryIdx, m.trainIdx, m.distance) for m in matches] == expected
+    assert all(source[m.queryIdx] == m.trainIdx for m in matches)
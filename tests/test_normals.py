@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+import rasterio
+from codem.preprocessing import normals as normals_module
+from codem.preprocessing.normals import grid_normals
+from codem.preprocessing.normals import masked_grid_normals
+from scipy.spatial import cKDTree
+
+
+def test_grid_normals_of_plane() -> None:
+    transform = rasterio.Affine.translation(500.0, 800.0) * rasterio.Affine(
+        0.5, 0.1, 0.0, -0.2, -0.4, 0.0
+    )
+    v, u = np.mgrid[0:40, 0:50].astype(np.double)
+    x, y = transform * (u, v)
+    surface = 0.3 * x - 0.2 * y + 5
+
+    normals = grid_normals(surface, transform)
+    expected = np.array([-0.3, 0.2, 1.0]) / np.linalg.norm([-0.3, 0.2, 1.0])
+    assert np.allclose(normals, expected)
+
+
+def test_grid_normals_match_knn_plane_fit() -> None:
+    transform = rasterio.Affine(1.0, 0.0, 0.0, 0.0, -1.0, 0.0)
+    v, u = np.mgrid[0:30, 0:30].astype(np.double)
+    surface = 2 * np.sin(u / 6) + np.cos(v / 4)
+    x, y = transform * (u, v)
+    points = np.column_stack((x.ravel(), y.ravel(), surface.ravel()))
+
+    _, idx = cKDTree(points[:, :2]).query(points[:, :2], k=9)
+    interior = ((u > 0) & (u < 29) & (v > 0) & (v < 29)).ravel()
+    normals = grid_normals(surface, transform).reshape(-1, 3)
+    for i in np.flatnonzero(interior):
+        neighbours = points[idx[i]] - points[idx[i]].mean(axis=0)
+        expected = np.linalg.svd(neighbours)[2][-1]
+        expected *= np.sign(expected[2])
+        assert np.allclose(normals[i], expected, atol=1e-2)
+
+
+@pytest.mark.parametrize("block_size", [1, 70, 120])
+def test_grid_normals_in_blocks_match_whole_raster(monkeypatch, block_size) -> None:
+    transform = rasterio.Affine(0.5, 0.1, 300.0, -0.05, -0.5, 900.0)
+    v, u = np.mgrid[0:23, 0:30].astype(np.double)
+    surface = 2 * np.sin(u / 6) + np.cos(v / 4) + 0.01 * u * v
+    mask = np.random.default_rng(0).random(surface.shape) < 0.6
+    whole = grid_normals(surface, transform)
+
+    # blocks of a single row up to several rows, with a partial last block
+    monkeypatch.setattr(normals_module, "BLOCK_SIZE", block_size)
+    assert np.allclose(grid_normals(surface, transform), whole, rtol=0.0, atol=1e-12)
+    masked = masked_grid_normals(surface, transform, mask)
+    assert masked.shape == (np.count_nonzero(mask), 3)
+    assert np.allclose(masked, whole[mask], rtol=0.0, atol=1e-12)
@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+import pytest
+from codem.registration import phase
+from codem.registration.phase import phase_correlate
+
+
+def images(angle: float, shift: np.ndarray):
+    rng = np.random.default_rng(0)
+    scene = cv2.GaussianBlur(rng.normal(size=(700, 700)), (0, 0), 3)
+    scene = scene.astype(np.float32)
+    height, width = 300, 400
+    # the moving image at q shows the fixed image at matrix @ q
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    matrix[:, 2] += shift
+    fixed = scene[150 : 150 + height, 150 : 150 + width]
+    moving = cv2.warpAffine(
+        scene,
+        matrix + [[0, 0, 150], [0, 0, 150]],
+        (width, height),
+        flags=cv2.WARP_INVERSE_MAP | cv2.INTER_LINEAR,
+    )
+    masked = np.zeros_like(moving)
+    masked[40:-40, 50:-50] = moving[40:-40, 50:-50] - moving[40:-40, 50:-50].mean()
+    return fixed - fixed.mean(), masked, matrix
+
+
+@pytest.mark.parametrize(
+    "angle, shift", [(0.0, (11.3, -6.7)), (4.0, (-8.0, 5.0)), (-25.0, (3.0, 20.0))]
+)
+@pytest.mark.parametrize("max_side", [2048, 256])
+def test_phase_correlate_recovers_rigid_motion(
+    monkeypatch, angle: float, shift: tuple, max_side: int
+) -> None:
+    monkeypatch.setattr(phase, "MAX_SIDE", max_side)
+    fixed, moving, expected = images(angle, np.array(shift))
+    matrix, response = phase_correlate(fixed, moving)
+
+    points = np.array([[100.0, 100.0, 1.0], [300.0, 200.0, 1.0]]).T
+    tolerance = 0.5 if max_side > 400 else 1.5
+    assert np.abs(matrix @ points - expected @ points).max() < tolerance
+    assert response > 0.5
+
+
+def test_phase_correlate_weak_for_unrelated_images() -> None:
+    fixed, _, _ = images(0.0, np.zeros(2))
+    rng = np.random.default_rng(1)
+    other = cv2.GaussianBlur(rng.normal(size=fixed.shape), (0, 0), 3)
+    _, response = phase_correlate(fixed, other.astype(np.float32))
+    assert response < 0.15
@@ -0,0 +1,132 @@
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+from codem.registration.dsm import DsmRegistration
+from codem.registration.pyramid import DsmLevel
+from codem.registration.pyramid import pyramid_levels
+from codem.registration.pyramid import search_window
+from rasterio import Affine
+
+
+def terrain(shape: tuple, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(size=shape)
+    surface = cv2.GaussianBlur(noise, (0, 0), 6) + cv2.GaussianBlur(noise, (0, 0), 2)
+    return surface * 100
+
+
+def dsm(surface: np.ndarray, transform: Affine, area_or_point: str = "Area"):
+    normed = cv2.normalize(surface, None, 0, 255, cv2.NORM_MINMAX)
+    return SimpleNamespace(
+        processed=True,
+        transform=transform,
+        area_or_point=area_or_point,
+        normed=normed.astype(np.uint8),
+        infilled=surface,
+        nodata_mask=np.ones(surface.shape, dtype=bool),
+    )
+
+
+@pytest.mark.parametrize("area_or_point", ["Area", "Point"])
+def test_dsm_level_locates_decimated_cells(area_or_point: str) -> None:
+    transform = Affine(2.0, 0.0, 500.0, 0.0, -2.0, 900.0)
+    geo = dsm(terrain((64, 80)), transform, area_or_point)
+    level = DsmLevel(geo, 4, (slice(8, 48), slice(16, 80)))
+    assert level.normed.shape == (10, 16)
+
+    # the center of a decimated cell is the mean of the centers it covers
+    offset = 0.5 if area_or_point == "Area" else 0.0
+    rows, cols = np.mgrid[8 + 4 * 3 : 8 + 4 * 4, 16 + 4 * 5 : 16 + 4 * 6]
+    x, y = transform * (cols.ravel() + offset, rows.ravel() + offset)
+    assert level.transform * (5.5, 3.5) == pytest.approx((np.mean(x), np.mean(y)))
+    assert level.infilled[3, 5] == pytest.approx(
+        geo.infilled[20:24, 36:40].mean(), rel=1e-6
+    )
+
+
+def test_pyramid_levels_keeps_coarsest_level_large() -> None:
+    assert pyramid_levels((2048, 3000), 8) == 4
+    assert pyramid_levels((2048, 3000), 2) == 2
+    assert pyramid_levels((200, 3000), 3) == 0
+
+
+def test_search_window_pads_footprint() -> None:
+    fnd = dsm(np.zeros((100, 100)), Affine(1.0, 0.0, 0.0, 0.0, -1.0, 100.0))
+    aoi = dsm(np.zeros((20, 30)), Affine(1.0, 0.0, 10.0, 0.0, -1.0, 90.0))
+    T = np.eye(4)
+    T[0:2, 3] = [5.0, -20.0]
+    assert search_window(aoi, fnd, T, 3.0) == (slice(27, 53), slice(12, 48))
+    T[0, 3] = 500.0
+    assert search_window(aoi, fnd, T, 3.0) is None
+
+
+def registration(tmp_path) -> DsmRegistration:
+    surface = terrain((1200, 1200))
+    fnd = dsm(surface, Affine(1.0, 0.0, 0.0, 0.0, -1.0, 1200.0))
+    # AOI georeferenced 17 m east and 9 m north of its true location
+    aoi = dsm(
+        surface[500:900, 300:800] - 5.0,
+        Affine(1.0, 0.0, 317.0, 0.0, -1.0, 709.0),
+    )
+    config = {
+        "DSM_AKAZE_THRESHOLD": 0.0001,
+        "DSM_AKAZE_TILE_SIZE": 4096,
+        "DSM_COARSE_ENGINE": "features",
+        "DSM_KEYPOINT_BUDGET": 65536,
+        "DSM_LOWES_RATIO": 0.9,
+        "DSM_MATCH_MODE": "global",
+        "DSM_MATCH_RADIUS": 100.0,
+        "DSM_MATCH_ENGINE": "exact",
+        "DSM_PYRAMID_LEVELS": 2,
+        "DSM_RANSAC_MAX_ITER": 10000,
+        "DSM_RANSAC_THRESHOLD": 1.0,
+        "DSM_RANSAC_CONFIDENCE": 0.999,
+        "DSM_RANSAC_ENGINE": "batched",
+        "DSM_SOLVE_SCALE": False,
+        "DSM_SOLVE_TILT": True,
+        "WORKERS": 0,
+        "DSM_MATCH_IMG_SIZE": 256,
+        "OUTPUT_DIR": str(tmp_path),
+    }
+    return DsmRegistration(fnd, aoi, config)
+
+
+def test_pyramid_register_recovers_shift(monkeypatch, tmp_path) -> None:
+    reg = registration(tmp_path)
+    thresholds = []
+    init = DsmRegistration.__init__
+
+    def record(self, fnd_obj, aoi_obj, config):
+        thresholds.append(config["DSM_RANSAC_THRESHOLD"])
+        init(self, fnd_obj, aoi_obj, config)
+
+    monkeypatch.setattr(DsmRegistration, "__init__", record)
+    reg._pyramid_register(2)
+
+    # the threshold is widened to two pixels at coarse levels only
+    assert thresholds == [8.0, 4.0, 1.0]
+
+    assert reg.transformation[0:3, 3] == pytest.approx([-17.0, -9.0, 5.0], abs=0.5)
+    assert np.sum(reg.inliers) >= 4
+    # foundation keypoints are in full foundation pixels
+    fnd_uv = np.array([reg.fnd_kp[m.trainIdx].pt for m in reg.putative_matches])
+    aoi_uv = np.array([reg.aoi_kp[m.queryIdx].pt for m in reg.putative_matches])
+    shift = fnd_uv[reg.inliers] - aoi_uv[reg.inliers]
+    assert np.median(shift, axis=0) == pytest.approx([300.0, 500.0], abs=1.0)
+
+    # the match image is drawn at the configured size
+    assert reg._render_match_img(256).shape == (256, 512, 3)
+
+
+def test_register_writes_match_img_in_background(tmp_path) -> None:
+    reg = registration(tmp_path)
+    reg.register()
+    reg.wait_for_match_img()
+
+    assert reg._match_img_thread is None
+    assert (tmp_path / "dsm_feature_matches.png").exists()
+    assert reg.registration_parameters["matrix"][0:3, 3] == pytest.approx(
+        [-17.0, -9.0, 5.0], abs=0.5
+    )
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+from codem.registration import ransac as ransac_module
+from codem.registration.dsm import Scaled3dSimilarityTransform
+from codem.registration.dsm import Unscaled3dSimilarityTransform
+from codem.registration.ransac import level_similarity
+from codem.registration.ransac import ransac
+from codem.registration.ransac import umeyama
+
+
+def similarity(angle: float, scale: float, translation: np.ndarray) -> np.ndarray:
+    T = np.eye(4)
+    T[:3, :3] = scale * np.array(
+        [
+            [np.cos(angle), -np.sin(angle), 0.0],
+            [np.sin(angle), np.cos(angle), 0.0],
+            [0.0, 0.0, 1.0],
+        ]
+    )
+    T[:3, 3] = translation
+    return T
+
+
+@pytest.mark.parametrize(
+    "model_class", [Scaled3dSimilarityTransform, Unscaled3dSimilarityTransform]
+)
+@pytest.mark.parametrize("n_points", [3, 10])
+def test_umeyama_matches_per_trial_solver(model_class: type, n_points: int) -> None:
+    rng = np.random.default_rng(0)
+    src = rng.uniform(-500, 500, size=(64, n_points, 3))
+    dst = src[..., ::-1] * 1.2 + rng.normal(size=src.shape)
+
+    model = model_class()
+    expected = np.stack(
+        [model._umeyama(s, d, model.solve_scale) for s, d in zip(src, dst)]
+    )
+    assert np.allclose(umeyama(src, dst, model.solve_scale), expected)
+
+
+@pytest.mark.parametrize("solve_scale", [True, False])
+def test_ransac_recovers_transform(solve_scale: bool) -> None:
+    rng = np.random.default_rng(1)
+    n = 500
+    src = rng.uniform(0, 2000, size=(n, 3))
+    expected = similarity(0.3, 1.05 if solve_scale else 1.0, np.array([100, -50, 10]))
+    dst = (
+        src @ expected[:3, :3].T + expected[:3, 3] + rng.normal(scale=0.1, size=(n, 3))
+    )
+
+    outliers = rng.random(n) < 0.6
+    dst[outliers] = rng.uniform(0, 2000, size=(np.count_nonzero(outliers), 3))
+
+    T, inliers = ransac(src, dst, solve_scale, 1.0, 2000, rng=2)
+
+    assert T is not None
+    assert np.allclose(T, expected, atol=0.05)
+    assert np.count_nonzero(inliers & outliers) <= 1
+    assert np.count_nonzero(inliers) >= np.count_nonzero(~outliers) - 2
+
+
+@pytest.mark.parametrize("ranked", [True, False])
+def test_ransac_stops_early_on_clean_matches(monkeypatch, ranked: bool) -> None:
+    rng = np.random.default_rng(3)
+    n = 400
+    src = rng.uniform(0, 2000, size=(n, 3))
+    expected = similarity(-0.2, 1.0, np.array([-30, 80, 5]))
+    dst = (
+        src @ expected[:3, :3].T + expected[:3, 3] + rng.normal(scale=0.1, size=(n, 3))
+    )
+    outliers = rng.random(n) < 0.3
+    dst[outliers] = rng.uniform(0, 2000, size=(np.count_nonzero(outliers), 3))
+    # outliers rank last, as matches with large descriptor distances would
+    quality = outliers + rng.random(n) if ranked else None
+
+    hypotheses = []
+
+    def counting_umeyama(src, dst, estimate_scale):
+        if src.ndim == 3:
+            hypotheses.append(src.shape[0])
+        return umeyama(src, dst, estimate_scale)
+
+    monkeypatch.setattr(ransac_module, "umeyama", counting_umeyama)
+    T, inliers = ransac(
+        src, dst, False, 1.0, 10000, rng=4, confidence=0.999, quality=quality
+    )
+
+    assert T is not None
+    assert np.allclose(T, expected, atol=0.05)
+    assert np.array_equal(inliers, ~outliers)
+    assert sum(hypotheses) <= 512
+
+
+@pytest.mark.parametrize("solve_scale", [True, False])
+def test_level_similarity_solves_heading(solve_scale: bool) -> None:
+    rng = np.random.default_rng(5)
+    src = rng.uniform(-500, 500, size=(16, 2, 3))
+    expected = similarity(0.7, 0.9 if solve_scale else 1.0, np.array([3, -4, 12]))
+    dst = src @ expected[:3, :3].T + expected[:3, 3]
+
+    T = level_similarity(src, dst, solve_scale)
+    assert np.allclose(T, expected)
+    assert np.all(np.isnan(level_similarity(src[:, [0, 0]], dst, solve_scale)))
+
+
+def test_ransac_without_tilt_recovers_transform() -> None:
+    rng = np.random.default_rng(6)
+    n = 500
+    src = rng.uniform(0, 2000, size=(n, 3))
+    expected = similarity(-1.2, 1.0, np.array([40, 10, -3]))
+    dst = (
+        src @ expected[:3, :3].T + expected[:3, 3] + rng.normal(scale=0.1, size=(n, 3))
+    )
+    outliers = rng.random(n) < 0.8
+    dst[outliers] = rng.uniform(0, 2000, size=(np.count_nonzero(outliers), 3))
+
+    T, inliers = ransac(src, dst, False, 1.0, 2000, rng=7, solve_tilt=False)
+
+    assert T is not None
+    assert np.allclose(T, expected, atol=0.05)
+    assert np.count_nonzero(inliers & outliers) <= 1
+    assert np.count_nonzero(inliers) >= np.count_nonzero(~outliers) - 2
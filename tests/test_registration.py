@@ -6,6 +6,7 @@ import pathlib
 
 import codem
 import numpy as np
+import pdal
 import pytest
 from osgeo import gdal
 from point_cloud import manipulate_pc
@@ -277,3 +278,123 @@ def test_area_or_point(
         registered_alternate_info["metadata"][""]["AREA_OR_POINT"]
         == alternate_info["metadata"][""]["AREA_OR_POINT"]
     )
+
+
+@pytest.mark.parametrize(
+    "foundation",
+    [
+        pytest.param(pc_foundation, id="PC Foundation"),
+        pytest.param(dem_foundation, id="DEM Foundation"),
+    ],
+)
+def test_foundation_cache(foundation: str, tmp_path: pathlib.Path) -> None:
+    cache_directory = tmp_path / "cache"
+    prepared = []
+    for run in range(2):
+        output_directory = tmp_path / f"run_{run}"
+        output_directory.mkdir()
+        config = dataclasses.asdict(
+            codem.CodemRunConfig(
+                foundation,
+                raster_aoi_file,
+                OUTPUT_DIR=output_directory.as_posix(),
+                CACHE_DIR=cache_directory.as_posix(),
+            )
+        )
+        fnd_obj, aoi_obj = codem.preprocess(config)
+        fnd_obj.prep()
+        aoi_obj.prep()
+        prepared.append(fnd_obj)
+
+    # the first run populates the cache, the second is served from it
+    assert not prepared[0]._restored
+    assert prepared[1]._restored
+    assert prepared[0].transform == prepared[1].transform
+    assert np.array_equal(prepared[0].normed, prepared[1].normed)
+    assert np.allclose(prepared[0].point_cloud, prepared[1].point_cloud)
+    assert np.allclose(prepared[0].normal_vectors, prepared[1].normal_vectors)
+
+
+@pytest.mark.parametrize("min_resolution", [float("nan"), 2.0])
+def test_pointcloud_ingest(min_resolution: float, tmp_path: pathlib.Path) -> None:
+    aoi_objs = {}
+    for engine in ("memory", "pdal"):
+        output_directory = tmp_path / engine
+        output_directory.mkdir()
+        config = dataclasses.asdict(
+            codem.CodemRunConfig(
+                pc_foundation,
+                pc_aoi_file,
+                OUTPUT_DIR=output_directory.as_posix(),
+                MIN_RESOLUTION=min_resolution,
+                GRIDDING_ENGINE=engine,
+            )
+        )
+        _, aoi_objs[engine] = codem.preprocess(config)
+
+    memory = aoi_objs["memory"]
+    reference = aoi_objs["pdal"]
+
+    # the AOI is kept for applying the registration whichever engine is used
+    assert memory.ingest is not None and memory.ingest.spooled
+    assert memory.transform.almost_equals(reference.transform)
+    assert memory.dsm.shape == reference.dsm.shape
+    assert np.mean(np.isclose(memory.dsm, reference.dsm)) > 0.99
+
+
+def test_pointcloud_spool_keeps_header(tmp_path: pathlib.Path) -> None:
+    outputs = {}
+    for spool in (True, False):
+        output_directory = tmp_path / f"spool_{spool}"
+        output_directory.mkdir()
+        config = dataclasses.asdict(
+            codem.CodemRunConfig(
+                pc_foundation,
+                pc_aoi_file,
+                OUTPUT_DIR=output_directory.as_posix(),
+                POINTCLOUD_SPOOL=spool,
+                ICP_SAVE_RESIDUALS=True,
+            )
+        )
+        fnd_obj, aoi_obj = codem.preprocess(config)
+        fnd_obj.prep()
+        aoi_obj.prep()
+        if spool:
+            # only the coordinates of the foundation are spooled, in the
+            # output directory
+            assert aoi_obj.ingest is not None and aoi_obj.ingest.spooled
+            assert os.path.dirname(aoi_obj.ingest.spool_dir) == str(output_directory)
+            for chunk in fnd_obj.ingest.chunks():
+                assert chunk.dtype.names == ("X", "Y", "Z")
+            spooled_files = sorted(os.listdir(aoi_obj.ingest.spool_dir))
+        dsm_reg = codem.coarse_registration(fnd_obj, aoi_obj, config)
+        icp_reg = codem.fine_registration(fnd_obj, aoi_obj, dsm_reg, config)
+        reg_file = codem.apply_registration(fnd_obj, aoi_obj, icp_reg, config)
+        if spool:
+            # the registration and residuals are written into the spooled points
+            assert sorted(os.listdir(aoi_obj.ingest.spool_dir)) == spooled_files
+
+        pipeline = pdal.Reader(reg_file).pipeline()
+        count = pipeline.execute()
+        outputs[spool] = (count, pipeline.metadata["metadata"]["readers.las"])
+
+    spooled_count, spooled = outputs[True]
+    read_count, read = outputs[False]
+    assert spooled_count == read_count
+    for key in (
+        "minor_version",
+        "dataformat_id",
+        "global_encoding",
+        "project_id",
+        "system_id",
+        "software_id",
+        "creation_doy",
+        "creation_year",
+        "filesource_id",
+    ):
+        assert spooled[key] == read[key]
+    spooled_vlrs = [spooled[key] for key in spooled if key.startswith("vlr_")]
+    read_vlrs = [read[key] for key in read if key.startswith("vlr_")]
+    assert [
+        (vlr["user_id"], vlr["record_id"], vlr["data"]) for vlr in spooled_vlrs
+    ] == [(vlr["user_id"], vlr["record_id"], vlr["data"]) for vlr in read_vlrs]
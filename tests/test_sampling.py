@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from codem.registration.sampling import curvature_sampling
+from codem.registration.sampling import normal_space_sampling
+from codem.registration.sampling import random_sampling
+from codem.registration.sampling import surface_variation
+
+
+def normals(n_flat: int, n_sloped: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    flat = np.tile([0.0, 0.0, 1.0], (n_flat, 1))
+    azimuth = rng.uniform(0, 2 * np.pi, n_sloped)
+    sloped = np.column_stack(
+        (0.6 * np.cos(azimuth), 0.6 * np.sin(azimuth), np.full(n_sloped, 0.8))
+    )
+    return np.vstack((flat, sloped))
+
+
+@pytest.mark.parametrize("count", [10, 1000, 5000])
+def test_samplers_return_sorted_unique_indices(count: int) -> None:
+    rng = np.random.default_rng(1)
+    vectors = normals(9000, 1000)
+    variation = rng.uniform(size=vectors.shape[0])
+    for sample in (
+        random_sampling(vectors.shape[0], count, rng),
+        normal_space_sampling(vectors, count, rng),
+        curvature_sampling(variation, count, rng),
+    ):
+        assert sample.shape == (count,)
+        assert np.all(np.diff(sample) > 0)
+        assert sample[-1] < vectors.shape[0]
+
+
+def test_samplers_keep_all_points_below_count() -> None:
+    rng = np.random.default_rng(1)
+    assert np.array_equal(random_sampling(5, 10, rng), np.arange(5))
+    assert np.array_equal(normal_space_sampling(normals(3, 2), 5, rng), np.arange(5))
+    assert np.array_equal(curvature_sampling(np.zeros(4), 4, rng), np.arange(4))
+
+
+def test_normal_space_sampling_thins_dominant_direction() -> None:
+    rng = np.random.default_rng(1)
+    sample = normal_space_sampling(normals(9000, 1000), 2000, rng)
+    # the sloped points are spread over many bins, so nearly all are kept
+    assert np.count_nonzero(sample >= 9000) > 900
+
+
+def test_curvature_sampling_favours_curved_points() -> None:
+    rng = np.random.default_rng(1)
+    variation = np.concatenate((np.zeros(9000), np.full(1000, 0.1)))
+    sample = curvature_sampling(variation, 1000, rng)
+    assert np.count_nonzero(sample >= 9000) > 500
+    assert np.count_nonzero(sample < 9000) > 0
+
+
+def test_surface_variation_is_zero_on_planes() -> None:
+    plane = np.tile([0.6, 0.0, 0.8], (5, 6, 1))
+    assert np.allclose(surface_variation(plane), 0.0)
+    ridge = plane.copy()
+    ridge[:, 3:, 0] = -0.6
+    variation = surface_variation(ridge)
+    assert np.all(variation[:, 2:4] > 0.1)
+    assert np.allclose(variation[:, 0:2], 0.0)